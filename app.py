@@ -6,7 +6,7 @@ import os
 from datetime import datetime
 import textwrap
 
-# Initialize the database
+# Apply pending schema migrations (a no-op after the first run in this process)
 db.init_db()
 
 # Initialize session state
@@ -319,7 +319,7 @@ def display_dashboard():
 
     # Recent activity from feed
     st.markdown('<p class="section-header">Recent Community Activity</p>', unsafe_allow_html=True)
-    recent_posts = db.get_posts(limit=3)
+    recent_posts = db.get_feed(user_id, limit=3, comment_preview=0)
 
     if recent_posts:
         for post in recent_posts:
@@ -328,7 +328,7 @@ def display_dashboard():
                 <div class="card">
                     <p><strong>{post['username']}</strong> • {post['created_at']}</p>
                     <p>{post['content']}</p>
-                    <p>❤️ {post['like_count']} likes • 💬 {len(post['comments'])} comments</p>
+                    <p>❤️ {post['like_count']} likes • 💬 {post['comment_count']} comments</p>
                 </div>
                 """, unsafe_allow_html=True)
     else:
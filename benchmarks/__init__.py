@@ -0,0 +1,2 @@
+# Benchmark scripts; run from the repository root, e.g.
+#   python -m benchmarks.db_sessions
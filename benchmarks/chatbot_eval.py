@@ -0,0 +1,202 @@
+"""Chatbot latency and accuracy over the labelled support questions
+
+Reports, as JSON so runs can be compared:
+
+- cold start: bot construction (spaCy) and semantic stage load, with RSS
+- per-stage latency: rule match, semantic fallback (rule misses only) and
+  response generation including its SQL, plus the end-to-end total
+- statements issued per response
+- intent accuracy overall and per intent, and the confusion counts
+
+Caches are cleared before every pass so each stage does its real work.
+Run in a fresh interpreter for meaningful cold-start numbers.
+
+    python -m benchmarks.chatbot_eval --output eval.json
+    python -m benchmarks.chatbot_eval --compare eval.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import database as db
+import database_gig as db_gig
+import db_pool
+from benchmarks.query_counts import StatementCounter, seed
+from benchmarks.timing import latency_summary, load_support_questions
+from chatbot import model_registry
+
+NO_INTENT = "(none)"
+
+
+def rss_mib():
+    stats = model_registry.registry_stats()
+    return (stats["total"]["rss"] or 0) / 2 ** 20
+
+
+def score_predictions(labels, predictions):
+    """Accuracy overall and per labelled intent, plus confusion counts
+
+    Args:
+        labels (list): Expected intent per message (None for no intent)
+        predictions (list): Predicted intent per message
+
+    Returns:
+        dict: accuracy, per_intent {intent: {n, correct, accuracy}} and
+            confusion {expected: {predicted: count}}
+    """
+    per_intent = defaultdict(lambda: {"n": 0, "correct": 0})
+    confusion = defaultdict(lambda: defaultdict(int))
+    for expected, predicted in zip(labels, predictions):
+        expected, predicted = expected or NO_INTENT, predicted or NO_INTENT
+        per_intent[expected]["n"] += 1
+        per_intent[expected]["correct"] += expected == predicted
+        confusion[expected][predicted] += 1
+
+    for counts in per_intent.values():
+        counts["accuracy"] = counts["correct"] / counts["n"]
+    correct = sum(c["correct"] for c in per_intent.values())
+    return {
+        "accuracy": correct / len(labels) if labels else 0.0,
+        "per_intent": dict(sorted(per_intent.items())),
+        "confusion": {k: dict(v) for k, v in sorted(confusion.items())},
+    }
+
+
+def clear_caches(pipeline):
+    pipeline.intent_clf.cache.clear()
+    if pipeline._semantic_clf is not None:
+        pipeline._semantic_clf.cache.clear()
+
+
+def run(args):
+    from chatbot.bot import FreelanceSupportBot
+    from chatbot.pipeline import IntentPipeline
+
+    rows = load_support_questions()
+    user_id, _ = seed(gigs=30, posts=0)
+    rss_start = rss_mib()
+
+    started = time.perf_counter()
+    bot = FreelanceSupportBot(user_id, warm_semantic=False, pipeline=IntentPipeline(warm_semantic=False))
+    pipeline = bot.pipeline
+    cold = {"bot_seconds": time.perf_counter() - started, "rss_after_bot_mib": rss_mib()}
+    if not args.rules_only:
+        started = time.perf_counter()
+        pipeline.semantic_clf
+        cold["semantic_seconds"] = time.perf_counter() - started
+        cold["rss_after_semantic_mib"] = rss_mib()
+    semantic_clf = None if args.rules_only else pipeline.semantic_clf
+
+    stages = {"rules": [], "semantic": [], "response": [], "total": []}
+    statements = []
+    predictions = []
+    for repeat in range(args.repeat):
+        clear_caches(pipeline)
+        for row in rows:
+            text = row["text"]
+            began = time.perf_counter()
+            intent = pipeline.intent_clf.classify(text)
+            stages["rules"].append(time.perf_counter() - began)
+
+            if not intent and semantic_clf is not None:
+                t = time.perf_counter()
+                intent = semantic_clf.classify(text)
+                stages["semantic"].append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            with StatementCounter() as counter:
+                handler = bot.intent_map.get(intent, bot.resp_gen.get_default)
+                handler()
+            stages["response"].append(time.perf_counter() - t)
+            stages["total"].append(time.perf_counter() - began)
+            statements.append(counter.count)
+
+            if repeat == 0:
+                predictions.append(intent)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "spacy_model": model_registry.SPACY_MODEL,
+            "encoder": None if args.rules_only else model_registry.ENCODER_MODEL,
+            "encoder_backend": None if args.rules_only else model_registry.encoder_backend(),
+            "questions": len(rows),
+            "repeat": args.repeat,
+        },
+        "cold_start": cold,
+        "rss_mib": {"start": rss_start, "end": rss_mib()},
+        "stages": {name: latency_summary(samples) for name, samples in stages.items()},
+        "statements_per_response": {
+            "mean": sum(statements) / len(statements) if statements else 0.0,
+            "max": max(statements, default=0),
+        },
+        **score_predictions([row["intent"] for row in rows], predictions),
+    }
+
+
+def print_report(result, baseline=None):
+    print(f"cold start: bot {result['cold_start']['bot_seconds']:.2f}s"
+          + (f", semantic {result['cold_start']['semantic_seconds']:.2f}s"
+             if "semantic_seconds" in result["cold_start"] else "")
+          + f"; RSS {result['rss_mib']['end']:.0f} MiB")
+    print(f"{'stage':<10}{'calls':>7}{'p50 ms':>9}{'p99 ms':>9}" + ("   p50 vs baseline" if baseline else ""))
+    for name, summary in result["stages"].items():
+        line = f"{name:<10}{summary['calls']:>7}{summary['p50_ms']:>9.3f}{summary['p99_ms']:>9.3f}"
+        old = (baseline or {}).get("stages", {}).get(name)
+        if old and old["p50_ms"]:
+            line += f"   {(summary['p50_ms'] / old['p50_ms'] - 1):+.0%}"
+        print(line)
+    print(f"SQL statements per response: mean {result['statements_per_response']['mean']:.2f}, "
+          f"max {result['statements_per_response']['max']}")
+
+    line = f"accuracy {result['accuracy']:.1%}"
+    if baseline:
+        line += f" (baseline {baseline['accuracy']:.1%})"
+    print(line)
+    for intent, counts in result["per_intent"].items():
+        if counts["accuracy"] < 1:
+            wrong = {p: n for p, n in result["confusion"][intent].items() if p != intent}
+            print(f"  {intent:<24}{counts['correct']}/{counts['n']}  confused with {wrong}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rules-only", action="store_true", help="skip the semantic stage")
+    parser.add_argument("--spacy-model", default=model_registry.SPACY_MODEL)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+    model_registry.SPACY_MODEL = args.spacy_model
+
+    original_path = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        try:
+            db.init_db()
+            db_gig.init_gig_tables()
+            result = run(args)
+        finally:
+            db_pool.close_all_pools()
+            db.DB_PATH = original_path
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
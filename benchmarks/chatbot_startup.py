@@ -0,0 +1,77 @@
+"""Measure chatbot startup: import time, time to first reply and RSS
+
+Each mode runs in a fresh interpreter so imports and model loads are cold:
+
+- eager: build the bot, then force the semantic stage before the first reply
+  (what every session used to pay)
+- lazy: build the bot without warm-up; the first reply is a rule hit
+- warm: build the bot with background warm-up; the first reply is a rule
+  hit while the semantic models load on another thread
+
+    python -m benchmarks.chatbot_startup
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+_PROBE = r'''
+import json, os, sys, tempfile, time
+
+def rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+mode = sys.argv[1]
+started = time.perf_counter()
+
+import database as db
+db.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+db.init_db()
+user_id = db.create_user("bench", "bench@example.com", "pw")
+
+from chatbot.bot import FreelanceSupportBot
+imported = time.perf_counter()
+
+bot = FreelanceSupportBot(user_id, warm_semantic=(mode == "warm"))
+if mode == "eager":
+    bot.semantic_clf
+built = time.perf_counter()
+
+bot.get_response("How should I price my services?")
+replied = time.perf_counter()
+
+print(json.dumps({
+    "mode": mode,
+    "import_seconds": imported - started,
+    "build_seconds": built - imported,
+    "first_reply_seconds": replied - started,
+    "torch_imported": "torch" in sys.modules,
+    "rss_mib": (rss() or 0) / (1024 * 1024),
+}))
+'''
+
+
+def run(mode):
+    result = subprocess.run([sys.executable, "-c", _PROBE, mode],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["eager", "lazy", "warm"])
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'import s':>10}{'build s':>10}{'1st reply s':>13}{'RSS MiB':>10}  torch")
+    for mode in args.modes:
+        r = run(mode)
+        print(f"{r['mode']:<8}{r['import_seconds']:>10.2f}{r['build_seconds']:>10.2f}"
+              f"{r['first_reply_seconds']:>13.2f}{r['rss_mib']:>10.1f}  {r['torch_imported']}")
+
+
+if __name__ == "__main__":
+    main()
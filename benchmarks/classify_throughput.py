@@ -0,0 +1,54 @@
+"""Throughput of one-at-a-time classify() vs batched classify_many()
+
+Messages are the labelled support questions made unique (so caches never
+answer them) and repeated up to --messages.
+
+    python -m benchmarks.classify_throughput --messages 5000 --n-process 2
+"""
+import argparse
+import time
+
+from benchmarks.timing import load_support_questions
+from chatbot import IntentClassifier, SemanticFallback, model_registry
+
+
+def throughput(fn, messages):
+    started = time.perf_counter()
+    fn(messages)
+    return len(messages) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--n-process", type=int, default=1)
+    parser.add_argument("--spacy-model", default=model_registry.SPACY_MODEL)
+    parser.add_argument("--rules-only", action="store_true", help="skip the sentence encoder")
+    args = parser.parse_args()
+
+    questions = [row["text"] for row in load_support_questions()]
+    messages = [f"{questions[i % len(questions)]} #{i}" for i in range(args.messages)]
+    nlp = model_registry.get_spacy(args.spacy_model, tokenizer_only=True)
+
+    print(f"{len(messages)} messages, batch size {args.batch_size}, {args.n_process} spaCy process(es)")
+    print(f"{'stage':<10}{'loop msg/s':>12}{'batch msg/s':>13}")
+
+    # a fresh classifier per run so its private cache starts empty
+    clf = IntentClassifier(nlp)
+    loop = throughput(lambda ms: [clf.classify(m) for m in ms], messages)
+    clf = IntentClassifier(nlp)
+    batch = throughput(lambda ms: clf.classify_many(ms, args.batch_size, args.n_process), messages)
+    print(f"{'rules':<10}{loop:>12.0f}{batch:>13.0f}")
+
+    if not args.rules_only:
+        semantic = SemanticFallback()
+        semantic.cache.clear()
+        loop = throughput(lambda ms: [semantic.classify(m) for m in ms], messages)
+        semantic.cache.clear()
+        batch = throughput(lambda ms: semantic.classify_many(ms, args.batch_size), messages)
+        print(f"{'semantic':<10}{loop:>12.0f}{batch:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
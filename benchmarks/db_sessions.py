@@ -0,0 +1,138 @@
+"""Read/write throughput of the SQLite layer under N simulated sessions
+
+Each session is a thread that loops over a Streamlit-like mix of feed and
+gig reads plus likes and comments, against a scratch copy of the schema.
+The run is repeated for every connection profile so the rollback-journal
+defaults can be compared with the WAL profile.
+
+    python -m benchmarks.db_sessions --sessions 16 --seconds 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+import database as db
+import database_gig as db_gig
+import db_pool
+
+PROFILES = {
+    "legacy": {"journal_mode": "DELETE"},
+    "wal": db_pool.DEFAULT_PROFILE,
+}
+
+
+def _seed(sessions):
+    user_ids = [db.create_user(f"bench{i}", f"bench{i}@example.com", "pw") for i in range(sessions)]
+    gig_id = db.create_gig(user_ids[0], "Bench gig", "Benchmark gig", 10, 20, "1 day", [1, 2])
+    post_ids = [db.create_post(user_ids[i % sessions], f"Post {i}") for i in range(40)]
+    return user_ids, gig_id, post_ids
+
+
+def _session(user_id, gig_id, post_ids, write_ratio, deadline, results, lock):
+    rng = random.Random(user_id)
+    reads = writes = errors = 0
+    read_latencies = []
+
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            if rng.random() < write_ratio:
+                action = rng.randrange(3)
+                post_id = rng.choice(post_ids)
+                if action == 0:
+                    if not db.like_post(user_id, post_id):
+                        db.unlike_post(user_id, post_id)
+                    ok = True
+                elif action == 1:
+                    ok = db.add_comment(user_id, post_id, "bench comment") is not None
+                else:
+                    ok = db_gig.add_gig_comment(user_id, gig_id, "bench comment") is not None
+                if ok:
+                    writes += 1
+                else:
+                    errors += 1
+            else:
+                if rng.random() < 0.5:
+                    db.get_posts(limit=20)
+                else:
+                    db.get_gigs(limit=20)
+                reads += 1
+                read_latencies.append(time.monotonic() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+
+    with lock:
+        results["reads"] += reads
+        results["writes"] += writes
+        results["errors"] += errors
+        results["read_latencies"].extend(read_latencies)
+
+
+def run_profile(name, profile, sessions, seconds, write_ratio):
+    """Run one benchmark round against a fresh database
+
+    Returns:
+        dict: Throughput, error count and read latency figures
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        pool = db_pool.get_pool(path, profile=profile)
+        pool.max_size = max(pool.max_size, sessions + 1)
+        db.DB_PATH = path
+        db.init_db()
+        db_gig.init_gig_tables()
+        user_ids, gig_id, post_ids = _seed(sessions)
+
+        results = {"reads": 0, "writes": 0, "errors": 0, "read_latencies": []}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+        threads = [
+            threading.Thread(target=_session,
+                             args=(uid, gig_id, post_ids, write_ratio, deadline, results, lock))
+            for uid in user_ids
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        latencies = sorted(results["read_latencies"]) or [0.0]
+        stats = pool.stats()
+        db_pool.close_all_pools()
+
+    return {
+        "profile": name,
+        "reads_per_s": results["reads"] / seconds,
+        "writes_per_s": results["writes"] / seconds,
+        "errors": results["errors"],
+        "read_p50_ms": latencies[len(latencies) // 2] * 1000,
+        "read_p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "pool_waits": stats["waits"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    args = parser.parse_args()
+
+    original_path = db.DB_PATH
+    print(f"{'profile':<8} {'reads/s':>10} {'writes/s':>10} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'waits':>6}")
+    try:
+        for name in args.profiles.split(","):
+            r = run_profile(name, PROFILES[name], args.sessions, args.seconds, args.write_ratio)
+            print(f"{r['profile']:<8} {r['reads_per_s']:>10.1f} {r['writes_per_s']:>10.1f} {r['errors']:>7} "
+                  f"{r['read_p50_ms']:>8.2f} {r['read_p95_ms']:>8.2f} {r['pool_waits']:>6}")
+    finally:
+        db.DB_PATH = original_path
+
+
+if __name__ == "__main__":
+    main()
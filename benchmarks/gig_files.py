@@ -0,0 +1,86 @@
+"""Measure time and peak Python memory for gig file upload and download
+
+Compares the whole-bytes path (read the upload, store it, read it back)
+with the path the gigs page uses: the upload is streamed into the blob
+store in fixed-size chunks, and the download opens the blob and reads it
+whole, as st.download_button does with the file it is given. Downloads are
+therefore not memory-bounded; the page only avoids reading a file before
+the user asks for it.
+
+    python -m benchmarks.gig_files --size-mb 100
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import blob_store
+import database as db
+import database_gig as db_gig
+import db_pool
+
+
+def measure(fn):
+    """Run fn and return (result, seconds, peak traced MiB)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024 * 1024)
+
+
+def write_source(path, size_mb):
+    # Random content so every run stores a new blob instead of deduplicating
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(1024 * 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        db.DB_PATH = os.path.join(scratch, "bench.db")
+        blob_store.BLOB_DIR = os.path.join(scratch, "blobs")
+        db_gig.MAX_GIG_FILE_SIZE = max(db_gig.MAX_GIG_FILE_SIZE, (args.size_mb + 1) * 1024 * 1024)
+        db.init_db()
+        user_id = db.create_user("bench", "bench@example.com", "pw")
+        gig_id = db.create_gig(user_id, "Bench gig", "", 0, 0, "1 day", [1])
+
+        results = []
+        for label in ("bytes", "page"):
+            source = os.path.join(scratch, f"{label}.bin")
+            write_source(source, args.size_mb)
+
+            with open(source, "rb") as f:
+                if label == "bytes":
+                    upload = lambda: db_gig.add_gig_file(user_id, gig_id, "file.bin", f.read())
+                else:
+                    upload = lambda: db_gig.add_gig_file(user_id, gig_id, "file.bin", f)
+                file_id, up_time, up_peak = measure(upload)
+
+            if label == "bytes":
+                download = lambda: len(db_gig.get_gig_file_data(file_id))
+            else:
+                def download():
+                    # st.download_button(data=stream) calls stream.read()
+                    with db_gig.open_gig_file(file_id) as stream:
+                        return len(stream.read())
+            _, down_time, down_peak = measure(download)
+            results.append((label, up_time, up_peak, down_time, down_peak))
+
+        db_pool.close_all_pools()
+
+    print(f"{args.size_mb} MiB file")
+    print(f"{'path':<8}{'upload s':>10}{'peak MiB':>10}{'download s':>12}{'peak MiB':>10}")
+    for label, up_time, up_peak, down_time, down_peak in results:
+        print(f"{label:<8}{up_time:>10.2f}{up_peak:>10.1f}{down_time:>12.2f}{down_peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Load test for the chatbot inference server
+
+Starts a server in this process (or targets --url) and has --clients
+threads each send --requests single-message /classify calls, the way
+concurrent Streamlit sessions would. Reports throughput, client-side
+latency and how many messages the server coalesced per batch.
+
+    python -m benchmarks.inference_load --clients 16 --requests 200
+    python -m benchmarks.inference_load --url http://127.0.0.1:8765
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.request
+
+from benchmarks.timing import latency_summary, load_support_questions
+from chatbot import model_registry
+from chatbot.inference_client import RemoteIntentPipeline
+from chatbot.inference_server import make_server
+from chatbot.pipeline import IntentPipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="existing server; by default one is started here")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--rules-only", action="store_true", help="don't load the semantic stage")
+    parser.add_argument("--spacy-model", default=model_registry.SPACY_MODEL)
+    args = parser.parse_args()
+    model_registry.SPACY_MODEL = args.spacy_model
+
+    server = None
+    url = args.url
+    if url is None:
+        pipeline = IntentPipeline(warm_semantic=False)
+        if not args.rules_only:
+            pipeline.semantic_clf
+        server = make_server(port=0, pipeline=pipeline, workers=args.workers,
+                             max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    questions = [row["text"] for row in load_support_questions()]
+    samples = []
+    lock = threading.Lock()
+
+    def client(n):
+        remote = RemoteIntentPipeline(url, lambda: None)
+        mine = []
+        for i in range(args.requests):
+            # unique text so the server's caches don't answer it
+            text = f"{questions[(n + i) % len(questions)]} #{n}-{i}"
+            began = time.perf_counter()
+            remote._post("/classify", [text])
+            mine.append(time.perf_counter() - began)
+        with lock:
+            samples.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(args.clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with urllib.request.urlopen(f"{url}/stats") as response:
+        batching = json.loads(response.read())["batching"]
+    summary = latency_summary(samples)
+    print(f"{args.clients} clients x {args.requests} requests: {len(samples) / elapsed:.0f} req/s")
+    print(f"latency p50 {summary['p50_ms']:.2f} ms, p99 {summary['p99_ms']:.2f} ms")
+    print(f"server: {batching['batches']} batches, {batching['mean_batch']:.1f} messages per batch, "
+          f"{batching['workers']} workers")
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+        server.pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Compare IntentClassifier latency: full spaCy pipeline vs tokenizer only
+
+Both modes classify the labelled support questions; the script also checks
+that they return the same intents.
+
+    python -m benchmarks.intent_latency --repeat 20
+"""
+import argparse
+import time
+
+from benchmarks.timing import latency_summary, load_support_questions, time_each
+from chatbot import IntentClassifier, model_registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=model_registry.SPACY_MODEL)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    questions = [row["text"] for row in load_support_questions()]
+
+    results = {}
+    print(f"{'mode':<11}{'load s':>8}{'weights MiB':>13}{'p50 ms':>9}{'p99 ms':>9}{'msg/s':>10}")
+    for tokenizer_only in (False, True):
+        mode = "tokenizer" if tokenizer_only else "full"
+        started = time.perf_counter()
+        nlp = model_registry.get_spacy(args.model, tokenizer_only=tokenizer_only)
+        load_seconds = time.perf_counter() - started
+        clf = IntentClassifier(nlp, tokenizer_only=tokenizer_only)
+
+        results[mode] = [clf.classify(q) for q in questions]
+        samples = time_each(clf.classify, questions, args.repeat)
+        summary = latency_summary(samples)
+        label = f"spacy:{args.model}" + (":tokenizer" if tokenizer_only else "")
+        size = model_registry.registry_stats()[label]
+        print(f"{mode:<11}{load_seconds:>8.2f}{(size['size_bytes'] or 0) / 2 ** 20:>13.1f}"
+              f"{summary['p50_ms']:>9.3f}{summary['p99_ms']:>9.3f}{len(samples) / sum(samples):>10.0f}")
+
+    same = results["full"] == results["tokenizer"]
+    print(f"identical intents on {len(questions)} questions: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Micro-benchmark of the keyword prefilter in IntentClassifier
+
+Classifies the labelled support questions with and without the prefilter,
+bypassing the intent cache so every call does the matching. Also reports
+how many questions the prefilter settles on its own and checks that both
+modes return the same intents.
+
+    python -m benchmarks.intent_prefilter --repeat 200
+"""
+import argparse
+
+from benchmarks.timing import latency_summary, load_support_questions, time_each
+from chatbot import IntentClassifier, model_registry, query_cache
+from chatbot.keyword_prefilter import AMBIGUOUS, tokenize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=model_registry.SPACY_MODEL)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    keys = [query_cache.normalize(row["text"]) for row in load_support_questions()]
+    nlp = model_registry.get_spacy(args.model, tokenizer_only=True)
+
+    results = {}
+    print(f"{'mode':<11}{'p50 us':>9}{'p99 us':>9}{'msg/s':>10}")
+    for prefilter in (False, True):
+        mode = "prefilter" if prefilter else "spacy"
+        clf = IntentClassifier(nlp, prefilter=prefilter)
+        results[mode] = [clf._classify_key(k) for k in keys]
+        samples = time_each(clf._classify_key, keys, args.repeat)
+        summary = latency_summary(samples)
+        print(f"{mode:<11}{summary['p50_ms'] * 1000:>9.1f}{summary['p99_ms'] * 1000:>9.1f}"
+              f"{len(samples) / sum(samples):>10.0f}")
+
+    plain = [k for k in keys if tokenize(k) is not None]
+    settled = [k for k in plain if clf._prefilter(k) is not AMBIGUOUS]
+    print(f"plain {len(plain)}/{len(keys)}, settled without spaCy {len(settled)}/{len(keys)}")
+    print(f"identical intents: {results['spacy'] == results['prefilter']}")
+
+
+if __name__ == "__main__":
+    main()
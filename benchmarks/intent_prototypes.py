@@ -0,0 +1,66 @@
+"""Semantic fallback startup time and accuracy: bare labels vs exemplars
+
+Startup compares encoding the 14 label strings (the old approach) with
+building the exemplar store from scratch and with memory-mapping a store
+saved earlier. Accuracy is the share of labelled support questions the
+semantic stage alone gets right, with questions labelled null counting as
+correct when nothing clears the threshold.
+
+    python -m benchmarks.intent_prototypes
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.timing import load_support_questions
+from chatbot import intent_prototypes, model_registry, semantic_fallback
+
+
+def accuracy(predict, rows):
+    return sum(predict(row["text"]) == row["intent"] for row in rows) / len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=model_registry.ENCODER_MODEL)
+    parser.add_argument("--threshold", type=float, default=semantic_fallback.THRESHOLD)
+    args = parser.parse_args()
+
+    encoder = model_registry.get_encoder(args.model)
+    model_digest = model_registry.get_model_digest(args.model)
+    rows = load_support_questions()
+    intents = semantic_fallback.INTENTS
+
+    started = time.perf_counter()
+    label_matrix = encoder.encode(intents, convert_to_numpy=True, normalize_embeddings=True)
+    labels_seconds = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as store:
+        started = time.perf_counter()
+        intent_prototypes.load_or_build(args.model, model_digest, lambda: encoder, directory=store)
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        prototypes = intent_prototypes.load_or_build(args.model, model_digest, lambda: encoder, directory=store)
+        load_seconds = time.perf_counter() - started
+
+        def by_label(text):
+            scores = label_matrix @ encoder.encode(text, convert_to_numpy=True, normalize_embeddings=True)
+            best = int(np.argmax(scores))
+            return intents[best] if scores[best] > args.threshold else None
+
+        def by_exemplar(text):
+            intent, score = prototypes.best(encoder.encode(text, convert_to_numpy=True, normalize_embeddings=True))
+            return intent if score > args.threshold else None
+
+        print(f"{'method':<22}{'startup s':>10}{'accuracy':>10}")
+        print(f"{'bare labels':<22}{labels_seconds:>10.3f}{accuracy(by_label, rows):>10.1%}")
+        print(f"{'exemplars (build)':<22}{build_seconds:>10.3f}{accuracy(by_exemplar, rows):>10.1%}")
+        print(f"{'exemplars (mmap)':<22}{load_seconds:>10.3f}{'':>10}")
+        print(f"{len(prototypes.labels)} exemplars, {len(rows)} questions, threshold {args.threshold}")
+
+
+if __name__ == "__main__":
+    main()
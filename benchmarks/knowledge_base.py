@@ -0,0 +1,88 @@
+"""Knowledge base insert, index and top-k search at 100k snippets
+
+Snippet embeddings are synthetic: unit vectors scattered around random
+topic centres, which is how sentence embeddings of related tips cluster.
+Queries are perturbed copies of stored rows. Reports insert and index
+build time, reopen time, and search latency with recall@k against an
+exhaustive scan for several --n-probe values.
+
+    python -m benchmarks.knowledge_base --snippets 100000 --dim 384
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.timing import latency_summary
+from chatbot import knowledge_base
+
+
+def synthetic_rows(rng, count, dim, topics):
+    centres = rng.standard_normal((topics, dim)).astype(np.float32)
+    rows = centres[rng.integers(0, topics, count)] + 0.35 * rng.standard_normal((count, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snippets", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=10_000, help="snippets per insert")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=knowledge_base.TOP_K)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[4, knowledge_base.N_PROBE, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    rows = synthetic_rows(rng, args.snippets, args.dim, args.topics)
+    queries = rows[rng.integers(0, args.snippets, args.queries)]
+    queries = queries + 0.02 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        kb = knowledge_base.KnowledgeBase(tmp)
+        started = time.perf_counter()
+        for start in range(0, args.snippets, args.batch):
+            end = min(start + args.batch, args.snippets)
+            kb.add([knowledge_base.snippet(f"snippet {i}", "bench") for i in range(start, end)], rows[start:end])
+        insert_seconds = time.perf_counter() - started
+
+        exact = []
+        samples = []
+        for query in queries:
+            began = time.perf_counter()
+            hits = kb.search(query, args.k)
+            samples.append(time.perf_counter() - began)
+            exact.append({hit["id"] for _, hit in hits})
+        exhaustive = latency_summary(samples)
+
+        started = time.perf_counter()
+        kb.build_index()
+        index_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        kb = knowledge_base.KnowledgeBase(tmp)
+        reopen_seconds = time.perf_counter() - started
+
+        print(f"{args.snippets} snippets x {args.dim} dims: insert {insert_seconds:.2f}s "
+              f"({args.snippets / insert_seconds:.0f}/s), index {index_seconds:.2f}s "
+              f"({len(kb.centroids)} groups), reopen {reopen_seconds:.2f}s")
+        print(f"{'search':<14}{'p50 ms':>9}{'p99 ms':>9}{'recall@' + str(args.k):>11}")
+        print(f"{'exhaustive':<14}{exhaustive['p50_ms']:>9.2f}{exhaustive['p99_ms']:>9.2f}{1.0:>11.3f}")
+        for n_probe in args.n_probe:
+            samples = []
+            found = 0
+            for query, expected in zip(queries, exact):
+                began = time.perf_counter()
+                hits = kb.search(query, args.k, n_probe=n_probe)
+                samples.append(time.perf_counter() - began)
+                found += len(expected & {hit["id"] for _, hit in hits})
+            summary = latency_summary(samples)
+            print(f"{'n_probe ' + str(n_probe):<14}{summary['p50_ms']:>9.2f}{summary['p99_ms']:>9.2f}"
+                  f"{found / (args.k * len(queries)):>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Count the SQL statements issued by the hot read paths
+
+Seeds a scratch database with users, skills, gigs, courses and posts, then
+reports how many statements each data-access call executes.
+
+    python -m benchmarks.query_counts --gigs 50
+"""
+import argparse
+import os
+import tempfile
+
+import database as db
+import database_gig as db_gig
+import db_pool
+import recommenders
+
+
+class StatementCounter:
+    """Counts statements on every connection handed out while installed"""
+
+    def __init__(self):
+        self.count = 0
+        self._original = None
+
+    def _trace(self, statement):
+        # PRAGMAs from the connection profile are setup, not query work
+        if not statement.lstrip().upper().startswith("PRAGMA"):
+            self.count += 1
+
+    def _connect(self):
+        conn = self._original()
+        conn.set_trace_callback(self._trace)
+        return conn
+
+    def __enter__(self):
+        self._original = db.get_db_connection
+        db.get_db_connection = self._connect
+        return self
+
+    def __exit__(self, *exc):
+        db.get_db_connection = self._original
+
+
+def seed(gigs, posts):
+    """Populate the current database with benchmark rows
+
+    Returns:
+        tuple: (viewer user ID, list of post IDs)
+    """
+    viewer = db.create_user("viewer", "viewer@example.com", "pw")
+    author = db.create_user("author", "author@example.com", "pw")
+    db.update_user_skills(viewer, [
+        {"skill_id": sid, "proficiency_level": "Intermediate", "years_experience": 2}
+        for sid in (1, 2, 11, 12, 25)
+    ])
+    for i in range(gigs):
+        gig_id = db.create_gig(author, f"Gig {i}", "Benchmark gig", 10, 50, "1 week",
+                               [1 + i % 10, 11 + i % 9, 25 + i % 5])
+        db_gig.pick_gig(viewer, gig_id)
+    post_ids = [db.create_post(author, f"Post {i}") for i in range(posts)]
+    for post_id in post_ids:
+        db.like_post(viewer, post_id)
+        db.add_comment(viewer, post_id, "Nice post")
+    return viewer, post_ids
+
+
+def scenarios(viewer, gigs, posts):
+    return [
+        ("get_gigs", lambda: db.get_gigs(limit=gigs)),
+        ("get_recommended_gigs", lambda: db.get_recommended_gigs(viewer, limit=gigs)),
+        ("get_recommended_courses", lambda: db.get_recommended_courses(viewer, limit=gigs)),
+        ("get_user_picked_gigs", lambda: db_gig.get_user_picked_gigs(viewer)),
+        ("recommend_courses", lambda: recommenders.recommend_courses(viewer, limit=gigs)),
+        ("get_posts", lambda: db.get_posts(limit=posts)),
+        ("get_feed", lambda: db.get_feed(viewer, limit=posts)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--gigs", type=int, default=50)
+    parser.add_argument("--posts", type=int, default=20)
+    args = parser.parse_args()
+
+    original_path = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        try:
+            db.init_db()
+            db_gig.init_gig_tables()
+            viewer, _ = seed(args.gigs, args.posts)
+
+            print(f"{'call':<26} {'rows':>5} {'statements':>11}")
+            for name, call in scenarios(viewer, args.gigs, args.posts):
+                with StatementCounter() as counter:
+                    rows = call()
+                print(f"{name:<26} {len(rows):>5} {counter.count:>11}")
+        finally:
+            db_pool.close_all_pools()
+            db.DB_PATH = original_path
+
+
+if __name__ == "__main__":
+    main()
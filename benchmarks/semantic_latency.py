@@ -0,0 +1,82 @@
+"""Semantic fallback latency and memory: torch cos_sim vs NumPy vs ONNX int8
+
+Paths compared over the labelled support questions:
+
+- torch: the original scoring, util.cos_sim + torch.max on tensors
+- numpy: same torch encoder, exemplar matrix scored with one dot product
+- onnx: int8 ONNX encoder (if exported) with the NumPy scoring
+
+Each path is timed for scoring alone and end to end (encode + score).
+Memory is the RSS growth while loading each encoder; the ONNX encoder is
+loaded first so its figure does not include torch.
+
+    python -m chatbot.onnx_encoder      # once, to enable the onnx path
+    python -m benchmarks.semantic_latency --repeat 20
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.timing import latency_summary, load_support_questions, time_each
+from chatbot import intent_prototypes, model_registry, onnx_encoder
+
+
+def load(backend, model_name):
+    model_registry.ENCODER_BACKEND = backend
+    encoder = model_registry.get_encoder(model_name)
+    prototypes = model_registry.get_intent_prototypes(model_name)
+    stats = model_registry.registry_stats()[f"encoder:{model_name}:{backend}"]
+    return encoder, prototypes, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=model_registry.ENCODER_MODEL)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    questions = [row["text"] for row in load_support_questions()]
+    rows = []
+
+    if onnx_encoder.is_available(args.model):
+        encoder, prototypes, stats = load("onnx", args.model)
+        embeddings = [encoder.encode(q, normalize_embeddings=True) for q in questions]
+        rows.append(("onnx", stats,
+                     time_each(prototypes.best, embeddings, args.repeat),
+                     time_each(lambda q: prototypes.best(encoder.encode(q, normalize_embeddings=True)),
+                               questions, args.repeat)))
+    else:
+        print(f"No ONNX export of {args.model}; run python -m chatbot.onnx_encoder first")
+
+    import torch
+    from sentence_transformers import util
+
+    encoder, prototypes, stats = load("torch", args.model)
+    matrix = torch.from_numpy(np.array(prototypes.matrix))
+    tensors = [encoder.encode(q, convert_to_tensor=True) for q in questions]
+    arrays = [encoder.encode(q, convert_to_numpy=True, normalize_embeddings=True) for q in questions]
+
+    def torch_score(emb):
+        return torch.max(util.cos_sim(emb, matrix)[0], dim=0)
+
+    rows.append(("torch", stats,
+                 time_each(torch_score, tensors, args.repeat),
+                 time_each(lambda q: torch_score(encoder.encode(q, convert_to_tensor=True)), questions, args.repeat)))
+    rows.append(("numpy", stats,
+                 time_each(prototypes.best, arrays, args.repeat),
+                 time_each(lambda q: prototypes.best(encoder.encode(q, convert_to_numpy=True, normalize_embeddings=True)),
+                           questions, args.repeat)))
+
+    print(f"{len(questions)} questions x {args.repeat}, "
+          f"{len(intent_prototypes.EXEMPLARS)} intents / {len(prototypes.labels)} exemplars")
+    print(f"{'path':<7}{'score p50 us':>14}{'score p99 us':>14}{'e2e p50 ms':>12}{'e2e p99 ms':>12}"
+          f"{'load MiB':>10}{'weights MiB':>13}")
+    for name, stats, score, end_to_end in rows:
+        score, end_to_end = latency_summary(score), latency_summary(end_to_end)
+        print(f"{name:<7}{score['p50_ms'] * 1000:>14.1f}{score['p99_ms'] * 1000:>14.1f}"
+              f"{end_to_end['p50_ms']:>12.2f}{end_to_end['p99_ms']:>12.2f}"
+              f"{(stats['rss_delta'] or 0) / 2 ** 20:>10.1f}{(stats['size_bytes'] or 0) / 2 ** 20:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
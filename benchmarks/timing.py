@@ -0,0 +1,41 @@
+"""Small helpers shared by the benchmark scripts"""
+import json
+import os
+import time
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of a list of numbers (q in 0..100)"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(samples):
+    """Summarise per-call durations in seconds as milliseconds"""
+    return {
+        "calls": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": sum(samples) / len(samples) * 1000 if samples else 0.0,
+    }
+
+
+def time_each(fn, items, repeat=1):
+    """Call fn(item) for every item, repeat times, returning each duration"""
+    samples = []
+    for _ in range(repeat):
+        for item in items:
+            started = time.perf_counter()
+            fn(item)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def load_support_questions():
+    """Labelled support questions: list of {"text", "intent"} dicts"""
+    path = os.path.join(os.path.dirname(__file__), "support_questions.json")
+    with open(path) as f:
+        return json.load(f)
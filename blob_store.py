@@ -0,0 +1,114 @@
+import hashlib
+import os
+import tempfile
+
+# Root of the content-addressed store; files live at <BLOB_DIR>/ab/abcdef...
+BLOB_DIR = "data/blobs"
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class BlobTooLarge(ValueError):
+    """Raised when a stream grows past the size limit given to put_stream()"""
+
+
+def blob_path(digest):
+    """Get the on-disk path for a blob
+
+    Args:
+        digest (str): SHA-256 hex digest of the content
+
+    Returns:
+        str: Path of the blob file
+    """
+    if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+        raise ValueError(f"invalid blob digest: {digest!r}")
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+
+def put_stream(stream, chunk_size=CHUNK_SIZE, max_size=None):
+    """Store the contents of a binary file object, hashing as it is copied
+
+    Only one chunk is held in memory at a time. Identical content is stored
+    once: if the blob already exists the new copy is discarded.
+
+    Args:
+        stream: Readable binary file object
+        chunk_size (int): Bytes copied per read
+        max_size (int, optional): Abort once the content exceeds this many bytes
+
+    Returns:
+        tuple: (SHA-256 hex digest, size in bytes)
+
+    Raises:
+        BlobTooLarge: If max_size is exceeded; nothing is stored
+    """
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    sha = hashlib.sha256()
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=BLOB_DIR, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise BlobTooLarge(f"content exceeds {max_size} bytes")
+                sha.update(chunk)
+                tmp.write(chunk)
+
+        digest = sha.hexdigest()
+        path = blob_path(digest)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Atomic, so readers never see a half-written blob
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return digest, size
+
+
+def put(data):
+    """Store bytes and return (SHA-256 hex digest, size in bytes)"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = blob_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return digest, len(data)
+
+
+def exists(digest):
+    """Check whether a blob is present in the store"""
+    return os.path.exists(blob_path(digest))
+
+
+def open_blob(digest):
+    """Open a stored blob for binary reading
+
+    Raises:
+        FileNotFoundError: If the blob is not in the store
+    """
+    return open(blob_path(digest), "rb")
+
+
+def read(digest):
+    """Read a whole blob into memory"""
+    with open_blob(digest) as f:
+        return f.read()
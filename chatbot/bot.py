@@ -1,25 +1,42 @@
 # freelance_mongo/chatbot/bot.py
 
 import database as db
-from chatbot.intent_classifier import IntentClassifier
-from chatbot.semantic_fallback import SemanticFallback
+import tracing
+from chatbot import inference_client
+from chatbot.conversation import SMALL_TALK_INTENTS, ConversationMemory
+from chatbot.inference_client import RemoteIntentPipeline
+from chatbot.pipeline import IntentPipeline
 from chatbot.response_generator import ResponseGenerator
 
+# Most intents answered in one reply
+MAX_ANSWERS = 3
+
 class FreelanceSupportBot:
-    def __init__(self, user_id):
+    def __init__(self, user_id, warm_semantic=True, pipeline=None):
         # load user info
         self.user_id      = user_id
         user             = db.get_user_by_id(user_id) or {}
         username         = user.get("username")
-        user_skills      = db.get_user_skills(user_id)
 
-        # intent modules
-        self.intent_clf   = IntentClassifier()
-        self.semantic_clf = SemanticFallback()
+        # intent resolution, shared with the inference server when one is set
+        if pipeline is None:
+            if inference_client.SERVER_URL:
+                pipeline = RemoteIntentPipeline(
+                    inference_client.SERVER_URL,
+                    lambda: IntentPipeline(warm_semantic=False),
+                )
+            else:
+                pipeline = IntentPipeline(warm_semantic)
+        self.pipeline     = pipeline
+        # spans of the latest get_response(), see tracing.Trace
+        self.last_trace   = None
+        # recent turns, so follow-ups can continue the previous topic
+        self.memory       = ConversationMemory()
+        # skills, courses and demand stats come from the user's cached
+        # context snapshot, so they follow profile edits
         self.resp_gen     = ResponseGenerator(
             user_id=user_id,
             user_name=username,
-            user_skills=user_skills
         )
 
         # map intent labels to ResponseGenerator methods
@@ -40,19 +57,52 @@ class FreelanceSupportBot:
             "success_strategies":     self.resp_gen.get_success_strategies,
         }
 
+    def cache_stats(self):
+        """Hit/miss/eviction counters of the shared intent and embedding caches"""
+        return self.pipeline.cache_stats()
+
+    def classify_many(self, texts, batch_size=64, n_process=1):
+        """Resolve intents for a batch of messages, e.g. to relabel support logs
+
+        Returns:
+            list: (intent or None, confidence, stage) per message, where
+                stage is "rules", "semantic" or None
+        """
+        return self.pipeline.classify_many(texts, batch_size, n_process)
+
     def get_response(self, text: str) -> str:
-        # 1) rule-based matcher
-        intent = self.intent_clf.classify(text)
-        if intent and intent in self.intent_map:
-            return self.intent_map[intent]()
+        # each stage is timed into the tracing histograms; the breakdown of
+        # this call is kept in self.last_trace
+        with tracing.trace("get_response") as trace:
+            response = self._respond(text)
+        self.last_trace = trace
+        return response
 
-        # 2) semantic fallback
-        intent = self.semantic_clf.classify(text)
-        if intent and intent in self.intent_map:
-            return self.intent_map[intent]()
+    def _respond(self, text):
+        # rules first, semantic fallback second; every intent, best first,
+        # so "how do I price and write a contract" is answered in one reply
+        with tracing.span("classify"):
+            intents = [intent for intent, _, _ in self.pipeline.classify_all(text) if intent in self.intent_map]
+        embedding = None
+        if not intents:
+            # a follow-up like "and what about on Upwork?" continues an earlier topic
+            with tracing.span("conversation"):
+                intent, embedding = self.memory.resolve(text, self.pipeline.embedder())
+            if intent in self.intent_map:
+                intents = [intent]
+        # small talk next to a real question adds nothing to the answer
+        intents = [intent for intent in intents if intent not in SMALL_TALK_INTENTS] or intents[:1]
+        self.memory.add(text, intents[0] if intents else None, embedding)
+        if intents:
+            answers = []
+            for intent in intents[:MAX_ANSWERS]:
+                with tracing.span("handler"):
+                    answers.append(self.intent_map[intent]())
+            return "\n\n".join(answers)
 
-        # 3) final default
-        return self.resp_gen.get_default()
+        # final default: the closest knowledge base snippets, if any are close enough
+        with tracing.span("knowledge_base"):
+            return self.resp_gen.get_answer(text, self.pipeline.embedder())
 
 
 if __name__ == "__main__":
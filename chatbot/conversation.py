@@ -0,0 +1,87 @@
+# freelance_mongo/chatbot/conversation.py
+"""Fixed-size memory of recent turns for resolving follow-up questions
+
+A follow-up such as "and what about on Upwork?" names no intent of its
+own; it continues the topic of an earlier turn. ConversationMemory keeps
+the last few turns with their intents and, once computed, their
+embeddings, so each message is encoded at most once however often it is
+compared against.
+"""
+from collections import deque
+
+import numpy as np
+
+from chatbot import query_cache
+
+# Turns remembered per conversation
+MEMORY_TURNS = 8
+
+# Openings that mark a message as continuing the previous topic
+FOLLOW_UP_PREFIXES = (
+    "and", "also", "what about", "how about", "what if", "but", "then",
+    "tell me more", "more", "why", "how so", "same",
+)
+
+# Small talk carries no topic for a follow-up to continue
+SMALL_TALK_INTENTS = ("greeting", "thanks")
+
+
+def is_follow_up(text):
+    """Whether a message reads as a continuation of the conversation"""
+    key = query_cache.normalize(text)
+    return any(key == prefix or key.startswith(prefix + " ") for prefix in FOLLOW_UP_PREFIXES)
+
+
+class Turn:
+    __slots__ = ("text", "intent", "embedding")
+
+    def __init__(self, text, intent, embedding=None):
+        self.text = text
+        self.intent = intent
+        self.embedding = embedding
+
+
+class ConversationMemory:
+    """Ring buffer of the most recent turns, oldest dropped first"""
+
+    def __init__(self, max_turns=MEMORY_TURNS):
+        self.turns = deque(maxlen=max_turns)
+
+    def __len__(self):
+        return len(self.turns)
+
+    def add(self, text, intent, embedding=None):
+        self.turns.append(Turn(text, intent, embedding))
+
+    def clear(self):
+        self.turns.clear()
+
+    def resolve(self, text, embed=None):
+        """Intent a follow-up message continues, if any
+
+        Args:
+            text (str): Message the pipeline found no intent for
+            embed (callable, optional): Text to unit-length embedding, or to
+                None if it cannot embed. With embeddings the most similar
+                earlier turn wins, otherwise the latest one
+
+        Returns:
+            tuple: (intent or None, embedding of text or None)
+        """
+        candidates = [turn for turn in self.turns
+                      if turn.intent and turn.intent not in SMALL_TALK_INTENTS]
+        if not candidates or not is_follow_up(text):
+            return None, None
+        if embed is None:
+            return candidates[-1].intent, None
+
+        query = embed(text)
+        for turn in candidates:
+            if turn.embedding is None and query is not None:
+                turn.embedding = embed(turn.text)
+            if turn.embedding is None:
+                return candidates[-1].intent, query
+        scores = np.stack([turn.embedding for turn in candidates]) @ query
+        # argmax keeps the first maximum, so scan newest first to favour recent turns
+        best = len(candidates) - 1 - int(np.argmax(scores[::-1]))
+        return candidates[best].intent, query
@@ -0,0 +1,177 @@
+# freelance_mongo/chatbot/inference_client.py
+"""Thin client for chatbot.inference_server with an in-process fallback
+
+Set SERVER_URL (e.g. "http://127.0.0.1:8765") to have every bot in this
+process resolve intents and embed messages through the shared service
+instead of loading its own models. If the service is down or slow the
+message is handled in-process instead, and the service is left alone for
+RETRY_AFTER seconds so later messages don't each pay the timeout.
+"""
+import json
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+from chatbot import query_cache
+
+# None keeps inference in-process
+SERVER_URL = None
+
+# Seconds to wait for the service before falling back
+TIMEOUT = 2.0
+
+# Seconds to skip the service after a failure
+RETRY_AFTER = 30.0
+
+# Server embeddings kept per client; a message that misses the rules is
+# embedded for follow-up resolution and again for the knowledge base
+EMBED_CACHE_SIZE = 64
+
+_UNAVAILABLE = object()
+
+
+class RemoteIntentPipeline:
+    """IntentPipeline look-alike that asks the inference server"""
+
+    def __init__(self, url, local_factory, timeout=TIMEOUT, retry_after=RETRY_AFTER):
+        """
+        Args:
+            url (str): Base URL of the inference server
+            local_factory (callable): Builds the in-process pipeline used as
+                fallback; only called if the server fails
+            timeout (float): Seconds to wait for a reply
+            retry_after (float): Seconds to stay on the fallback after a failure
+        """
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._local_factory = local_factory
+        self._local = None
+        self._down_until = 0.0
+        # False once the server has said it has no semantic stage
+        self._remote_embeddings = True
+        self._embeddings = query_cache.LRUCache(EMBED_CACHE_SIZE)
+        # guards the fields above and stats, which every session's thread
+        # updates; building the local pipeline has a lock of its own
+        self._lock = threading.Lock()
+        self._local_lock = threading.Lock()
+        self.stats = {"remote": 0, "fallback": 0, "errors": 0}
+
+    @property
+    def local(self):
+        """The in-process pipeline, built on first fallback"""
+        with self._local_lock:
+            if self._local is None:
+                self._local = self._local_factory()
+            return self._local
+
+    def _post(self, path, texts, field="results"):
+        request = urllib.request.Request(
+            f"{self.url}{path}",
+            data=json.dumps({"texts": list(texts)}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            results = json.loads(response.read())[field]
+        if results is not None and len(results) != len(texts):
+            raise ValueError("inference server returned the wrong number of results")
+        return results
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _remote(self, path, texts, field="results"):
+        """Ask the server, or return _UNAVAILABLE if it is down or just failed"""
+        with self._lock:
+            if time.monotonic() < self._down_until:
+                return _UNAVAILABLE
+        try:
+            results = self._post(path, texts, field)
+        except (OSError, ValueError, KeyError) as e:
+            # URLError, timeouts and refused connections are all OSErrors
+            print(f"Inference server unavailable, using local models: {e}")
+            with self._lock:
+                self._down_until = time.monotonic() + self.retry_after
+                self.stats["errors"] += 1
+            return _UNAVAILABLE
+        self._count("remote")
+        return results
+
+    def classify_many(self, texts, batch_size=64, n_process=1):
+        """Resolve intents remotely, falling back to the local pipeline
+
+        Returns:
+            list: (intent or None, confidence, stage) per message
+        """
+        results = self._remote("/classify", texts)
+        if results is not _UNAVAILABLE:
+            return [tuple(result) for result in results]
+        self._count("fallback")
+        return self.local.classify_many(texts, batch_size, n_process)
+
+    def classify(self, text):
+        return self.classify_many([text])[0]
+
+    def classify_all(self, text):
+        """Every intent of one message, see IntentPipeline.classify_all()"""
+        results = self._remote("/classify_all", [text])
+        if results is not _UNAVAILABLE:
+            return [tuple(result) for result in results[0]]
+        self._count("fallback")
+        return self.local.classify_all(text)
+
+    def _local_embedder(self):
+        """embed() of the local pipeline if its semantic stage is already loaded
+
+        Never builds the pipeline or loads the encoder: that takes seconds,
+        and a request thread should not wait on it.
+        """
+        # read without the lock, which is held while the pipeline is built
+        local = self._local
+        return local.embedder() if local is not None else None
+
+    def embedder(self):
+        """embed(), or None once the server has said it cannot embed"""
+        with self._lock:
+            remote = self._remote_embeddings
+        return self.embed if remote else self._local_embedder()
+
+    def embed(self, text):
+        """Unit-length embedding of a message from the server
+
+        Recent embeddings are cached on the normalised text. While the
+        server is down, the local semantic stage embeds instead if it is
+        already loaded.
+
+        Returns:
+            np.ndarray: The embedding, or None if neither side can embed
+        """
+        key = query_cache.normalize(text)
+        embedding = self._embeddings.get(key)
+        if embedding is not None:
+            return embedding
+
+        embeddings = self._remote("/embed", [text], "embeddings")
+        if embeddings is None:
+            with self._lock:
+                self._remote_embeddings = False
+        elif embeddings is not _UNAVAILABLE:
+            embedding = np.asarray(embeddings[0], dtype=np.float32)
+            embedding.flags.writeable = False
+            self._embeddings.put(key, embedding)
+            return embedding
+        self._count("fallback")
+        embed = self._local_embedder()
+        return embed(text) if embed is not None else None
+
+    def cache_stats(self):
+        with self._lock:
+            stats = {"client": dict(self.stats)}
+        local = self._local
+        stats["client_embeddings"] = self._embeddings.stats()
+        if local is not None:
+            stats.update(local.cache_stats())
+        return stats
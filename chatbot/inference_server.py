@@ -0,0 +1,300 @@
+# freelance_mongo/chatbot/inference_server.py
+"""Local HTTP service running the intent pipeline for several app processes
+
+Each Streamlit server process would otherwise load its own spaCy and
+MiniLM models. Started once, this service holds one warm model set;
+bots reach it through chatbot.inference_client.
+
+    python -m chatbot.inference_server --port 8765 --workers 2
+
+Concurrent requests are coalesced: a worker takes whatever is queued, up
+to max_batch messages or max_wait seconds after the first, and resolves
+the requests to each endpoint with one batched pipeline call
+(classify_many(), classify_all_many() or embed_many()).
+
+Endpoints:
+    POST /classify      {"texts": [...]} -> {"results": [[intent, score, stage], ...]}
+    POST /classify_all  {"texts": [...]} -> {"results": [[[intent, score, stage], ...], ...]}
+    POST /embed         {"texts": [...]} -> {"embeddings": [[float, ...], ...]}, or
+                        {"embeddings": null} without a semantic stage
+    GET  /health        {"status": "ok"}
+    GET  /stats         batching, cache and model counters
+    GET  /metrics       stage latency histograms, Prometheus text format
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import tracing
+from chatbot import model_registry
+from chatbot.pipeline import IntentPipeline
+
+DEFAULT_PORT = 8765
+
+# Largest request accepted, in messages and in bytes
+MAX_TEXTS = 512
+MAX_BODY = 1024 * 1024
+
+
+# Pipeline method resolving each kind of job, called with a batch of texts
+_JOB_METHODS = {
+    "classify": "classify_many",
+    "classify_all": "classify_all_many",
+    "embed": "embed_many",
+}
+
+
+class _Job:
+    def __init__(self, kind, texts):
+        self.kind = kind
+        self.texts = texts
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class BatchingWorkerPool:
+    """Worker threads that resolve queued requests in coalesced batches"""
+
+    def __init__(self, pipeline, workers=2, max_batch=64, max_wait=0.005):
+        self.pipeline = pipeline
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "messages": 0, "batches": 0, "errors": 0, "busy_seconds": 0.0}
+        self._threads = [threading.Thread(target=self._run, name=f"inference-worker-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, texts, timeout, kind="classify"):
+        """Queue texts and wait for their results
+
+        Args:
+            texts (list): Messages to resolve
+            timeout (float): Seconds to wait for a worker to finish them
+            kind (str): "classify", "classify_all" or "embed"
+
+        Returns:
+            list: One result per message, as the pipeline method for kind
+                returns them; None for "embed" without a semantic stage
+
+        Raises:
+            TimeoutError: If no worker finishes the job in time
+        """
+        job = _Job(kind, texts)
+        self._queue.put(job)
+        if not job.done.wait(timeout):
+            raise TimeoutError("inference timed out")
+        if job.error is not None:
+            raise job.error
+        return job.results
+
+    def _collect(self):
+        """Block for one job, then take more until the batch is full or max_wait passes
+
+        Returns:
+            list: The jobs to run, or None once close() has been called
+        """
+        first = self._queue.get()
+        if first is None:
+            return None
+        jobs = [first]
+        size = len(jobs[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                # leave the shutdown marker for this worker's next round
+                self._queue.put(None)
+                break
+            jobs.append(job)
+            size += len(job.texts)
+        return jobs
+
+    def close(self):
+        """Stop the workers once the jobs already queued are done"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            jobs = self._collect()
+            if jobs is None:
+                return
+            by_kind = {}
+            for job in jobs:
+                by_kind.setdefault(job.kind, []).append(job)
+            for kind, group in by_kind.items():
+                self._run_batch(kind, group)
+
+    def _run_batch(self, kind, jobs):
+        texts = [text for job in jobs for text in job.texts]
+        started = time.perf_counter()
+        try:
+            results = getattr(self.pipeline, _JOB_METHODS[kind])(texts, batch_size=self.max_batch)
+        except Exception as e:
+            for job in jobs:
+                job.error = e
+                job.done.set()
+            with self._lock:
+                self._stats["errors"] += 1
+            return
+
+        offset = 0
+        for job in jobs:
+            job.results = None if results is None else results[offset:offset + len(job.texts)]
+            offset += len(job.texts)
+            job.done.set()
+        with self._lock:
+            self._stats["requests"] += len(jobs)
+            self._stats["messages"] += len(texts)
+            self._stats["batches"] += 1
+            self._stats["busy_seconds"] += time.perf_counter() - started
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        stats["workers"] = len(self._threads)
+        stats["mean_batch"] = stats["messages"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # set on the subclass made by make_server()
+    pool = None
+    timeout_seconds = None
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            body = tracing.export_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/stats":
+            self._reply(200, {
+                "batching": self.pool.stats(),
+                "caches": self.pool.pipeline.cache_stats(),
+                "models": model_registry.registry_stats(),
+            })
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path[1:] not in _JOB_METHODS:
+            self._reply(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            self._reply(413, {"error": "request too large"})
+            return
+        try:
+            texts = json.loads(self.rfile.read(length))["texts"]
+        except (ValueError, KeyError, TypeError):
+            self._reply(400, {"error": "expected {\"texts\": [...]}"})
+            return
+        if (not isinstance(texts, list) or len(texts) > MAX_TEXTS
+                or not all(isinstance(text, str) for text in texts)):
+            self._reply(400, {"error": f"texts must be a list of at most {MAX_TEXTS} strings"})
+            return
+
+        kind = self.path[1:]
+        try:
+            results = self.pool.submit(texts, self.timeout_seconds, kind)
+        except TimeoutError as e:
+            self._reply(503, {"error": str(e)})
+            return
+        except Exception as e:
+            self._reply(500, {"error": str(e)})
+            return
+
+        if kind == "classify":
+            payload = {"results": [list(result) for result in results]}
+        elif kind == "classify_all":
+            payload = {"results": [[list(result) for result in ranked] for ranked in results]}
+        else:
+            payload = {"embeddings": None if results is None else [emb.tolist() for emb in results]}
+        self._reply(200, payload)
+
+    def log_message(self, format, *args):
+        # one line per request would swamp the console under load
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 drops connections when many sessions ask at
+    # once, and the client only retries after a 1 s SYN timeout
+    request_queue_size = 128
+
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT, pipeline=None, workers=2,
+                max_batch=64, max_wait=0.005, timeout=10.0):
+    """Build the HTTP server; call serve_forever() on it to start serving
+
+    Args:
+        host (str): Interface to bind; keep it on loopback
+        port (int): Port to listen on, 0 for any free port
+        pipeline (IntentPipeline, optional): Pipeline to serve; a warmed one is built by default
+        workers (int): Threads running the pipeline
+        max_batch (int): Most messages resolved in one call
+        max_wait (float): Seconds a worker waits for more requests to batch
+        timeout (float): Seconds a request may wait for its results
+
+    Returns:
+        ThreadingHTTPServer: The server, with the worker pool as .pool
+    """
+    pool = BatchingWorkerPool(pipeline or IntentPipeline(warm_semantic=True), workers, max_batch, max_wait)
+    handler = type("InferenceHandler", (_Handler,), {"pool": pool, "timeout_seconds": timeout})
+    server = _Server((host, port), handler)
+    server.pool = pool
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the chatbot intent pipeline over local HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--spacy-model", default=model_registry.SPACY_MODEL)
+    args = parser.parse_args()
+
+    model_registry.SPACY_MODEL = args.spacy_model
+    server = make_server(args.host, args.port, workers=args.workers,
+                         max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+    print(f"Serving intents on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.close()
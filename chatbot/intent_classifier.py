@@ -1,57 +1,203 @@
-import spacy
 from spacy.matcher import Matcher, PhraseMatcher
 
+from chatbot import model_registry, query_cache
+from chatbot.keyword_prefilter import AMBIGUOUS, KeywordAutomaton, expand_token_pattern, first_match, tokenize
+
+_MISSING = object()
+
+TOKEN_PATTERNS = {
+    "greeting":              [[{"LOWER": {"IN": ["hello", "hi", "hey"]}}]],
+    "thanks":                [[{"LOWER": {"IN": ["thanks", "thank"]}}]],
+    "finding_clients": [
+        [{"LOWER": "find"}, {"LOWER": {"IN": ["client", "work", "gig"]}}],
+        [{"LOWER": {"IN": ["clients", "gigs"]}}, {"LOWER": "find"}]
+    ],
+    "pricing":               [[{"LOWER": {"IN": ["price", "pricing", "charge", "rate"]}}]],
+    "skill_improvement":     [[{"LOWER": {"IN": ["skill", "improve", "learn"]}}]],
+    "profile_tips":          [[{"LOWER": "profile"}, {"LOWER": {"IN": ["tip","improve","optimize"]}}]],
+    "analyze_skill_profile": [[{"LOWER": "analyze"}, {"LOWER": {"IN": ["skill","profile"]}}]],
+    "client_communication":  [[{"LOWER": {"IN": ["communication","communicate","talk"]}}]],
+    "time_management":       [[{"LOWER": {"IN": ["time","manage","management"]}}]],
+    "payment":               [[{"LOWER": {"IN": ["payment","invoice","billing"]}}]],
+    "contract":              [[{"LOWER": "contract"}]],
+    "feedback":              [[{"LOWER": {"IN": ["feedback","review"]}}]],
+    "gig_creation":          [[{"LOWER": "gig"}, {"LOWER": {"IN": ["tips","listing","create","effective"]}}]],
+    "success_strategies":    [[{"LOWER": {"IN": ["strategy","strategies","success"]}}]],
+}
+
+PHRASES = {
+    "finding_clients": ["how do i find my first client", "where to find freelance work"],
+    "pricing":          ["how should i price my services", "what should i charge"],
+    "skill_improvement":["what skills should i improve", "which skills to develop"],
+    "profile_tips":     ["tips to improve my profile", "how to optimize my profile"],
+    "analyze_skill_profile": ["analyze my skill profile", "profile analysis"],
+    "gig_creation":     ["tips for effective gig listings", "how to create a gig listing"],
+    "success_strategies":["what are the best freelancing strategies", "freelancing strategies"]
+}
+
+
+def rank_matches(matches, words):
+    """Intents of a message ranked by how much of it their patterns cover
+
+    A match lying inside a phrase match or a longer match of another intent
+    is part of that match and does not count, so "improve" in "tips to
+    improve my profile" does not make it a skill_improvement question.
+
+    Args:
+        matches (list): (start, end, label, is_phrase) per match
+        words (int): Words in the message; pattern tokens are whole words,
+            and unlike tokens the count does not depend on the tokenizer
+
+    Returns:
+        tuple: (intent, share of words covered) per intent, largest share
+            first and earliest first on ties
+    """
+    if len(matches) == 1:
+        start, end, label, _ = matches[0]
+        return ((label, (end - start) / words),)
+    covered = {}
+    first = {}
+    for start, end, label, phrase in matches:
+        if any(other != label and o_start <= start and end <= o_end
+               and (o_phrase > phrase or o_end - o_start > end - start)
+               for o_start, o_end, other, o_phrase in matches):
+            continue
+        covered.setdefault(label, set()).update(range(start, end))
+        first[label] = min(first.get(label, start), start)
+    ranked = sorted(covered, key=lambda label: (-len(covered[label]), first[label]))
+    return tuple((label, len(covered[label]) / words) for label in ranked)
+
+
 class IntentClassifier:
-    def __init__(self):
-        self.nlp = spacy.load("en_core_web_md")
+    def __init__(self, nlp=None, tokenizer_only=True, prefilter=True):
+        # Both matchers only compare LOWER, which the tokenizer already sets,
+        # so by default texts are only tokenized: no tagger, parser or NER.
+        # tokenizer_only=False runs the full pipeline on every message.
+        # With prefilter, plain messages are matched by a keyword automaton
+        # and spaCy only sees the rest.
+        if nlp is None:
+            nlp = model_registry.get_spacy(tokenizer_only=tokenizer_only)
+            # results are shared by every session using the shared pipeline
+            self.cache = model_registry.get_shared_cache(
+                ("intents", model_registry.SPACY_MODEL, tokenizer_only), query_cache.INTENT_CACHE_SIZE)
+        else:
+            self.cache = query_cache.LRUCache(query_cache.INTENT_CACHE_SIZE)
+        # shared, process-wide pipeline unless one is passed in
+        self.nlp = nlp
+        self.tokenizer_only = tokenizer_only
+        self.use_prefilter = prefilter
+        self._make_doc = nlp.make_doc if tokenizer_only else nlp
         self.matcher = Matcher(self.nlp.vocab)
         self.phrase_matcher = PhraseMatcher(self.nlp.vocab, attr="LOWER")
         self._init_patterns()
 
     def _init_patterns(self):
+        self.prefilter = KeywordAutomaton() if self.use_prefilter else None
         # --- token-level patterns ---
-        self.matcher.add("greeting", [[{"LOWER": {"IN": ["hello", "hi", "hey"]}}]])
-        self.matcher.add("thanks",   [[{"LOWER": {"IN": ["thanks", "thank"]}}]])
-        self.matcher.add("finding_clients", [
-            [{"LOWER": "find"}, {"LOWER": {"IN": ["client", "work", "gig"]}}],
-            [{"LOWER": {"IN": ["clients", "gigs"]}}, {"LOWER": "find"}]
-        ])
-        self.matcher.add("pricing", [[{"LOWER": {"IN": ["price", "pricing", "charge", "rate"]}}]])
-        self.matcher.add("skill_improvement", [[{"LOWER": {"IN": ["skill", "improve", "learn"]}}]])
-        self.matcher.add("profile_tips", [[{"LOWER": "profile"}, {"LOWER": {"IN": ["tip","improve","optimize"]}}]])
-        self.matcher.add("analyze_skill_profile", [[{"LOWER": "analyze"}, {"LOWER": {"IN": ["skill","profile"]}}]])
-        self.matcher.add("client_communication", [[{"LOWER": {"IN": ["communication","communicate","talk"]}}]])
-        self.matcher.add("time_management", [[{"LOWER": {"IN": ["time","manage","management"]}}]])
-        self.matcher.add("payment", [[{"LOWER": {"IN": ["payment","invoice","billing"]}}]])
-        self.matcher.add("contract", [[{"LOWER": "contract"}]])
-        self.matcher.add("feedback", [[{"LOWER": {"IN": ["feedback","review"]}}]])
-        self.matcher.add("gig_creation", [[{"LOWER": "gig"}, {"LOWER": {"IN": ["tips","listing","create","effective"]}}]])
-        self.matcher.add("success_strategies", [[{"LOWER": {"IN": ["strategy","strategies","success"]}}]])
+        for label, patterns in TOKEN_PATTERNS.items():
+            self.matcher.add(label, patterns)
+            if self.prefilter:
+                for pattern in patterns:
+                    for tokens in expand_token_pattern(pattern):
+                        self.prefilter.add(label, tokens)
 
         # --- phrase-level patterns (more natural) ---
-        phrases = {
-            "finding_clients": ["how do i find my first client", "where to find freelance work"],
-            "pricing":          ["how should i price my services", "what should i charge"],
-            "skill_improvement":["what skills should i improve", "which skills to develop"],
-            "profile_tips":     ["tips to improve my profile", "how to optimize my profile"],
-            "analyze_skill_profile": ["analyze my skill profile", "profile analysis"],
-            "gig_creation":     ["tips for effective gig listings", "how to create a gig listing"],
-            "success_strategies":["what are the best freelancing strategies", "freelancing strategies"]
-        }
-        for label, texts in phrases.items():
-            docs = [self.nlp(text) for text in texts]
+        for label, texts in PHRASES.items():
+            docs = [self.nlp.make_doc(text) for text in texts]
             self.phrase_matcher.add(label, None, *docs)
+            if self.prefilter:
+                for doc in docs:
+                    self.prefilter.add(label, tuple(token.lower_ for token in doc), phrase=True)
+
+        if self.prefilter:
+            self.prefilter.compile()
 
     def classify(self, text: str) -> str:
-        doc = self.nlp(text)
-        # 1) PhraseMatcher
+        return self._analyze(text)[0]
+
+    def classify_all(self, text):
+        """Every intent the patterns find in a message, see rank_matches()
+
+        Both come from the same pass over the message, so calling this
+        after classify() (or the other way round) is a cache hit.
+
+        Returns:
+            tuple: (intent, share of tokens covered) per intent, best first
+        """
+        return self._analyze(text)[1]
+
+    def _analyze(self, text):
+        key = query_cache.normalize(text)
+        return self.cache.get_or_compute(key, lambda: self._classify_key(key))
+
+    def _prefilter(self, key):
+        """(intent, ranked intents) found without spaCy, or AMBIGUOUS if spaCy has to decide"""
+        if self.prefilter is None:
+            return AMBIGUOUS
+        tokens = tokenize(key)
+        if tokens is None:
+            return AMBIGUOUS
+        matches = self.prefilter.find(tokens)
+        intent = first_match(matches)
+        if intent is AMBIGUOUS:
+            return AMBIGUOUS
+        return intent, rank_matches(matches, len(key.split()))
+
+    def _classify_key(self, key):
+        result = self._prefilter(key)
+        if result is AMBIGUOUS:
+            result = self._match(self._make_doc(key))
+        return result
+
+    def classify_many(self, texts, batch_size=256, n_process=1):
+        """Classify a batch of messages
+
+        Cached messages are answered from the cache and plain ones by the
+        keyword prefilter; the rest go through nlp.pipe in one pass,
+        optionally spread over several processes.
+
+        Args:
+            texts (list): Messages to classify
+            batch_size (int): Messages per nlp.pipe batch
+            n_process (int): Worker processes for nlp.pipe; only worth it with
+                the full pipeline, tokenizing alone is cheaper than shipping docs
+                between processes
+
+        Returns:
+            list: (intent or None, confidence) per message; rule matches
+                are certain, so confidence is 1.0 or 0.0
+        """
+        keys = [query_cache.normalize(text) for text in texts]
+        intents = {}
+        pending = []
+        for key in dict.fromkeys(keys):
+            result = self.cache.get(key, _MISSING)
+            if result is _MISSING:
+                result = self._prefilter(key)
+                if result is AMBIGUOUS:
+                    pending.append(key)
+                    continue
+                self.cache.put(key, result)
+            intents[key] = result[0]
+
+        # tokenizer-only mode skips every component, as classify() does
+        disable = self.nlp.pipe_names if self.tokenizer_only else []
+        docs = self.nlp.pipe(pending, batch_size=batch_size, n_process=n_process, disable=disable)
+        for key, doc in zip(pending, docs):
+            result = self._match(doc)
+            intents[key] = result[0]
+            self.cache.put(key, result)
+
+        return [(intents[key], 1.0 if intents[key] else 0.0) for key in keys]
+
+    def _match(self, doc):
+        """(intent, ranked intents) of a Doc, running each matcher once"""
+        strings = self.nlp.vocab.strings
         pm = self.phrase_matcher(doc)
-        if pm:
-            match_id, start, end = pm[0]
-            return self.nlp.vocab.strings[match_id]
-        # 2) Matcher
         m = self.matcher(doc)
-        if m:
-            match_id, start, end = m[0]
-            return self.nlp.vocab.strings[match_id]
-        return None
+        # 1) PhraseMatcher, 2) Matcher: the first match decides the intent
+        first = pm or m
+        intent = strings[first[0][0]] if first else None
+        matches = ([(start, end, strings[match_id], True) for match_id, start, end in pm]
+                   + [(start, end, strings[match_id], False) for match_id, start, end in m])
+        return intent, rank_matches(matches, len(doc.text.split()))
@@ -0,0 +1,212 @@
+# freelance_mongo/chatbot/intent_prototypes.py
+"""Example utterances per intent, embedded once and kept on disk
+
+The semantic fallback compares a query against every exemplar below and
+takes the best match, which separates intents far better than embedding
+the bare labels. The exemplar matrix is written to PROTOTYPE_DIR as a
+float32 .npy file named after the encoder and a hash of its weights and the
+exemplars, and later processes memory-map it instead of re-encoding anything.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+import numpy as np
+
+PROTOTYPE_DIR = "data/intent_prototypes"
+
+EXEMPLARS = {
+    "greeting": [
+        "hello", "hi", "hey there", "good morning", "good afternoon", "hi, is anyone there?",
+    ],
+    "thanks": [
+        "thank you", "thanks for the help", "much appreciated", "that was really helpful, thanks",
+        "cheers", "great, thank you so much",
+    ],
+    "finding_clients": [
+        "how do I get my first client", "where can I find freelance jobs", "how to land more projects",
+        "I have no clients yet", "best places to look for freelance work", "how do I attract clients",
+    ],
+    "pricing": [
+        "how much should I charge", "how do I set my rates", "is my price too high",
+        "should I charge hourly or per project", "how to price a project", "when should I raise my rates",
+    ],
+    "skill_improvement": [
+        "which skills should I learn", "how can I get better at my craft", "what courses should I take",
+        "I want to upskill", "how do I improve my abilities", "what should I study next",
+    ],
+    "profile_tips": [
+        "how can I make my profile stand out", "what should I write in my bio",
+        "how do I improve my freelancer profile", "does my profile need a photo",
+        "how to write a good profile headline", "make my profile more attractive to clients",
+    ],
+    "analyze_skill_profile": [
+        "analyze my skills", "review my skill set", "how do my skills compare to demand",
+        "which of my skills are in demand", "give me an analysis of my profile", "evaluate my skills",
+    ],
+    "client_communication": [
+        "how do I talk to clients", "how to reply to a client message", "dealing with a difficult client",
+        "how often should I update my client", "how to set expectations with a client",
+        "writing professional emails to clients",
+    ],
+    "time_management": [
+        "how do I manage my time", "I keep missing deadlines", "how to stay productive",
+        "how to balance several projects", "how do I avoid burnout", "how can I be more organised",
+    ],
+    "payment": [
+        "how do I get paid", "which payment method is best", "how to send an invoice",
+        "my client has not paid", "should I ask for a deposit", "how to handle late payments",
+    ],
+    "contract": [
+        "what goes in a freelance contract", "do I need a written agreement", "how to write a contract",
+        "contract terms to include", "should I sign an NDA", "how to protect myself legally",
+    ],
+    "feedback": [
+        "how to handle criticism from a client", "a client left a bad review", "how do I get more reviews",
+        "how to ask for feedback", "responding to negative feedback", "how to get testimonials",
+    ],
+    "gig_creation": [
+        "how do I write a good gig", "tips for creating a gig listing", "how to make my gig stand out",
+        "what makes an effective gig description", "how to title my gig", "how many gigs should I create",
+    ],
+    "success_strategies": [
+        "how do I succeed as a freelancer", "tips for freelance success", "how to grow my freelance business",
+        "what do successful freelancers do", "long term freelancing strategy", "how to build a sustainable career",
+    ],
+}
+
+
+class IntentPrototypes:
+    """Unit-length exemplar embeddings with the intent of each row"""
+
+    def __init__(self, matrix, labels):
+        self.matrix = matrix
+        self.labels = list(labels)
+        self.intents = list(dict.fromkeys(self.labels))
+        # row -> position in self.intents, for per-intent maxima
+        self._row_intent = np.array([self.intents.index(label) for label in self.labels])
+
+    def best(self, embedding):
+        """Find the closest exemplar to a unit-length query embedding
+
+        Returns:
+            tuple: (intent, cosine similarity)
+        """
+        scores = self.matrix @ embedding
+        row = int(np.argmax(scores))
+        return self.labels[row], float(scores[row])
+
+    def best_many(self, embeddings):
+        """Closest exemplar for each row of a matrix of unit-length queries
+
+        Returns:
+            list: (intent, cosine similarity) per query
+        """
+        scores = np.asarray(embeddings) @ self.matrix.T
+        rows = np.argmax(scores, axis=1)
+        best = scores[np.arange(len(rows)), rows]
+        return [(self.labels[row], float(score)) for row, score in zip(rows.tolist(), best.tolist())]
+
+    def intent_scores(self, embedding):
+        """Best cosine similarity for every intent
+
+        Returns:
+            dict: intent -> similarity of its closest exemplar
+        """
+        scores = self.matrix @ embedding
+        best = np.full(len(self.intents), -np.inf, dtype=scores.dtype)
+        np.maximum.at(best, self._row_intent, scores)
+        return dict(zip(self.intents, best.tolist()))
+
+
+def store_key(model_name, model_digest, exemplars=EXEMPLARS):
+    """File name stem for an encoder/exemplar combination
+
+    Changing the model's weights (model_digest, see
+    model_registry.get_model_digest) or any exemplar gives a new key, so a
+    stale matrix is never loaded.
+    """
+    digest = hashlib.sha256(json.dumps([model_name, model_digest, exemplars],
+                                       sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)}-{digest[:16]}"
+
+
+def build(encoder, exemplars=EXEMPLARS):
+    """Encode every exemplar
+
+    Args:
+        encoder: Object with a sentence-transformers style encode()
+        exemplars (dict): intent -> list of example utterances
+
+    Returns:
+        IntentPrototypes: The encoded exemplars
+    """
+    labels = [intent for intent, texts in exemplars.items() for _ in texts]
+    texts = [text for texts in exemplars.values() for text in texts]
+    matrix = encoder.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    return IntentPrototypes(np.ascontiguousarray(matrix, dtype=np.float32), labels)
+
+
+def save(prototypes, key, directory=None):
+    """Write the matrix and row labels under directory/key.*"""
+    directory = directory or PROTOTYPE_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, f"{key}.json"), "w") as f:
+        json.dump({"labels": prototypes.labels, "shape": list(prototypes.matrix.shape)}, f)
+
+    # Written to a temp file and renamed, so readers never map a partial matrix
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npy")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, prototypes.matrix)
+        os.replace(tmp_path, os.path.join(directory, f"{key}.npy"))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load(key, directory=None):
+    """Memory-map a saved matrix
+
+    Returns:
+        IntentPrototypes: The stored prototypes, or None if missing or damaged
+    """
+    directory = directory or PROTOTYPE_DIR
+    try:
+        with open(os.path.join(directory, f"{key}.json")) as f:
+            meta = json.load(f)
+        matrix = np.load(os.path.join(directory, f"{key}.npy"), mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+    if list(matrix.shape) != meta["shape"] or matrix.dtype != np.float32:
+        return None
+    return IntentPrototypes(matrix, meta["labels"])
+
+
+def load_or_build(model_name, model_digest, get_encoder, exemplars=EXEMPLARS, directory=None):
+    """Load the stored prototypes for an encoder, building them on first use
+
+    Args:
+        model_name (str): Encoder name, part of the store key
+        model_digest (str): Hash of the encoder's weights, part of the store key
+        get_encoder (callable): Returns the encoder; only called to build
+        exemplars (dict): intent -> list of example utterances
+        directory (str, optional): Store location; defaults to PROTOTYPE_DIR
+
+    Returns:
+        IntentPrototypes: The prototypes
+    """
+    key = store_key(model_name, model_digest, exemplars)
+    prototypes = load(key, directory)
+    if prototypes is None:
+        prototypes = build(get_encoder(), exemplars)
+        try:
+            save(prototypes, key, directory)
+        except OSError as e:
+            print(f"Could not save intent prototypes: {e}")
+    return prototypes
@@ -0,0 +1,147 @@
+# freelance_mongo/chatbot/keyword_prefilter.py
+"""Aho-Corasick keyword automaton that resolves plain messages without spaCy
+
+Patterns are sequences of lower-case tokens, so the automaton works on
+tokens instead of characters: one pass over a message finds every phrase
+and keyword pattern, however many there are.
+
+Only "plain" messages are tokenized here: words made of letters or digits,
+separated by spaces, with , ; : or . after a word. spaCy splits those the
+same way; anything else (apostrophes, hyphens, URLs, emoji...) returns None
+from tokenize() and is left to spaCy.
+"""
+import re
+from collections import deque
+from itertools import product
+
+_PLAIN = re.compile(r"(?:[a-z]+|[0-9]+)[,;:.]?(?: (?:[a-z]+|[0-9]+)[,;:.]?)*")
+_TOKEN = re.compile(r"[a-z]+|[0-9]+|[,;:.]")
+
+# verdicts of KeywordAutomaton.resolve()
+AMBIGUOUS = object()
+
+
+def tokenize(text):
+    """Split a normalized message the way spaCy would, if that is certain
+
+    Args:
+        text (str): Message as returned by query_cache.normalize()
+
+    Returns:
+        list: Lower-case tokens, or None if the message is not plain
+    """
+    if not _PLAIN.fullmatch(text):
+        return None
+    return _TOKEN.findall(text)
+
+
+def expand_token_pattern(pattern):
+    """Spell out a Matcher pattern of LOWER / LOWER IN specs as token tuples
+
+    Args:
+        pattern (list): Token specs, e.g. [{"LOWER": "find"}, {"LOWER": {"IN": ["client", "work"]}}]
+
+    Returns:
+        list: One tuple of tokens per combination
+    """
+    choices = []
+    for spec in pattern:
+        value = spec["LOWER"]
+        choices.append(value["IN"] if isinstance(value, dict) else [value])
+    return list(product(*choices))
+
+
+class KeywordAutomaton:
+    """Token-level Aho-Corasick automaton over the intent pattern table"""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        # (label, pattern length, is_phrase) per state
+        self._out = [[]]
+        self._compiled = True
+
+    def add(self, label, tokens, phrase=False):
+        """Add one pattern; call compile() once all are added
+
+        Args:
+            label (str): Intent the pattern stands for
+            tokens (tuple): Lower-case tokens of the pattern
+            phrase (bool): Phrase patterns take precedence over token patterns
+        """
+        state = 0
+        for token in tokens:
+            if token not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][token] = len(self._goto) - 1
+            state = self._goto[state][token]
+        self._out[state].append((label, len(tokens), phrase))
+        self._compiled = False
+
+    def compile(self):
+        """Build the failure links (breadth first, as in Aho-Corasick)"""
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for token, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        self._compiled = True
+
+    def find(self, tokens):
+        """Every pattern occurrence in a token list
+
+        Returns:
+            list: (start, end, label, is_phrase) per match
+        """
+        if not self._compiled:
+            self.compile()
+        matches = []
+        state = 0
+        for end, token in enumerate(tokens, 1):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for label, length, phrase in self._out[state]:
+                matches.append((end - length, end, label, phrase))
+        return matches
+
+    def resolve(self, tokens):
+        """Intent for a tokenized message, with the matchers' precedence
+
+        Any phrase match beats any token match, and within a kind the
+        earliest match wins. When two intents start at that same earliest
+        token the order is up to spaCy, so the message is left to it.
+
+        Returns:
+            str: The intent, None if nothing matches, or AMBIGUOUS
+        """
+        return first_match(self.find(tokens))
+
+
+def first_match(matches):
+    """Intent of the winning match, see KeywordAutomaton.resolve()
+
+    Args:
+        matches (list): (start, end, label, is_phrase) per match
+
+    Returns:
+        str: The intent, None if there are no matches, or AMBIGUOUS
+    """
+    if not matches:
+        return None
+    phrases = [m for m in matches if m[3]]
+    candidates = phrases or matches
+    first = min(start for start, _, _, _ in candidates)
+    labels = {label for start, _, label, _ in candidates if start == first}
+    if len(labels) > 1:
+        return AMBIGUOUS
+    return labels.pop()
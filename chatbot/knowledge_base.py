@@ -0,0 +1,348 @@
+# freelance_mongo/chatbot/knowledge_base.py
+"""Local knowledge base of advice snippets searched by embedding
+
+Tips from ResponseGenerator and any articles in ARTICLE_DIR are split into
+short snippets and embedded once. The embeddings live in an append-only
+float32 file under KB_DIR that is memory-mapped for search, so new
+snippets are added without rewriting the existing ones and later processes
+load nothing but the snippet texts.
+
+Small stores are searched exhaustively. From INDEX_MIN_ROWS snippets on,
+an inverted-file index is trained: rows are grouped under their closest
+k-means centroid and a query only scores the rows of its N_PROBE closest
+centroids. New rows join their closest group as they are added.
+
+Removing a tip or article does not remove its snippets; delete the store
+directory to rebuild from scratch.
+"""
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+
+import numpy as np
+
+KB_DIR = "data/knowledge_base"
+
+# Plain-text or markdown articles to index alongside the tips
+ARTICLE_DIR = "data/knowledge"
+
+# Longest snippet cut from an article, in words
+CHUNK_WORDS = 120
+
+# Snippets returned per query and the similarity they must reach
+TOP_K = 3
+MIN_SCORE = 0.45
+
+# Below this many snippets an exhaustive scan is fast enough
+INDEX_MIN_ROWS = 4096
+
+# Centroid groups scored per query; more is slower but misses less
+N_PROBE = 8
+
+_VECTORS = "vectors.f32"
+_LISTS = "lists.i32"
+_SNIPPETS = "snippets.jsonl"
+_CENTROIDS = "centroids.npy"
+_META = "meta.json"
+
+
+def chunk(text, max_words=CHUNK_WORDS):
+    """Split an article into snippets of whole sentences
+
+    Paragraphs are never merged; a paragraph longer than max_words is split
+    between sentences, and a single sentence longer than that between words.
+
+    Returns:
+        list: Snippet texts
+    """
+    chunks = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        words_in_chunk = []
+        for sentence in re.split(r"(?<=[.!?])\s+", " ".join(paragraph.split())):
+            words = sentence.split()
+            if words_in_chunk and len(words_in_chunk) + len(words) > max_words:
+                chunks.append(" ".join(words_in_chunk))
+                words_in_chunk = []
+            while len(words) > max_words:
+                chunks.append(" ".join(words[:max_words]))
+                words = words[max_words:]
+            words_in_chunk.extend(words)
+        if words_in_chunk:
+            chunks.append(" ".join(words_in_chunk))
+    return chunks
+
+
+def snippet(text, source, intent=None):
+    """A snippet record; its id is derived from source and text"""
+    digest = hashlib.sha1(f"{source}\0{text}".encode("utf-8")).hexdigest()[:16]
+    return {"id": digest, "text": text, "source": source, "intent": intent}
+
+
+def seed_snippets(article_dir=None):
+    """Snippets for the ResponseGenerator tips and every article in article_dir
+
+    Returns:
+        list: Snippet records
+    """
+    from chatbot.response_generator import TIPS
+
+    snippets = [snippet(tip, "tips", intent) for intent, tips in TIPS.items() for tip in tips]
+    paths = sorted(glob.glob(os.path.join(article_dir or ARTICLE_DIR, "*.md"))
+                   + glob.glob(os.path.join(article_dir or ARTICLE_DIR, "*.txt")))
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        snippets.extend(snippet(part, os.path.basename(path)) for part in chunk(text))
+    return snippets
+
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _append(path, valid_bytes, data):
+    """Append data after the first valid_bytes of a file, dropping anything beyond them"""
+    with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+        f.truncate(valid_bytes)
+        f.seek(valid_bytes)
+        f.write(data)
+
+
+class KnowledgeBase:
+    """Snippets and their unit-length embeddings, stored under one directory
+
+    meta.json is written last on every change and records how many rows
+    are valid, so a crash mid-append leaves the previous state readable.
+    It also records the digest of the model the rows were embedded with
+    (see model_registry.get_model_digest).
+
+    Args:
+        directory (str): Where the store lives
+        model_digest (str, optional): Digest of the model embedding new rows;
+            add() refuses rows if the store was embedded with another model
+    """
+
+    def __init__(self, directory, model_digest=None):
+        self.directory = directory
+        self._encoder_digest = model_digest
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        try:
+            with open(self._path(_META)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        self.dim = meta.get("dim")
+        self.count = meta.get("count", 0)
+        self.indexed_count = meta.get("indexed_count", 0)
+        # an empty store takes the digest of whatever model fills it
+        self.model_digest = meta.get("model_digest") if self.count else self._encoder_digest
+
+        self.snippets = []
+        self._snippet_bytes = 0
+        if self.count:
+            with open(self._path(_SNIPPETS), "rb") as f:
+                for _ in range(self.count):
+                    line = f.readline()
+                    self._snippet_bytes += len(line)
+                    self.snippets.append(json.loads(line))
+        self.ids = {s["id"] for s in self.snippets}
+        self.centroids = np.load(self._path(_CENTROIDS)) if self.indexed_count else None
+        self._map()
+
+    def _map(self):
+        """Memory-map the valid rows; called whenever they change"""
+        if self.count:
+            self.matrix = np.memmap(self._path(_VECTORS), dtype=np.float32, mode="r",
+                                    shape=(self.count, self.dim))
+            self.lists = np.memmap(self._path(_LISTS), dtype=np.int32, mode="r", shape=(self.count,))
+        else:
+            self.matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+            self.lists = np.zeros(0, dtype=np.int32)
+        # rows grouped by centroid, built on first indexed search
+        self._order = None
+        self._offsets = None
+
+    def _save_meta(self, count, indexed_count):
+        meta = {"dim": self.dim, "count": count, "indexed_count": indexed_count,
+                "model_digest": self.model_digest}
+        _write_atomic(self._path(_META), json.dumps(meta).encode("utf-8"))
+
+    def __len__(self):
+        return self.count
+
+    def add(self, snippets, embeddings):
+        """Append snippets with their unit-length embeddings
+
+        Args:
+            snippets (list): Snippet records, see snippet()
+            embeddings (np.ndarray): One row per snippet
+
+        Raises:
+            ValueError: If the embeddings don't match the snippets or the store's
+                size, or the store was embedded with another model
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2 or len(embeddings) != len(snippets):
+            raise ValueError("expected one embedding row per snippet")
+        if not snippets:
+            return
+        with self._lock:
+            if self._encoder_digest is not None and self.model_digest != self._encoder_digest:
+                raise ValueError(f"store was embedded with model {self.model_digest}, "
+                                 f"not {self._encoder_digest}")
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+            elif embeddings.shape[1] != self.dim:
+                raise ValueError(f"embeddings have {embeddings.shape[1]} dimensions, the store {self.dim}")
+
+            lists = (self._closest_centroid(embeddings) if self.centroids is not None
+                     else np.full(len(snippets), -1, dtype=np.int32))
+            lines = "".join(json.dumps(s) + "\n" for s in snippets).encode("utf-8")
+            _append(self._path(_VECTORS), self.count * self.dim * 4, embeddings.tobytes())
+            _append(self._path(_LISTS), self.count * 4, lists.tobytes())
+            _append(self._path(_SNIPPETS), self._snippet_bytes, lines)
+            self._save_meta(self.count + len(snippets), self.indexed_count)
+
+            self.count += len(snippets)
+            self.snippets.extend(snippets)
+            self.ids.update(s["id"] for s in snippets)
+            self._snippet_bytes += len(lines)
+            self._map()
+
+    def _closest_centroid(self, embeddings, block=8192):
+        lists = np.empty(len(embeddings), dtype=np.int32)
+        for start in range(0, len(embeddings), block):
+            lists[start:start + block] = np.argmax(embeddings[start:start + block] @ self.centroids.T, axis=1)
+        return lists
+
+    def build_index(self, n_lists=None, iterations=10, seed=0):
+        """Train k-means centroids on the stored rows and group every row under one
+
+        Args:
+            n_lists (int, optional): Number of centroids; sqrt(rows) by default
+            iterations (int): k-means rounds
+            seed (int): Seed for the initial centroids and the training sample
+        """
+        with self._lock:
+            if not self.count:
+                return
+            n_lists = min(n_lists or int(np.sqrt(self.count)), self.count)
+            rng = np.random.default_rng(seed)
+            # a sample is plenty to place the centroids
+            sample = np.asarray(self.matrix[np.sort(rng.choice(self.count, min(self.count, 32 * n_lists),
+                                                               replace=False))])
+            centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                assigned = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                order = np.argsort(assigned, kind="stable")
+                groups, starts = np.unique(assigned[order], return_index=True)
+                sums[groups] = np.add.reduceat(sample[order], starts)
+                # empty groups keep their old centroid
+                filled = np.linalg.norm(sums, axis=1) > 0
+                centroids[filled] = sums[filled] / np.linalg.norm(sums[filled], axis=1, keepdims=True)
+            self.centroids = centroids.astype(np.float32)
+
+            buffer = io.BytesIO()
+            np.save(buffer, self.centroids)
+            _write_atomic(self._path(_CENTROIDS), buffer.getvalue())
+            _write_atomic(self._path(_LISTS), self._closest_centroid(np.asarray(self.matrix)).tobytes())
+            self._save_meta(self.count, self.count)
+            self.indexed_count = self.count
+            self._map()
+
+    def _groups(self):
+        # call with the lock held
+        if self._order is None:
+            lists = np.asarray(self.lists)
+            self._order = np.argsort(lists, kind="stable").astype(np.int32)
+            self._offsets = np.searchsorted(lists[self._order], np.arange(len(self.centroids) + 1))
+        return self._order, self._offsets
+
+    def search(self, query, k=TOP_K, n_probe=N_PROBE):
+        """The k snippets closest to a unit-length query embedding
+
+        Args:
+            query (np.ndarray): Query embedding
+            k (int): Snippets to return
+            n_probe (int): Centroid groups to scan when the store is indexed
+
+        Returns:
+            list: (cosine similarity, snippet record), best first
+        """
+        # the lock only guards taking references to the current arrays: add()
+        # and build_index() replace them rather than change them in place,
+        # and the snippet list only grows, so concurrent searches run in parallel
+        with self._lock:
+            if not self.count:
+                return []
+            matrix, snippets, centroids = self.matrix, self.snippets, self.centroids
+            indexed = centroids is not None and self.count >= INDEX_MIN_ROWS
+            if indexed:
+                order, offsets = self._groups()
+
+        query = np.asarray(query, dtype=np.float32)
+        if not indexed:
+            rows = None
+            scores = matrix @ query
+        else:
+            probes = np.argpartition(-(centroids @ query), min(n_probe, len(centroids)) - 1)[:n_probe]
+            rows = np.sort(np.concatenate([order[offsets[p]:offsets[p + 1]] for p in probes]))
+            scores = matrix[rows] @ query
+
+        k = min(k, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        found = top if rows is None else rows[top]
+        return [(float(scores[i]), snippets[row]) for i, row in zip(top.tolist(), found.tolist())]
+
+
+def load_or_build(store_name, model_digest, get_encoder, snippets=None, directory=None):
+    """Open the store for an encoder and embed any snippets it is missing
+
+    Args:
+        store_name (str): Encoder name, part of the store's directory name
+        model_digest (str): Hash of the encoder's weights, the rest of the
+            directory name, so new weights under an old name get a new store
+        get_encoder (callable): Returns the encoder; only called if something is missing
+        snippets (list, optional): Snippet records; seed_snippets() by default
+        directory (str, optional): Parent directory; defaults to KB_DIR
+
+    Returns:
+        KnowledgeBase: The store
+    """
+    name = f"{re.sub(r'[^A-Za-z0-9_.-]', '_', store_name)}-{model_digest}"
+    kb = KnowledgeBase(os.path.join(directory or KB_DIR, name), model_digest)
+    snippets = seed_snippets() if snippets is None else snippets
+    missing = [s for s in dict((s["id"], s) for s in snippets).values() if s["id"] not in kb.ids]
+    if missing:
+        embeddings = get_encoder().encode([s["text"] for s in missing], convert_to_numpy=True,
+                                          normalize_embeddings=True)
+        kb.add(missing, embeddings)
+    # (re)train once the store is big enough, or has doubled since training
+    if len(kb) >= INDEX_MIN_ROWS and len(kb) > 2 * kb.indexed_count:
+        kb.build_index()
+    return kb
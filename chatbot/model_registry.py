@@ -0,0 +1,345 @@
+# freelance_mongo/chatbot/model_registry.py
+"""Process-wide registry of the chatbot's NLP models
+
+Every FreelanceSupportBot (one per Streamlit session) gets its spaCy
+pipeline, sentence encoder and intent prototypes from here, so a process
+holds one copy of each no matter how many sessions are open. Models are
+loaded on first use; concurrent first requests for the same model wait for
+a single load. Shared models must be treated as read-only.
+"""
+import hashlib
+import os
+import threading
+import time
+
+SPACY_MODEL = "en_core_web_md"
+ENCODER_MODEL = "paraphrase-MiniLM-L6-v2"
+
+# "torch" runs sentence-transformers, "onnx" the int8 export made by
+# chatbot.onnx_encoder, "auto" uses the export whenever it is present
+ENCODER_BACKEND = "auto"
+
+# Trained components of the spaCy English pipelines. The intent matchers
+# only read LOWER, which the tokenizer sets, so none of these are needed.
+SPACY_COMPONENTS = ["tok2vec", "tagger", "morphologizer", "parser", "senter",
+                    "attribute_ruler", "lemmatizer", "ner"]
+
+_entries = {}
+_entries_lock = threading.Lock()
+
+
+class _Entry:
+    """One registered model plus its load statistics"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.value = None
+        self.load_seconds = None
+        self.rss_delta = None
+        self.size_bytes = None
+        self.hits = 0
+
+
+def _rss_bytes():
+    """Resident set size of this process, or None where it cannot be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _param_bytes(value):
+    """Estimate the bytes held by a model's weights, or None if unknown"""
+    # intent prototypes
+    if hasattr(value, "matrix"):
+        value = value.matrix
+
+    # numpy arrays and torch tensors
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if hasattr(value, "element_size") and hasattr(value, "numel"):
+        return value.element_size() * value.numel()
+
+    # torch modules (the sentence encoder)
+    if hasattr(value, "parameters") and hasattr(value, "buffers"):
+        tensors = list(value.parameters()) + list(value.buffers())
+        return sum(t.element_size() * t.numel() for t in tensors)
+
+    # spaCy pipelines: static vectors plus each component's thinc weights
+    if hasattr(value, "vocab") and hasattr(value, "pipeline"):
+        total = int(value.vocab.vectors.data.nbytes)
+        for _, pipe in value.pipeline:
+            model = getattr(pipe, "model", None)
+            if model is None or not hasattr(model, "walk"):
+                continue
+            for node in model.walk():
+                for name in node.param_names:
+                    if node.has_param(name):
+                        total += int(node.get_param(name).nbytes)
+        return total
+
+    return None
+
+
+def get_or_load(key, loader):
+    """Get a shared model, loading it on first request
+
+    Args:
+        key (tuple): Identifies the model, e.g. ("spacy", "en_core_web_md")
+        loader (callable): Builds the model; called at most once per key
+
+    Returns:
+        The shared model
+    """
+    entry = _entries.get(key)
+    if entry is None:
+        with _entries_lock:
+            entry = _entries.setdefault(key, _Entry())
+
+    with entry.lock:
+        if entry.loaded:
+            entry.hits += 1
+            return entry.value
+
+        # Loading under the entry's own lock: other models can load meanwhile
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        value = loader()
+        entry.load_seconds = time.perf_counter() - started
+        rss_after = _rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            entry.rss_delta = rss_after - rss_before
+        entry.size_bytes = _param_bytes(value)
+        entry.value = value
+        entry.loaded = True
+        return value
+
+
+def get_spacy(name=None, tokenizer_only=False):
+    """Get the shared spaCy pipeline
+
+    Args:
+        name (str, optional): spaCy package name; defaults to SPACY_MODEL
+        tokenizer_only (bool): Load without any trained components, which
+            skips their weights and keeps only the tokenizer and vocab
+
+    Returns:
+        spacy.language.Language: The loaded pipeline
+    """
+    name = name or SPACY_MODEL
+
+    def load():
+        import spacy
+        if tokenizer_only:
+            return spacy.load(name, exclude=SPACY_COMPONENTS)
+        return spacy.load(name)
+
+    key = ("spacy", name, "tokenizer") if tokenizer_only else ("spacy", name)
+    return get_or_load(key, load)
+
+
+def encoder_backend(name=None):
+    """Backend get_encoder() uses for a model: "onnx" or "torch" """
+    if ENCODER_BACKEND != "auto":
+        return ENCODER_BACKEND
+    from chatbot import onnx_encoder
+    return "onnx" if onnx_encoder.is_available(name or ENCODER_MODEL) else "torch"
+
+
+def get_encoder(name=None):
+    """Get the shared sentence encoder
+
+    Args:
+        name (str, optional): Model name; defaults to ENCODER_MODEL
+
+    Returns:
+        SentenceTransformer or onnx_encoder.OnnxEncoder: The loaded encoder
+    """
+    name = name or ENCODER_MODEL
+    backend = encoder_backend(name)
+
+    def load():
+        if backend == "onnx":
+            from chatbot.onnx_encoder import OnnxEncoder
+            return OnnxEncoder(name)
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(name)
+
+    return get_or_load(("encoder", name, backend), load)
+
+
+def _checkpoint_dir(name, backend):
+    """Directory holding an encoder's weights and config, or None if not found locally"""
+    if backend == "onnx":
+        from chatbot import onnx_encoder
+        return onnx_encoder.model_dir(name)
+    if os.path.isdir(name):
+        return name
+    # sentence-transformers downloads hub models into the huggingface cache
+    try:
+        from huggingface_hub import snapshot_download
+        repo = name if "/" in name else f"sentence-transformers/{name}"
+        return snapshot_download(repo, local_files_only=True)
+    except Exception:
+        return None
+
+
+def _hash_files(directory, digest):
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if name.startswith("."):
+                continue
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, directory).encode("utf-8") + b"\0")
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+
+
+def get_model_digest(model_name=None):
+    """Get a hash of the weights and config of the encoder get_encoder() loads
+
+    Stores of embeddings are keyed by it, so new weights under an old name
+    (a new checkpoint, or an export with or without quantisation) never
+    read embeddings made by the old ones. The checkpoint files are hashed
+    when they can be found on disk; otherwise the encoder is loaded and its
+    tensors are hashed.
+
+    Args:
+        model_name (str, optional): Encoder name; defaults to ENCODER_MODEL
+
+    Returns:
+        str: 16 hex digits
+    """
+    model_name = model_name or ENCODER_MODEL
+    backend = encoder_backend(model_name)
+
+    def load():
+        digest = hashlib.sha256()
+        directory = _checkpoint_dir(model_name, backend)
+        if directory is not None:
+            _hash_files(directory, digest)
+        else:
+            for name, tensor in get_encoder(model_name).state_dict().items():
+                digest.update(name.encode("utf-8") + b"\0")
+                digest.update(tensor.detach().cpu().numpy().tobytes())
+        return digest.hexdigest()[:16]
+
+    return get_or_load(("model_digest", model_name, backend), load)
+
+
+def get_intent_prototypes(model_name=None):
+    """Get the shared intent exemplar matrix for an encoder
+
+    Memory-maps the copy saved by an earlier run when there is one; the
+    encoder is only loaded here if the exemplars must be encoded.
+
+    Args:
+        model_name (str, optional): Encoder name; defaults to ENCODER_MODEL
+
+    Returns:
+        intent_prototypes.IntentPrototypes: Exemplar embeddings and their intents
+    """
+    from chatbot import intent_prototypes
+
+    model_name = model_name or ENCODER_MODEL
+    backend = encoder_backend(model_name)
+    # int8 ONNX embeddings differ slightly, so each backend has its own store
+    store_name = model_name if backend == "torch" else f"{model_name}-{backend}"
+
+    def load():
+        return intent_prototypes.load_or_build(store_name, get_model_digest(model_name),
+                                               lambda: get_encoder(model_name))
+
+    return get_or_load(("intent_prototypes", model_name, backend), load)
+
+
+def get_knowledge_base(model_name=None):
+    """Get the shared knowledge base searched with an encoder's embeddings
+
+    Opens the store saved by an earlier run and only embeds snippets it does
+    not hold yet, loading the encoder just for those.
+
+    Args:
+        model_name (str, optional): Encoder name; defaults to ENCODER_MODEL
+
+    Returns:
+        knowledge_base.KnowledgeBase: The snippet store
+    """
+    from chatbot import knowledge_base
+
+    model_name = model_name or ENCODER_MODEL
+    backend = encoder_backend(model_name)
+    store_name = model_name if backend == "torch" else f"{model_name}-{backend}"
+
+    def load():
+        return knowledge_base.load_or_build(store_name, get_model_digest(model_name),
+                                            lambda: get_encoder(model_name))
+
+    return get_or_load(("knowledge_base", model_name, backend), load)
+
+
+def get_shared_cache(key, max_size):
+    """Get a query cache shared by every classifier built on the same model
+
+    Registered here so it lives exactly as long as the models it was
+    filled from; clear() drops both.
+
+    Args:
+        key (tuple): Identifies the cache, e.g. ("intents", "en_core_web_md")
+        max_size (int): Entries kept if the cache is created by this call
+
+    Returns:
+        query_cache.LRUCache: The cache
+    """
+    from chatbot import query_cache
+
+    return get_or_load(("cache",) + tuple(key), lambda: query_cache.LRUCache(max_size))
+
+
+def _label(key):
+    return ":".join(str(part) for part in key)
+
+
+def registry_stats():
+    """Get load time, memory and reuse figures for every registered model
+
+    rss_delta is the change in process RSS across the load, so it includes
+    allocator overhead and is only approximate if two models load at once.
+
+    Returns:
+        dict: Per-model stats keyed by "kind:name", plus a "total" entry
+    """
+    with _entries_lock:
+        entries = list(_entries.items())
+
+    models = {}
+    total = {"models": 0, "load_seconds": 0.0, "size_bytes": 0, "hits": 0}
+    for key, entry in entries:
+        with entry.lock:
+            if not entry.loaded:
+                continue
+            stats = {
+                "load_seconds": entry.load_seconds,
+                "rss_delta": entry.rss_delta,
+                "size_bytes": entry.size_bytes,
+                "hits": entry.hits,
+            }
+        models[_label(key)] = stats
+        total["models"] += 1
+        total["load_seconds"] += stats["load_seconds"]
+        total["size_bytes"] += stats["size_bytes"] or 0
+        total["hits"] += stats["hits"]
+
+    total["rss"] = _rss_bytes()
+    models["total"] = total
+    return models
+
+
+def clear():
+    """Forget every registered model so the next request reloads it"""
+    with _entries_lock:
+        _entries.clear()
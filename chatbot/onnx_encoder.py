@@ -0,0 +1,142 @@
+# freelance_mongo/chatbot/onnx_encoder.py
+"""Torch-free sentence encoder running an int8 ONNX export of the model
+
+Export once (needs torch, sentence-transformers and onnxruntime):
+
+    python -m chatbot.onnx_encoder paraphrase-MiniLM-L6-v2
+
+After that the chatbot only needs onnxruntime and tokenizers at run time;
+model_registry picks this encoder automatically when the export exists.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import re
+
+import numpy as np
+
+ONNX_DIR = "data/onnx"
+
+
+def model_dir(model_name):
+    """Directory holding the export of a model"""
+    return os.path.join(ONNX_DIR, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+
+
+def is_available(model_name):
+    """Check that an export exists and its runtime dependencies are installed"""
+    directory = model_dir(model_name)
+    return (os.path.exists(os.path.join(directory, "model.onnx"))
+            and os.path.exists(os.path.join(directory, "tokenizer.json"))
+            and importlib.util.find_spec("onnxruntime") is not None
+            and importlib.util.find_spec("tokenizers") is not None)
+
+
+class OnnxEncoder:
+    """Mean-pooled transformer embeddings with a sentence-transformers style encode()"""
+
+    def __init__(self, model_name):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        directory = model_dir(model_name)
+        with open(os.path.join(directory, "config.json")) as f:
+            self.config = json.load(f)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_id"], pad_token=self.config["pad_token"])
+
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(directory, "model.onnx"), providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        """Embed one sentence or a list of sentences
+
+        Returns:
+            numpy.ndarray: A float32 vector for one sentence, else one row per sentence
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                     "attention_mask": mask}
+            if "token_type_ids" in self._inputs:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            hidden = self.session.run(None, feeds)[0]
+            # mean over real tokens, as the sentence-transformers pooling layer does
+            weights = mask[..., None].astype(np.float32)
+            batches.append((hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9))
+
+        embeddings = np.concatenate(batches).astype(np.float32) if batches else np.zeros((0, 0), np.float32)
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
+
+def export(model_name, quantize=True):
+    """Export a sentence-transformers model to ONNX, optionally int8-quantised
+
+    Args:
+        model_name (str): sentence-transformers model name
+        quantize (bool): Store dynamically quantised int8 weights
+
+    Returns:
+        str: Directory the export was written to
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    directory = model_dir(model_name)
+    os.makedirs(directory, exist_ok=True)
+
+    sample = tokenizer(["an example sentence"], return_tensors="pt")
+    names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    fp32_path = os.path.join(directory, "model.fp32.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in names),
+            fp32_path,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "tokens"} for name in names + ["last_hidden_state"]},
+            opset_version=14,
+        )
+
+    target = os.path.join(directory, "model.onnx")
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, target, weight_type=QuantType.QInt8)
+        os.remove(fp32_path)
+    else:
+        os.replace(fp32_path, target)
+
+    tokenizer.backend_tokenizer.save(os.path.join(directory, "tokenizer.json"))
+    with open(os.path.join(directory, "config.json"), "w") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_seq_length": model.max_seq_length,
+            "pad_id": tokenizer.pad_token_id,
+            "pad_token": tokenizer.pad_token,
+            "quantized": quantize,
+        }, f, indent=2)
+    return directory
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a sentence encoder to ONNX")
+    parser.add_argument("model", nargs="?", default="paraphrase-MiniLM-L6-v2")
+    parser.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+    print(f"Exported to {export(args.model, quantize=not args.no_quantize)}")
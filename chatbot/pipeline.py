@@ -0,0 +1,161 @@
+# freelance_mongo/chatbot/pipeline.py
+"""Intent resolution shared by every bot: rules first, semantic fallback second
+
+Nothing here depends on the user, so one pipeline can serve any number of
+bots, in-process or behind chatbot.inference_server.
+"""
+import tracing
+from chatbot import semantic_fallback
+from chatbot.intent_classifier import IntentClassifier
+from chatbot.semantic_fallback import SemanticFallback
+
+
+class IntentPipeline:
+    def __init__(self, warm_semantic=True):
+        self.intent_clf = IntentClassifier()
+        # the semantic stage (torch + MiniLM) is only needed when the rules
+        # miss, so build it on first use; warming it in the background means
+        # that first miss rarely has to wait
+        self._semantic_clf = None
+        self._semantic_unavailable = False
+        if warm_semantic:
+            semantic_fallback.warm_up()
+
+    @property
+    def semantic_clf(self):
+        """The semantic fallback classifier, or None if it cannot be loaded"""
+        if self._semantic_clf is None and not self._semantic_unavailable:
+            try:
+                self._semantic_clf = SemanticFallback()
+            except (ImportError, OSError) as e:
+                # rules-only mode, e.g. sentence-transformers not installed
+                print(f"Semantic fallback unavailable: {e}")
+                self._semantic_unavailable = True
+        return self._semantic_clf
+
+    def classify(self, text):
+        """Resolve the intent of one message
+
+        Returns:
+            tuple: (intent or None, confidence, stage), stage being
+                "rules", "semantic" or None
+        """
+        # 1) rule-based matcher
+        with tracing.span("rules"):
+            intent = self.intent_clf.classify(text)
+        if intent:
+            return intent, 1.0, "rules"
+
+        # 2) semantic fallback
+        with tracing.span("semantic"):
+            semantic_clf = self.semantic_clf
+            if semantic_clf is None:
+                return None, 0.0, None
+            intent, score = semantic_clf.classify_many([text])[0]
+        return intent, score, "semantic" if intent else None
+
+    def classify_all(self, text):
+        """Resolve every intent of one message, best first
+
+        Rule matches are ranked by the share of the message their patterns
+        cover plus, when the encoder is already loaded and there is an
+        order to decide, the message's similarity to each intent. When the
+        rules find nothing, every intent the semantic stage scores above
+        its threshold is returned. The message is tokenized once and
+        embedded at most once; the embedding is cached for embedder().
+
+        Returns:
+            list: (intent, confidence, stage) per intent; empty if none
+        """
+        with tracing.span("rules"):
+            ranked = self.intent_clf.classify_all(text)
+        if ranked:
+            scores = {}
+            # never wait for the model just to order rule matches
+            if len(ranked) > 1 and self._semantic_clf is not None:
+                with tracing.span("semantic"):
+                    scores = self._semantic_clf.intent_scores(text)
+            # sorted() is stable, so equal scores keep the coverage order
+            ranked = sorted(ranked, key=lambda r: -(r[1] + scores.get(r[0], 0.0)))
+            return [(intent, 1.0, "rules") for intent, _ in ranked]
+
+        with tracing.span("semantic"):
+            semantic_clf = self.semantic_clf
+            if semantic_clf is None:
+                return []
+            scores = semantic_clf.intent_scores(text)
+        return [(intent, score, "semantic")
+                for intent, score in sorted(scores.items(), key=lambda x: -x[1])
+                if score > semantic_clf.threshold]
+
+    def classify_many(self, texts, batch_size=64, n_process=1):
+        """Resolve intents for a batch of messages, e.g. to relabel support logs
+
+        Runs the rules over the whole batch first, then sends only the
+        messages they missed to the semantic stage in batches.
+
+        Args:
+            texts (list): Messages to classify
+            batch_size (int): Batch size for spaCy and the encoder
+            n_process (int): Worker processes for spaCy
+
+        Returns:
+            list: (intent or None, confidence, stage) per message
+        """
+        with tracing.span("rules_batch"):
+            results = [(intent, score, "rules" if intent else None)
+                       for intent, score in self.intent_clf.classify_many(texts, batch_size, n_process)]
+
+        missed = [i for i, (intent, _, _) in enumerate(results) if not intent]
+        semantic_clf = self.semantic_clf if missed else None
+        if semantic_clf:
+            with tracing.span("semantic_batch"):
+                matches = semantic_clf.classify_many([texts[i] for i in missed], batch_size)
+            for i, (intent, score) in zip(missed, matches):
+                results[i] = (intent, score, "semantic" if intent else None)
+        return results
+
+    def classify_all_many(self, texts, batch_size=64):
+        """classify_all() for a batch of messages, with batched spaCy and encoder calls
+
+        The rules run over the whole batch first; the messages whose result
+        needs the semantic stage are then embedded together, so the
+        per-message classify_all() calls only hit the caches.
+
+        Returns:
+            list: classify_all() result per message
+        """
+        with tracing.span("rules_batch"):
+            self.intent_clf.classify_many(texts, batch_size)
+            ranked = [self.intent_clf.classify_all(text) for text in texts]
+
+        # misses need the semantic stage; ties between rule matches only use it if loaded
+        semantic_clf = self.semantic_clf if not all(ranked) else self._semantic_clf
+        wanted = [text for text, matches in zip(texts, ranked) if len(matches) != 1]
+        if semantic_clf is not None and wanted:
+            with tracing.span("semantic_batch"):
+                semantic_clf.embed_many(wanted, batch_size)
+        return [self.classify_all(text) for text in texts]
+
+    def embed_many(self, texts, batch_size=64):
+        """Embeddings of several messages from the semantic stage
+
+        Returns:
+            list: One embedding per message, or None without a semantic stage
+        """
+        semantic_clf = self.semantic_clf
+        if semantic_clf is None:
+            return None
+        with tracing.span("semantic_batch"):
+            return semantic_clf.embed_many(texts, batch_size)
+
+    def embedder(self):
+        """embed() of the semantic stage if it is already loaded, else None"""
+        return self._semantic_clf.embed if self._semantic_clf is not None else None
+
+    def cache_stats(self):
+        """Hit/miss/eviction counters of the shared intent and embedding caches"""
+        stats = {"intents": self.intent_clf.cache.stats()}
+        if self._semantic_clf is not None:
+            stats["embeddings"] = self._semantic_clf.cache.stats()
+        return stats
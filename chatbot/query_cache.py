@@ -0,0 +1,85 @@
+# freelance_mongo/chatbot/query_cache.py
+"""Bounded LRU caches for per-query chatbot work
+
+The support page's topic buttons send the same questions from every
+session, so intents and query embeddings are cached on normalised text and
+shared by all bots using the same model.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+# Entries kept per cache; an embedding is ~1.5 KB, an intent a few bytes
+INTENT_CACHE_SIZE = 4096
+EMBEDDING_CACHE_SIZE = 2048
+
+_MISSING = object()
+
+
+def normalize(text):
+    """Cache key for a message: lower case, single spaces, no trailing ?!.
+
+    The matchers compare lower-cased tokens and the encoder is uncased, so
+    these variants classify the same way.
+    """
+    return re.sub(r"[\s?!.]+$", "", " ".join(text.lower().split()))
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with hit/miss/eviction counters"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss
+
+        compute() runs outside the lock, so a slow model call never blocks
+        other sessions' lookups.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Get the counters, current size and hit ratio"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
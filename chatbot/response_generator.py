@@ -1,12 +1,148 @@
 import random
-import database as db
+from chatbot import knowledge_base, model_registry, user_context
+
+
+# Advice shown by the intent handlers, also indexed by the knowledge base
+TIPS = {
+    "finding_clients": [
+        "Complete your profile with all relevant skills and experience",
+        "Create impressive portfolio samples that showcase your capabilities",
+        "Set competitive rates initially to build a good reputation",
+        "Write personalized proposals for each job",
+        "Network with other freelancers in your field",
+        "Ask satisfied clients for referrals",
+        "Consider specializing in a niche to stand out",
+        "Be proactive in looking for gigs - don't just wait for clients to find you",
+        "Follow up with potential clients professionally"
+    ],
+    "pricing": [
+        "Research market rates for your skills and experience level",
+        "Consider the complexity and urgency of each project",
+        "Factor in your overhead costs and desired profit margin",
+        "Value your time including research, communication, and revisions",
+        "Consider offering package deals for related services",
+        "Gradually increase your rates as you gain more experience and positive reviews",
+        "Be clear about what's included in your price and what costs extra",
+        "Consider different pricing models: hourly, project-based, or retainer",
+        "Don't undervalue yourself - quality clients are willing to pay for quality work"
+    ],
+    "skill_improvement": [
+        "Take online courses in your field (check our Courses page for recommendations)",
+        "Join professional communities and forums to learn from peers",
+        "Work on personal projects to practice new techniques",
+        "Read industry blogs, books, and publications",
+        "Attend webinars and virtual conferences",
+        "Follow experts in your field on social media",
+        "Seek feedback on your work from experienced professionals",
+        "Collaborate with other freelancers on projects",
+        "Set aside dedicated time each week for learning"
+    ],
+    "profile_tips": [
+        "Use a professional profile picture",
+        "Write a compelling bio that highlights your unique value proposition",
+        "Showcase your best and most relevant work in your portfolio",
+        "Include specific metrics and results from past projects",
+        "Highlight your educational background and certifications",
+        "List all your relevant skills with accurate proficiency levels",
+        "Add testimonials from satisfied clients",
+        "Keep your profile updated with your latest accomplishments",
+        "Use keywords relevant to your industry to improve searchability"
+    ],
+    "client_communication": [
+        "Respond promptly to client messages, even if just to acknowledge receipt",
+        "Set clear expectations about communication channels and response times",
+        "Use professional language and check for errors before sending",
+        "Ask clarifying questions to fully understand the client's needs",
+        "Provide regular updates on project progress",
+        "Document important decisions and agreements in writing",
+        "Be honest about challenges and propose solutions",
+        "Listen actively to client feedback and concerns",
+        "Express gratitude for the opportunity to work together"
+    ],
+    "time_management": [
+        "Use time tracking tools to understand how you spend your working hours",
+        "Break projects into smaller, manageable tasks with deadlines",
+        "Set realistic timelines and build in buffer time for unexpected issues",
+        "Use the Pomodoro Technique (25 minutes of focus, then a short break)",
+        "Batch similar tasks together to minimize context switching",
+        "Schedule dedicated time for client communication",
+        "Learn to say no to projects that don't align with your goals or availability",
+        "Create and follow a consistent daily routine",
+        "Use project management tools to stay organized"
+    ],
+    "payment": [
+        "Always use professional invoices with all the necessary details",
+        "Set clear payment terms and deadlines upfront",
+        "Consider requiring a deposit before starting work",
+        "Keep track of all your invoices and payments for tax purposes",
+        "Use secure payment platforms that protect both you and the client",
+        "Follow up politely but firmly on overdue payments",
+        "Consider offering multiple payment methods for client convenience",
+        "Include your payment terms in your contract",
+        "Keep receipts for all business expenses for tax deductions"
+    ],
+    "contract": [
+        "Always use written contracts, even for small projects",
+        "Clearly define the scope of work and deliverables",
+        "Include payment terms, amounts, and deadlines",
+        "Specify the project timeline and milestones",
+        "Address ownership and copyright of the work",
+        "Include a process for handling revisions and changes to the scope",
+        "Consider adding a kill fee for canceled projects",
+        "Specify confidentiality terms if necessary",
+        "Consider having a lawyer review your contract template"
+    ],
+    "feedback": [
+        "Ask for specific feedback on your completed projects",
+        "Be open to constructive criticism without taking it personally",
+        "Thank clients for their feedback, even if it's negative",
+        "Use feedback to identify patterns and areas for improvement",
+        "Implement relevant suggestions in future projects",
+        "Ask clarifying questions if feedback is vague",
+        "Create a system for collecting and organizing feedback",
+        "Share positive feedback (with permission) as testimonials",
+        "Follow up with clients after implementing their suggestions"
+    ],
+    "gig_creation": [
+        "Use a clear, specific title that includes your main skill and deliverable",
+        "Break down your services into different packages or tiers",
+        "Include realistic delivery timeframes for each package",
+        "Be specific about what's included and what costs extra",
+        "Add eye-catching visuals that showcase your work",
+        "Highlight your unique selling point - what makes your service special",
+        "List the exact deliverables the client will receive",
+        "Address common client concerns or questions in your description",
+        "Include relevant keywords to help clients find your gig",
+        "Set appropriate expectations about revisions and communication"
+    ],
+    "success_strategies": [
+        "Specialize in a niche rather than being a generalist to command higher rates",
+        "Build a personal brand that showcases your unique value proposition",
+        "Create systems and templates to streamline repetitive tasks",
+        "Develop excellent communication skills to build client trust",
+        "Always deliver more value than the client expects",
+        "Network consistently, not just when you need work",
+        "Learn to spot and avoid problem clients early",
+        "Continuously update your skills to stay competitive",
+        "Seek long-term relationships rather than one-off projects",
+        "Set aside time for marketing even when you're busy with client work"
+    ],
+}
 
 
 class ResponseGenerator:
     def __init__(self, user_id=None, user_name=None, user_skills=None):
         self.user_id = user_id
         self.user_name = user_name
-        self.user_skills = user_skills
+        # only used without a user_id; users' skills come from their snapshot
+        self._user_skills = user_skills
+
+    @property
+    def user_skills(self):
+        """The user's current skills, from the cached context snapshot"""
+        if self.user_id:
+            return user_context.get_context(self.user_id).skills
+        return self._user_skills
 
     def get_greeting(self):
         """Return a greeting response"""
@@ -30,17 +166,7 @@ class ResponseGenerator:
         """Return advice on finding clients"""
         response = "Here are some tips for finding clients and gigs:\n\n"
 
-        tips = [
-            "Complete your profile with all relevant skills and experience",
-            "Create impressive portfolio samples that showcase your capabilities",
-            "Set competitive rates initially to build a good reputation",
-            "Write personalized proposals for each job",
-            "Network with other freelancers in your field",
-            "Ask satisfied clients for referrals",
-            "Consider specializing in a niche to stand out",
-            "Be proactive in looking for gigs - don't just wait for clients to find you",
-            "Follow up with potential clients professionally"
-        ]
+        tips = TIPS["finding_clients"]
 
         # Add 5 random tips
         sampled_tips = random.sample(tips, 5)
@@ -60,17 +186,7 @@ class ResponseGenerator:
         """Return advice on pricing"""
         response = "Setting the right price is crucial for freelance success. Here's my advice:\n\n"
 
-        pricing_tips = [
-            "Research market rates for your skills and experience level",
-            "Consider the complexity and urgency of each project",
-            "Factor in your overhead costs and desired profit margin",
-            "Value your time including research, communication, and revisions",
-            "Consider offering package deals for related services",
-            "Gradually increase your rates as you gain more experience and positive reviews",
-            "Be clear about what's included in your price and what costs extra",
-            "Consider different pricing models: hourly, project-based, or retainer",
-            "Don't undervalue yourself - quality clients are willing to pay for quality work"
-        ]
+        pricing_tips = TIPS["pricing"]
 
         # Add 5 random tips
         sampled_tips = random.sample(pricing_tips, 5)
@@ -91,17 +207,7 @@ class ResponseGenerator:
         """Return advice on skill improvement"""
         response = "Continuous learning is essential for freelancers. Here are ways to improve your skills:\n\n"
 
-        learning_tips = [
-            "Take online courses in your field (check our Courses page for recommendations)",
-            "Join professional communities and forums to learn from peers",
-            "Work on personal projects to practice new techniques",
-            "Read industry blogs, books, and publications",
-            "Attend webinars and virtual conferences",
-            "Follow experts in your field on social media",
-            "Seek feedback on your work from experienced professionals",
-            "Collaborate with other freelancers on projects",
-            "Set aside dedicated time each week for learning"
-        ]
+        learning_tips = TIPS["skill_improvement"]
 
         # Add 5 random tips
         sampled_tips = random.sample(learning_tips, 5)
@@ -110,10 +216,8 @@ class ResponseGenerator:
 
         # Personalized course recommendation if skills are available
         if self.user_id:
-            from recommenders import recommend_courses
-            courses = recommend_courses(self.user_id, 1)
-            if courses:
-                course = courses[0]
+            course = user_context.get_context(self.user_id).top_course
+            if course:
                 response += f"\nBased on your profile, you might benefit from taking '{course['title']}' on {course['provider']}."
 
         return response
@@ -122,17 +226,7 @@ class ResponseGenerator:
         """Return advice on improving freelancer profile"""
         response = "A strong profile attracts more clients. Here's how to improve yours:\n\n"
 
-        profile_tips = [
-            "Use a professional profile picture",
-            "Write a compelling bio that highlights your unique value proposition",
-            "Showcase your best and most relevant work in your portfolio",
-            "Include specific metrics and results from past projects",
-            "Highlight your educational background and certifications",
-            "List all your relevant skills with accurate proficiency levels",
-            "Add testimonials from satisfied clients",
-            "Keep your profile updated with your latest accomplishments",
-            "Use keywords relevant to your industry to improve searchability"
-        ]
+        profile_tips = TIPS["profile_tips"]
 
         # Add 5 random tips
         sampled_tips = random.sample(profile_tips, 5)
@@ -145,17 +239,7 @@ class ResponseGenerator:
         """Return advice on client communication"""
         response = "Good communication is key to successful freelancing. Here are some tips:\n\n"
 
-        communication_tips = [
-            "Respond promptly to client messages, even if just to acknowledge receipt",
-            "Set clear expectations about communication channels and response times",
-            "Use professional language and check for errors before sending",
-            "Ask clarifying questions to fully understand the client's needs",
-            "Provide regular updates on project progress",
-            "Document important decisions and agreements in writing",
-            "Be honest about challenges and propose solutions",
-            "Listen actively to client feedback and concerns",
-            "Express gratitude for the opportunity to work together"
-        ]
+        communication_tips = TIPS["client_communication"]
 
         # Add 5 random tips
         sampled_tips = random.sample(communication_tips, 5)
@@ -168,17 +252,7 @@ class ResponseGenerator:
         """Return advice on time management"""
         response = "Effective time management is crucial for freelancers. Here's how to improve:\n\n"
 
-        time_tips = [
-            "Use time tracking tools to understand how you spend your working hours",
-            "Break projects into smaller, manageable tasks with deadlines",
-            "Set realistic timelines and build in buffer time for unexpected issues",
-            "Use the Pomodoro Technique (25 minutes of focus, then a short break)",
-            "Batch similar tasks together to minimize context switching",
-            "Schedule dedicated time for client communication",
-            "Learn to say no to projects that don't align with your goals or availability",
-            "Create and follow a consistent daily routine",
-            "Use project management tools to stay organized"
-        ]
+        time_tips = TIPS["time_management"]
 
         # Add 5 random tips
         sampled_tips = random.sample(time_tips, 5)
@@ -191,17 +265,7 @@ class ResponseGenerator:
         """Return advice on payments and invoicing"""
         response = "Managing payments properly is essential for freelancers. Here's my advice:\n\n"
 
-        payment_tips = [
-            "Always use professional invoices with all the necessary details",
-            "Set clear payment terms and deadlines upfront",
-            "Consider requiring a deposit before starting work",
-            "Keep track of all your invoices and payments for tax purposes",
-            "Use secure payment platforms that protect both you and the client",
-            "Follow up politely but firmly on overdue payments",
-            "Consider offering multiple payment methods for client convenience",
-            "Include your payment terms in your contract",
-            "Keep receipts for all business expenses for tax deductions"
-        ]
+        payment_tips = TIPS["payment"]
 
         # Add 5 random tips
         sampled_tips = random.sample(payment_tips, 5)
@@ -214,17 +278,7 @@ class ResponseGenerator:
         """Return advice on contracts"""
         response = "Good contracts protect both you and your clients. Here's what to consider:\n\n"
 
-        contract_tips = [
-            "Always use written contracts, even for small projects",
-            "Clearly define the scope of work and deliverables",
-            "Include payment terms, amounts, and deadlines",
-            "Specify the project timeline and milestones",
-            "Address ownership and copyright of the work",
-            "Include a process for handling revisions and changes to the scope",
-            "Consider adding a kill fee for canceled projects",
-            "Specify confidentiality terms if necessary",
-            "Consider having a lawyer review your contract template"
-        ]
+        contract_tips = TIPS["contract"]
 
         # Add 5 random tips
         sampled_tips = random.sample(contract_tips, 5)
@@ -239,17 +293,7 @@ class ResponseGenerator:
         """Return advice on handling feedback"""
         response = "Feedback is valuable for your growth as a freelancer. Here's how to handle it effectively:\n\n"
 
-        feedback_tips = [
-            "Ask for specific feedback on your completed projects",
-            "Be open to constructive criticism without taking it personally",
-            "Thank clients for their feedback, even if it's negative",
-            "Use feedback to identify patterns and areas for improvement",
-            "Implement relevant suggestions in future projects",
-            "Ask clarifying questions if feedback is vague",
-            "Create a system for collecting and organizing feedback",
-            "Share positive feedback (with permission) as testimonials",
-            "Follow up with clients after implementing their suggestions"
-        ]
+        feedback_tips = TIPS["feedback"]
 
         # Add 5 random tips
         sampled_tips = random.sample(feedback_tips, 5)
@@ -260,18 +304,7 @@ class ResponseGenerator:
 
     def get_gig_creation_tips(self):
         """Return tips for creating effective gigs"""
-        tips = [
-            "Use a clear, specific title that includes your main skill and deliverable",
-            "Break down your services into different packages or tiers",
-            "Include realistic delivery timeframes for each package",
-            "Be specific about what's included and what costs extra",
-            "Add eye-catching visuals that showcase your work",
-            "Highlight your unique selling point - what makes your service special",
-            "List the exact deliverables the client will receive",
-            "Address common client concerns or questions in your description",
-            "Include relevant keywords to help clients find your gig",
-            "Set appropriate expectations about revisions and communication"
-        ]
+        tips = TIPS["gig_creation"]
 
         response = "Here are some tips for creating effective gigs that attract clients:\n\n"
 
@@ -284,73 +317,38 @@ class ResponseGenerator:
 
     def analyze_skill_profile(self):
         """Analyze the user's skill profile and provide insights"""
-        if not self.user_id or not self.user_skills:
+        context = user_context.get_context(self.user_id) if self.user_id else None
+        if not context or not context.skills:
             return "I can analyze your skill profile once you've added skills to your profile. Go to the Profile page to add your skills."
 
         response = "Based on your skill profile, here's my analysis:\n\n"
 
-        # Count skills by category
-        categories = {}
-        for skill in self.user_skills:
-            category = skill['category']
-            if category in categories:
-                categories[category] += 1
-            else:
-                categories[category] = 1
-
-        # Identify strongest and weakest categories
-        if categories:
-            strongest_category = max(categories.items(), key=lambda x: x[1])[0]
-            response += f"Your strongest category appears to be {strongest_category} with {categories[strongest_category]} skills.\n\n"
-
-            # Check for advanced/expert skills
-            advanced_skills = [skill for skill in self.user_skills if
-                               skill.get('proficiency_level') in ['Advanced', 'Expert']]
-            if advanced_skills:
-                response += "Your top skills are:\n"
-                for skill in advanced_skills[:3]:
-                    response += f"- {skill['name']} ({skill.get('proficiency_level')})\n"
-
-            # Suggest skill gaps
-            conn = db.get_db_connection()
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                           SELECT s.id, s.name, s.category, COUNT(gs.skill_id) as frequency
-                           FROM skills s
-                                    JOIN gig_skills gs ON s.id = gs.skill_id
-                           WHERE s.category = ?
-                           GROUP BY s.id
-                           ORDER BY frequency DESC LIMIT 5
-                           """, (strongest_category,))
-
-            popular_skills = cursor.fetchall()
-            conn.close()
-
-            user_skill_ids = [skill['id'] for skill in self.user_skills]
-            missing_popular_skills = [skill for skill in popular_skills if skill[0] not in user_skill_ids]
-
-            if missing_popular_skills:
-                response += "\nTo strengthen your profile, consider adding these in-demand skills:\n"
-                for skill in missing_popular_skills[:2]:
-                    response += f"- {skill[1]} (Popular in {skill[2]})\n"
+        # Identify strongest category
+        strongest_category = context.strongest_category
+        response += f"Your strongest category appears to be {strongest_category} with {context.category_counts[strongest_category]} skills.\n\n"
+
+        # Check for advanced/expert skills
+        advanced_skills = [skill for skill in context.skills if
+                           skill.get('proficiency_level') in ['Advanced', 'Expert']]
+        if advanced_skills:
+            response += "Your top skills are:\n"
+            for skill in advanced_skills[:3]:
+                response += f"- {skill['name']} ({skill.get('proficiency_level')})\n"
+
+        # Suggest skill gaps from the category's most-used skills
+        user_skill_ids = {skill['id'] for skill in context.skills}
+        missing_popular_skills = [skill for skill in context.popular_skills if skill['id'] not in user_skill_ids]
+
+        if missing_popular_skills:
+            response += "\nTo strengthen your profile, consider adding these in-demand skills:\n"
+            for skill in missing_popular_skills[:2]:
+                response += f"- {skill['name']} (Popular in {skill['category']})\n"
 
         return response
 
     def get_success_strategies(self):
         """Return strategies for freelancing success"""
-        strategies = [
-            "Specialize in a niche rather than being a generalist to command higher rates",
-            "Build a personal brand that showcases your unique value proposition",
-            "Create systems and templates to streamline repetitive tasks",
-            "Develop excellent communication skills to build client trust",
-            "Always deliver more value than the client expects",
-            "Network consistently, not just when you need work",
-            "Learn to spot and avoid problem clients early",
-            "Continuously update your skills to stay competitive",
-            "Seek long-term relationships rather than one-off projects",
-            "Set aside time for marketing even when you're busy with client work"
-        ]
+        strategies = TIPS["success_strategies"]
 
         response = "Here are some proven strategies for freelancing success:\n\n"
 
@@ -361,6 +359,37 @@ class ResponseGenerator:
 
         return response
 
+    def get_answer(self, question, embed=None):
+        """Answer a question no intent matched from the knowledge base
+
+        Args:
+            question (str): The user's message
+            embed (callable, optional): Text to unit-length embedding; without
+                it, or if it returns None (rules-only mode), the default
+                response is given
+
+        Returns:
+            str: The closest snippets, or the default response if none is close enough
+        """
+        query = embed(question) if embed is not None else None
+        if query is None:
+            return self.get_default()
+        try:
+            kb = model_registry.get_knowledge_base()
+        except (ImportError, OSError) as e:
+            print(f"Knowledge base unavailable: {e}")
+            return self.get_default()
+
+        hits = [hit for score, hit in kb.search(query, knowledge_base.TOP_K)
+                if score >= knowledge_base.MIN_SCORE]
+        if not hits:
+            return self.get_default()
+
+        response = "Here's what I found that might help:\n\n"
+        for i, hit in enumerate(hits, 1):
+            response += f"{i}. {hit['text']}\n"
+        return response
+
     def get_default(self):
         """Return a default response when no specific pattern is matched"""
         default_responses = [
@@ -1,25 +1,135 @@
-import torch
-from sentence_transformers import SentenceTransformer, util
+import threading
+
+import numpy as np
+
+from chatbot import model_registry, query_cache
+
+# cosine similarity the closest exemplar must beat; tune as you like
+THRESHOLD = 0.6
+
+# same intents as in intent_classifier
+INTENTS = [
+    "greeting","thanks","finding_clients","pricing","skill_improvement",
+    "profile_tips","analyze_skill_profile","client_communication",
+    "time_management","payment","contract","feedback",
+    "gig_creation","success_strategies"
+]
+
+_warm_thread = None
+_warm_lock = threading.Lock()
+
+
+def warm_up(model_name=None):
+    """Start loading the encoder, intent prototypes and knowledge base on a background thread
+
+    torch and sentence-transformers are only imported on that thread, so
+    callers are not held up. A SemanticFallback created while the warm-up is
+    still running waits for it rather than loading a second copy. Only the
+    first call in a process starts a thread.
+
+    Returns:
+        threading.Thread: The warm-up thread
+    """
+    global _warm_thread
+    with _warm_lock:
+        if _warm_thread is None:
+            def load():
+                try:
+                    SemanticFallback(model_name)
+                    model_registry.get_knowledge_base(model_name)
+                except Exception as e:
+                    # SemanticFallback() raises again when it is really needed
+                    print(f"Semantic fallback warm-up failed: {e}")
+
+            _warm_thread = threading.Thread(target=load, name="semantic-warm-up", daemon=True)
+            _warm_thread.start()
+        return _warm_thread
+
 
 class SemanticFallback:
-    def __init__(self):
-        # load a small but strong paraphrase model
-        self.model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-        # same intents as in intent_classifier
-        self.intents = [
-            "greeting","thanks","finding_clients","pricing","skill_improvement",
-            "profile_tips","analyze_skill_profile","client_communication",
-            "time_management","payment","contract","feedback",
-            "gig_creation","success_strategies"
-        ]
-        # precompute embeddings
-        self.intent_embeddings = self.model.encode(self.intents, convert_to_tensor=True)
+    def __init__(self, model_name=None, threshold=THRESHOLD):
+        # small but strong paraphrase model, shared by every bot in the process;
+        # scoring below is plain NumPy, so with the ONNX backend torch is never imported
+        self.model = model_registry.get_encoder(model_name)
+        # several example utterances per intent, encoded once and stored on
+        # disk (see intent_prototypes); later runs just memory-map them
+        self.prototypes = model_registry.get_intent_prototypes(model_name)
+        self.intents = self.prototypes.intents
+        self.threshold = threshold
+        # query embeddings, shared by every session using this encoder
+        self.cache = model_registry.get_shared_cache(
+            ("embeddings", model_name or model_registry.ENCODER_MODEL, model_registry.encoder_backend(model_name)),
+            query_cache.EMBEDDING_CACHE_SIZE)
+
+    def embed(self, text):
+        """Unit-length embedding of a message, cached on its normalised text"""
+        key = query_cache.normalize(text)
+        return self.cache.get_or_compute(key, lambda: self._encode(key))
+
+    def _encode(self, text):
+        emb = self.model.encode(text, convert_to_numpy=True, normalize_embeddings=True)
+        # cached arrays are shared between sessions
+        emb.flags.writeable = False
+        return emb
+
+    def intent_scores(self, text):
+        """Similarity of a message to the closest exemplar of every intent
+
+        Returns:
+            dict: intent -> cosine similarity
+        """
+        return self.prototypes.intent_scores(self.embed(text))
 
     def classify(self, text: str) -> str:
-        emb = self.model.encode(text, convert_to_tensor=True)
-        cos_scores = util.cos_sim(emb, self.intent_embeddings)[0]
-        best_score, best_idx = torch.max(cos_scores, dim=0)
-        # threshold—tune as you like
-        if best_score.item() > 0.6:
-            return self.intents[best_idx.item()]
+        # one matrix-vector product scores every exemplar of every intent
+        intent, score = self.prototypes.best(self.embed(text))
+        if score > self.threshold:
+            return intent
         return None
+
+    def embed_many(self, texts, batch_size=64):
+        """Unit-length embeddings of several messages, encoding the uncached ones in batches
+
+        Args:
+            texts (list): Messages to embed
+            batch_size (int): Sentences per encoder forward pass
+
+        Returns:
+            list: One read-only embedding per message
+        """
+        keys = [query_cache.normalize(text) for text in texts]
+        embeddings = {}
+        pending = []
+        for key in dict.fromkeys(keys):
+            emb = self.cache.get(key)
+            if emb is None:
+                pending.append(key)
+            else:
+                embeddings[key] = emb
+
+        if pending:
+            encoded = self.model.encode(pending, batch_size=batch_size,
+                                        convert_to_numpy=True, normalize_embeddings=True)
+            for key, emb in zip(pending, encoded):
+                # a row view would keep the whole batch alive in the cache
+                emb = emb.copy()
+                emb.flags.writeable = False
+                embeddings[key] = emb
+                self.cache.put(key, emb)
+        return [embeddings[key] for key in keys]
+
+    def classify_many(self, texts, batch_size=64):
+        """Classify a batch of messages with batched encoder calls
+
+        Args:
+            texts (list): Messages to classify
+            batch_size (int): Sentences per encoder forward pass
+
+        Returns:
+            list: (intent or None, similarity of the closest exemplar) per
+                message; intent is None when the similarity is under the threshold
+        """
+        if not texts:
+            return []
+        matches = self.prototypes.best_many(np.stack(self.embed_many(texts, batch_size)))
+        return [(intent if score > self.threshold else None, score) for intent, score in matches]
@@ -0,0 +1,104 @@
+# freelance_mongo/chatbot/user_context.py
+"""Per-user snapshot of the data behind the bot's personalised answers
+
+A snapshot holds the user's skills, their top course recommendation and
+the most in-demand skills of their strongest category. It is built with a
+handful of queries and then served from memory until it is CONTEXT_TTL
+seconds old or database.update_user_skills() changes the user's skills,
+whichever comes first. Each read checks the user's skills version, a
+primary-key lookup, so steady-state answers cost that one query and never
+show skills the user has since edited, in this process or another.
+"""
+import time
+
+import database as db
+from chatbot import query_cache
+
+# Seconds a snapshot is served before it is rebuilt; this bounds how stale
+# course and demand data can get, skill edits are seen immediately
+CONTEXT_TTL = 300.0
+
+# Users whose snapshots are kept
+MAX_USERS = 1024
+
+# Most-used skills of the strongest category kept in the snapshot
+POPULAR_SKILLS = 5
+
+_snapshots = query_cache.LRUCache(MAX_USERS)
+
+
+class UserContext:
+    """Read-only snapshot of one user's personalisation data"""
+
+    def __init__(self, user_id, skills, top_course, popular_skills, version):
+        self.user_id = user_id
+        self.skills = skills
+        self.top_course = top_course
+        self.popular_skills = popular_skills
+        self.version = version
+        self.built_at = time.monotonic()
+
+        self.category_counts = {}
+        for skill in skills:
+            self.category_counts[skill['category']] = self.category_counts.get(skill['category'], 0) + 1
+        self.strongest_category = (max(self.category_counts.items(), key=lambda x: x[1])[0]
+                                   if self.category_counts else None)
+
+
+def _build(user_id, version):
+    from recommenders import recommend_courses
+
+    skills = db.get_user_skills(user_id)
+    if not skills:
+        return UserContext(user_id, skills, None, [], version)
+
+    courses = recommend_courses(user_id, 1, user_skills=skills)
+    context = UserContext(user_id, skills, courses[0] if courses else None, [], version)
+
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+                       SELECT s.id, s.name, s.category, COUNT(gs.skill_id) as frequency
+                       FROM skills s
+                                JOIN gig_skills gs ON s.id = gs.skill_id
+                       WHERE s.category = ?
+                       GROUP BY s.id
+                       ORDER BY frequency DESC LIMIT ?
+                       """, (context.strongest_category, POPULAR_SKILLS))
+        context.popular_skills = [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+    return context
+
+
+def get_context(user_id, ttl=None):
+    """Get the user's context snapshot, rebuilding it if stale
+
+    Args:
+        user_id (int): The user ID
+        ttl (float, optional): Maximum age in seconds; defaults to CONTEXT_TTL
+
+    Returns:
+        UserContext: The snapshot
+    """
+    ttl = CONTEXT_TTL if ttl is None else ttl
+    # read before building: an edit made meanwhile leaves the new snapshot
+    # with an old version, so the next call rebuilds it
+    version = db.get_skills_version(user_id)
+    key = (version[0], user_id)
+    context = _snapshots.get(key)
+    if context is None or context.version != version or time.monotonic() - context.built_at > ttl:
+        context = _build(user_id, version)
+        _snapshots.put(key, context)
+    return context
+
+
+def clear():
+    """Drop every snapshot"""
+    _snapshots.clear()
+
+
+def cache_stats():
+    """Hit/miss/eviction counters of the snapshot cache"""
+    return _snapshots.stats()
@@ -0,0 +1,17 @@
+import pytest
+
+import blob_store
+import database as db
+import database_gig as db_gig
+import db_pool
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """Point both database modules at an empty, initialised database file"""
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "freelance.db"))
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+    db.init_db()
+    db_gig.init_gig_tables()
+    yield db.DB_PATH
+    db_pool.close_all_pools()
@@ -1,9 +1,18 @@
 import sqlite3
 import os
+import base64
 import hashlib
+import json
+import threading
+import sys
 import pandas as pd
 from datetime import datetime
 
+import blob_store
+import db_pool
+import migrations
+import tracing
+
 # Ensure data directory exists
 os.makedirs("data", exist_ok=True)
 
@@ -11,15 +20,60 @@ DB_PATH = "data/freelance.db"
 
 
 def get_db_connection():
-    """Create a database connection and return the connection object"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Borrow a pooled database connection; close() returns it to the pool"""
+    conn = db_pool.get_pool(DB_PATH).connect()
+    if tracing.current_trace() is not None:
+        # time checkout to close() as "db.<caller>", skipping wrappers such
+        # as database_gig.get_db_connection
+        frame = sys._getframe(1)
+        while frame.f_back is not None and frame.f_code.co_name == "get_db_connection":
+            frame = frame.f_back
+        conn._span = tracing.start_span("db." + frame.f_code.co_name)
     return conn
 
 
+def get_pool_stats():
+    """Get checkout, wait and reuse counters for the database connection pool"""
+    return db_pool.get_pool(DB_PATH).stats()
+
+
+def checkpoint_wal(mode="PASSIVE"):
+    """Checkpoint the write-ahead log into the main database file
+
+    Args:
+        mode (str): SQLite checkpoint mode (PASSIVE, FULL, RESTART or TRUNCATE)
+
+    Returns:
+        dict: Checkpoint result, or None if the database is not in WAL mode
+    """
+    return db_pool.get_pool(DB_PATH).checkpoint(mode)
+
+
 def init_db():
-    """Initialize the database with required tables"""
-    conn = get_db_connection()
+    """Bring the database schema up to date
+
+    Migrations run at most once per process for each database file, so
+    calling this on every Streamlit rerun costs nothing after the first.
+    """
+    if DB_PATH in _migrated_paths:
+        return
+
+    with _migrate_lock:
+        if DB_PATH in _migrated_paths:
+            return
+        conn = get_db_connection()
+        try:
+            applied = migrations.migrate(conn, MIGRATIONS)
+            if 5 in applied:
+                # Hand the pages freed by the moved BLOBs back to the filesystem
+                conn.execute("VACUUM")
+        finally:
+            conn.close()
+        _migrated_paths.add(DB_PATH)
+
+
+def _create_core_tables(conn):
+    """Migration 1: users, skills, gigs, courses and feed tables"""
     cursor = conn.cursor()
 
     # Users table
@@ -416,8 +470,151 @@ def init_db():
                        )
                    ''')
 
-    # Commit changes and close connection
-    conn.commit()
+
+def _create_gig_tables(conn):
+    """Migration 2: gig picks, comments and files"""
+    cursor = conn.cursor()
+
+    # Create gig_picks table if it doesn't exist
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS gig_picks
+                   (
+                       id
+                       INTEGER
+                       PRIMARY
+                       KEY
+                       AUTOINCREMENT,
+                       user_id
+                       INTEGER
+                       NOT
+                       NULL,
+                       gig_id
+                       INTEGER
+                       NOT
+                       NULL,
+                       created_at
+                       TEXT
+                       NOT
+                       NULL,
+                       FOREIGN
+                       KEY
+                   (
+                       user_id
+                   ) REFERENCES users
+                   (
+                       id
+                   ),
+                       FOREIGN KEY
+                   (
+                       gig_id
+                   ) REFERENCES gigs
+                   (
+                       id
+                   ),
+                       UNIQUE
+                   (
+                       user_id,
+                       gig_id
+                   )
+                       )
+                   ''')
+
+    # Create gig_comments table if it doesn't exist
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS gig_comments
+                   (
+                       id
+                       INTEGER
+                       PRIMARY
+                       KEY
+                       AUTOINCREMENT,
+                       user_id
+                       INTEGER
+                       NOT
+                       NULL,
+                       gig_id
+                       INTEGER
+                       NOT
+                       NULL,
+                       content
+                       TEXT
+                       NOT
+                       NULL,
+                       created_at
+                       TEXT
+                       NOT
+                       NULL,
+                       FOREIGN
+                       KEY
+                   (
+                       user_id
+                   ) REFERENCES users
+                   (
+                       id
+                   ),
+                       FOREIGN KEY
+                   (
+                       gig_id
+                   ) REFERENCES gigs
+                   (
+                       id
+                   )
+                       )
+                   ''')
+
+    # Create gig_files table if it doesn't exist
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS gig_files
+                   (
+                       id
+                       INTEGER
+                       PRIMARY
+                       KEY
+                       AUTOINCREMENT,
+                       user_id
+                       INTEGER
+                       NOT
+                       NULL,
+                       gig_id
+                       INTEGER
+                       NOT
+                       NULL,
+                       filename
+                       TEXT
+                       NOT
+                       NULL,
+                       file_data
+                       BLOB
+                       NOT
+                       NULL,
+                       description
+                       TEXT,
+                       uploaded_at
+                       TEXT
+                       NOT
+                       NULL,
+                       FOREIGN
+                       KEY
+                   (
+                       user_id
+                   ) REFERENCES users
+                   (
+                       id
+                   ),
+                       FOREIGN KEY
+                   (
+                       gig_id
+                   ) REFERENCES gigs
+                   (
+                       id
+                   )
+                       )
+                   ''')
+
+
+def _seed_reference_data(conn):
+    """Migration 3: default skills and sample courses for an empty database"""
+    cursor = conn.cursor()
 
     # Insert default skills if the skills table is empty
     cursor.execute("SELECT COUNT(*) FROM skills")
@@ -429,11 +626,39 @@ def init_db():
     if cursor.fetchone()[0] == 0:
         insert_sample_courses(conn)
 
-    conn.close()
+
+# Trailing columns make each index covering for the query that uses it, so
+# SQLite never has to visit the table row. Versioning is left to MIGRATIONS.
+GIG_FILES_INDEX = "CREATE INDEX IF NOT EXISTS idx_gig_files_gig ON gig_files (gig_id, uploaded_at)"
+
+SECONDARY_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_skills_category ON skills (category, name)",
+    "CREATE INDEX IF NOT EXISTS idx_user_skills_user"
+    " ON user_skills (user_id, skill_id, proficiency_level, years_experience)",
+    "CREATE INDEX IF NOT EXISTS idx_gig_skills_skill ON gig_skills (skill_id, gig_id)",
+    "CREATE INDEX IF NOT EXISTS idx_course_skills_skill ON course_skills (skill_id, course_id)",
+    "CREATE INDEX IF NOT EXISTS idx_gigs_created ON gigs (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_gigs_user_created ON gigs (user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_posts_created ON posts (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_posts_user_created ON posts (user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_likes_post ON likes (post_id, user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_comments_post ON comments (post_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_gig_picks_gig ON gig_picks (gig_id)",
+    "CREATE INDEX IF NOT EXISTS idx_gig_picks_user_created ON gig_picks (user_id, created_at, gig_id)",
+    "CREATE INDEX IF NOT EXISTS idx_gig_comments_gig ON gig_comments (gig_id, created_at)",
+    GIG_FILES_INDEX,
+]
+
+
+def _create_secondary_indexes(conn):
+    """Migration 4: covering indexes for the hot join/filter columns"""
+    cursor = conn.cursor()
+    for statement in SECONDARY_INDEXES:
+        cursor.execute(statement)
 
 
 def insert_default_skills(conn):
-    """Insert default skills into the skills table"""
+    """Insert default skills into the skills table (the caller commits)"""
     skills_data = [
         # Programming
         ("Python", "Programming"),
@@ -524,14 +749,11 @@ def insert_default_skills(conn):
     ]
 
     cursor = conn.cursor()
-    for name, category in skills_data:
-        cursor.execute("INSERT INTO skills (name, category) VALUES (?, ?)", (name, category))
-
-    conn.commit()
+    cursor.executemany("INSERT INTO skills (name, category) VALUES (?, ?)", skills_data)
 
 
 def insert_sample_courses(conn):
-    """Insert sample courses into the courses table"""
+    """Insert sample courses into the courses table (the caller commits)"""
     courses_data = [
         # Programming courses
         ("Python for Beginners", "Learn Python programming from scratch with hands-on projects", "Udemy",
@@ -713,10 +935,73 @@ def insert_sample_courses(conn):
         (27, 68)  # VA - Virtual Assistance
     ]
 
-    for course_id, skill_id in course_skills:
-        cursor.execute("INSERT INTO course_skills (course_id, skill_id) VALUES (?, ?)", (course_id, skill_id))
+    cursor.executemany("INSERT INTO course_skills (course_id, skill_id) VALUES (?, ?)", course_skills)
+
+
+def _move_gig_file_blobs(conn):
+    """Migration 5: move gig_files.file_data into the content-addressed blob store
+
+    gig_files is rebuilt without the BLOB column; each row keeps the SHA-256
+    digest and size of its content instead. Blobs are written to disk before
+    the transaction commits, so a failed migration only leaves unreferenced
+    (and harmless) blob files behind.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+                   CREATE TABLE gig_files_new
+                   (
+                       id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                       user_id      INTEGER NOT NULL,
+                       gig_id       INTEGER NOT NULL,
+                       filename     TEXT    NOT NULL,
+                       content_hash TEXT    NOT NULL,
+                       size         INTEGER NOT NULL,
+                       description  TEXT,
+                       uploaded_at  TEXT    NOT NULL,
+                       FOREIGN KEY (user_id) REFERENCES users (id),
+                       FOREIGN KEY (gig_id) REFERENCES gigs (id)
+                   )
+                   """)
+
+    # Iterate rather than fetchall() so only one file is in memory at a time
+    rows = conn.execute("""
+                        SELECT id, user_id, gig_id, filename, file_data, description, uploaded_at
+                        FROM gig_files
+                        ORDER BY id
+                        """)
+    for row in rows:
+        digest, size = blob_store.put(bytes(row['file_data']))
+        cursor.execute("""
+                       INSERT INTO gig_files_new (id, user_id, gig_id, filename, content_hash, size,
+                                                  description, uploaded_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                       """, (row['id'], row['user_id'], row['gig_id'], row['filename'], digest, size,
+                             row['description'], row['uploaded_at']))
+
+    cursor.execute("DROP TABLE gig_files")
+    cursor.execute("ALTER TABLE gig_files_new RENAME TO gig_files")
+    cursor.execute(GIG_FILES_INDEX)
+
+
+def _add_skills_version(conn):
+    """Migration 6: per-user counter bumped with every skill change"""
+    conn.execute("ALTER TABLE users ADD COLUMN skills_version INTEGER NOT NULL DEFAULT 0")
 
-    conn.commit()
+
+# Numbered schema migrations applied by init_db(). Never edit or renumber a
+# released step; append a new one instead. Steps 1-4 are idempotent so that
+# databases created before versioning adopt the history cleanly.
+MIGRATIONS = [
+    (1, "core tables", _create_core_tables),
+    (2, "gig tables", _create_gig_tables),
+    (3, "default skills and sample courses", _seed_reference_data),
+    (4, "secondary indexes", _create_secondary_indexes),
+    (5, "gig file blobs to blob store", _move_gig_file_blobs),
+    (6, "user skills version", _add_skills_version),
+]
+
+_migrated_paths = set()
+_migrate_lock = threading.Lock()
 
 
 def hash_password(password):
@@ -821,28 +1106,149 @@ def get_user_skills(user_id):
     return user_skills
 
 
+def get_skills_version(user_id):
+    """Get a token that changes every time update_user_skills changes this user's skills
+
+    The counter lives in the users table and is bumped in the same
+    transaction as the skill write, so edits made by any process are seen.
+
+    Args:
+        user_id (int): The user ID
+
+    Returns:
+        tuple: Opaque version token for this database and user
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT skills_version FROM users WHERE id = ?", (user_id,))
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+    return DB_PATH, row[0] if row else 0
+
+
 def update_user_skills(user_id, skills_data):
     """Update user skills
 
+    Compares the new list with the stored rows and only writes the
+    difference: new or changed skills are upserted and dropped skills are
+    deleted, all in one transaction. Unchanged rows are left untouched.
+
     Args:
         user_id (int): The user ID
         skills_data (list): List of dicts with keys: skill_id, proficiency_level, years_experience
+
+    Returns:
+        set: IDs of the skills that were added, changed or removed
     """
+    wanted = {
+        skill['skill_id']: (skill['proficiency_level'], skill['years_experience'])
+        for skill in skills_data
+    }
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # First, delete existing skills for the user
-    cursor.execute("DELETE FROM user_skills WHERE user_id = ?", (user_id,))
-
-    # Then, insert the new skills
-    for skill in skills_data:
+    try:
+        # Take the write lock before reading so the diff cannot go stale
+        cursor.execute("BEGIN IMMEDIATE")
         cursor.execute("""
-                       INSERT INTO user_skills (user_id, skill_id, proficiency_level, years_experience)
-                       VALUES (?, ?, ?, ?)
-                       """, (user_id, skill['skill_id'], skill['proficiency_level'], skill['years_experience']))
+                       SELECT skill_id, proficiency_level, years_experience
+                       FROM user_skills
+                       WHERE user_id = ?
+                       """, (user_id,))
+        current = {row['skill_id']: (row['proficiency_level'], row['years_experience'])
+                   for row in cursor.fetchall()}
+
+        upserts = [(user_id, skill_id, level, years)
+                   for skill_id, (level, years) in wanted.items()
+                   if current.get(skill_id) != (level, years)]
+        removed = [(user_id, skill_id) for skill_id in current if skill_id not in wanted]
+
+        cursor.executemany("""
+                           INSERT INTO user_skills (user_id, skill_id, proficiency_level, years_experience)
+                           VALUES (?, ?, ?, ?)
+                           ON CONFLICT (user_id, skill_id) DO UPDATE
+                               SET proficiency_level = excluded.proficiency_level,
+                                   years_experience  = excluded.years_experience
+                           """, upserts)
+        cursor.executemany("DELETE FROM user_skills WHERE user_id = ? AND skill_id = ?", removed)
+        if upserts or removed:
+            cursor.execute("UPDATE users SET skills_version = skills_version + 1 WHERE id = ?", (user_id,))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
-    conn.commit()
-    conn.close()
+    return {row[1] for row in upserts} | {row[1] for row in removed}
+
+
+# Link table and owner column for each kind of row that carries a skill list
+_SKILL_LINKS = {
+    "gig": ("gig_skills", "gig_id"),
+    "course": ("course_skills", "course_id"),
+}
+
+# Stay under SQLite's bound-parameter limit on older builds
+_MAX_IN_PARAMS = 900
+
+
+def select_in(cursor, query, values):
+    """Run a query with an IN list over any number of values
+
+    The values are bound in batches of at most _MAX_IN_PARAMS, so large
+    lists never hit SQLite's bound-parameter limit.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor to run the query on
+        query (str): SQL containing one "{placeholders}" field for the IN list
+        values (list): Values for the IN list
+
+    Returns:
+        list: Rows of every batch, in batch order
+    """
+    rows = []
+    for start in range(0, len(values), _MAX_IN_PARAMS):
+        batch = values[start:start + _MAX_IN_PARAMS]
+        cursor.execute(query.format(placeholders=','.join(['?'] * len(batch))), batch)
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+def attach_skills(cursor, rows, kind="gig"):
+    """Load the skills for a whole result set and attach them to each row
+
+    Replaces one skills query per row with one query per batch of rows.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor to run the lookup on
+        rows (list): Dictionaries with an 'id' key; each gets a 'skills' list
+        kind (str): "gig" or "course"
+
+    Returns:
+        list: The same rows, for chaining
+    """
+    link_table, owner_column = _SKILL_LINKS[kind]
+    skills_by_owner = {row['id']: [] for row in rows}
+    owner_ids = list(skills_by_owner)
+
+    query = """
+            SELECT l.{owner} AS owner_id, s.id, s.name, s.category
+            FROM {link} l
+                     JOIN skills s ON s.id = l.skill_id
+            WHERE l.{owner} IN ({{placeholders}})
+            ORDER BY l.{owner}, l.id
+            """.format(link=link_table, owner=owner_column)
+    for row in select_in(cursor, query, owner_ids):
+        skills_by_owner[row['owner_id']].append(
+            {'id': row['id'], 'name': row['name'], 'category': row['category']})
+
+    for row in rows:
+        row['skills'] = skills_by_owner[row['id']]
+    return rows
 
 
 def create_gig(user_id, title, description, price_min, price_max, duration, skill_ids):
@@ -934,26 +1340,130 @@ def get_gigs(limit=10, offset=0, user_id=None, skill_ids=None):
     if where_clauses:
         query += " WHERE " + " AND ".join(where_clauses)
 
-    query += " GROUP BY g.id ORDER BY g.created_at DESC LIMIT ? OFFSET ?"
+    if skill_ids:
+        # A gig matching several of the skills appears once per match
+        query += " GROUP BY g.id"
+
+    query += " ORDER BY g.created_at DESC LIMIT ? OFFSET ?"
     params.extend([limit, offset])
 
     cursor.execute(query, params)
     gigs = [dict(row) for row in cursor.fetchall()]
 
-    # Get skills for each gig
-    for gig in gigs:
-        cursor.execute("""
-                       SELECT s.id, s.name, s.category
-                       FROM skills s
-                                JOIN gig_skills gs ON s.id = gs.skill_id
-                       WHERE gs.gig_id = ?
-                       """, (gig['id'],))
-        gig['skills'] = [dict(row) for row in cursor.fetchall()]
+    # Get skills for all gigs in one query
+    attach_skills(cursor, gigs, "gig")
 
     conn.close()
     return gigs
 
 
+def _encode_page_token(row):
+    """Turn a row's (created_at, id) sort key into an opaque page token"""
+    raw = json.dumps([row['created_at'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_page_token(token):
+    """Recover the (created_at, id) sort key from a page token
+
+    Raises:
+        ValueError: If the token was not produced by _encode_page_token
+    """
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("invalid page token")
+    if not isinstance(created_at, str) or not isinstance(row_id, int):
+        raise ValueError("invalid page token")
+    return created_at, row_id
+
+
+def load_pages(fetch_page, pages):
+    """Follow page tokens for the given number of pages
+
+    Args:
+        fetch_page (callable): Takes a page token, returns (rows, next token)
+        pages (int): Number of pages to load
+
+    Returns:
+        tuple: (all rows loaded, token for the next page or None)
+    """
+    rows, token = [], None
+    for _ in range(pages):
+        page, token = fetch_page(token)
+        rows.extend(page)
+        if not token:
+            break
+    return rows, token
+
+
+def _split_page(rows, limit):
+    """Trim a limit+1 fetch to one page and build the token for the next"""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, _encode_page_token(rows[-1])
+    return rows, None
+
+
+def get_gigs_page(limit=10, page_token=None, user_id=None, skill_ids=None):
+    """Get one page of gigs, newest first, using keyset pagination
+
+    Unlike get_gigs(offset=...), the cost of a page does not grow with how
+    deep it is: each page seeks straight past the previous page's last gig.
+
+    Args:
+        limit (int): Maximum number of gigs on the page
+        page_token (str, optional): Token returned with the previous page
+        user_id (int, optional): Filter by user ID
+        skill_ids (list, optional): Filter by skill IDs
+
+    Returns:
+        tuple: (list of gig dictionaries, token for the next page or None)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    query = """
+            SELECT g.id, g.user_id, g.title, g.description, g.price_min, g.price_max,
+                   g.duration, g.created_at, g.status, u.username
+            FROM gigs g
+                     JOIN users u ON g.user_id = u.id \
+            """
+
+    params = []
+    where_clauses = []
+
+    if user_id:
+        where_clauses.append("g.user_id = ?")
+        params.append(user_id)
+
+    if skill_ids:
+        # EXISTS keeps the walk in created_at order without a GROUP BY
+        where_clauses.append("""EXISTS (SELECT 1 FROM gig_skills gs
+                                        WHERE gs.gig_id = g.id AND gs.skill_id IN ({}))"""
+                             .format(','.join(['?'] * len(skill_ids))))
+        params.extend(skill_ids)
+
+    if page_token:
+        where_clauses.append("(g.created_at, g.id) < (?, ?)")
+        params.extend(_decode_page_token(page_token))
+
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+
+    query += " ORDER BY g.created_at DESC, g.id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    cursor.execute(query, params)
+    gigs, next_cursor = _split_page([dict(row) for row in cursor.fetchall()], limit)
+
+    # Get skills for all gigs in one query
+    attach_skills(cursor, gigs, "gig")
+
+    conn.close()
+    return gigs, next_cursor
+
+
 def get_recommended_gigs(user_id, limit=10):
     """Get recommended gigs based on user skills
 
@@ -993,15 +1503,8 @@ def get_recommended_gigs(user_id, limit=10):
     cursor.execute(query, params)
     gigs = [dict(row) for row in cursor.fetchall()]
 
-    # Get skills for each gig
-    for gig in gigs:
-        cursor.execute("""
-                       SELECT s.id, s.name, s.category
-                       FROM skills s
-                                JOIN gig_skills gs ON s.id = gs.skill_id
-                       WHERE gs.gig_id = ?
-                       """, (gig['id'],))
-        gig['skills'] = [dict(row) for row in cursor.fetchall()]
+    # Get skills for all gigs in one query
+    attach_skills(cursor, gigs, "gig")
 
     conn.close()
     return gigs
@@ -1058,15 +1561,8 @@ def get_recommended_courses(user_id, limit=10):
     cursor.execute(query, params)
     courses = [dict(row) for row in cursor.fetchall()]
 
-    # Get skills for each course
-    for course in courses:
-        cursor.execute("""
-                       SELECT s.id, s.name, s.category
-                       FROM skills s
-                                JOIN course_skills cs ON s.id = cs.skill_id
-                       WHERE cs.course_id = ?
-                       """, (course['id'],))
-        course['skills'] = [dict(row) for row in cursor.fetchall()]
+    # Get skills for all courses in one query
+    attach_skills(cursor, courses, "course")
 
     conn.close()
     return courses
@@ -1104,56 +1600,230 @@ def create_post(user_id, content, image_url=None):
         conn.close()
 
 
-def get_posts(limit=10, offset=0, user_id=None):
-    """Get posts with optional filtering
+def _attach_comments(cursor, posts, per_post=None):
+    """Load comments for a page of posts in one query
 
     Args:
-        limit (int): Maximum number of posts to return
-        offset (int): Offset for pagination
-        user_id (int, optional): Filter by user ID
+        cursor (sqlite3.Cursor): Cursor to run the lookup on
+        posts (list): Post dictionaries; each gets a 'comments' list
+        per_post (int, optional): Keep only the newest N comments per post
 
     Returns:
-        list: List of post dictionaries
+        list: The same posts, for chaining
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    comments_by_post = {post['id']: [] for post in posts}
+    if not comments_by_post or per_post == 0:
+        for post in posts:
+            post['comments'] = []
+        return posts
+
+    placeholders = ','.join(['?'] * len(comments_by_post))
+    params = list(comments_by_post)
+    if per_post is None:
+        query = """
+                SELECT c.id, c.post_id, c.user_id, c.content, c.created_at, u.username
+                FROM comments c
+                         JOIN users u ON c.user_id = u.id
+                WHERE c.post_id IN ({})
+                ORDER BY c.post_id, c.created_at ASC, c.id ASC
+                """.format(placeholders)
+    else:
+        # Number each post's comments newest-first and keep the first N
+        query = """
+                SELECT id, post_id, user_id, content, created_at, username
+                FROM (SELECT c.id, c.post_id, c.user_id, c.content, c.created_at, u.username,
+                             ROW_NUMBER() OVER (
+                                 PARTITION BY c.post_id ORDER BY c.created_at DESC, c.id DESC
+                             ) AS rn
+                      FROM comments c
+                               JOIN users u ON c.user_id = u.id
+                      WHERE c.post_id IN ({}))
+                WHERE rn <= ?
+                ORDER BY post_id, created_at ASC, id ASC
+                """.format(placeholders)
+        params.append(per_post)
+
+    cursor.execute(query, params)
+    for row in cursor.fetchall():
+        comment = dict(row)
+        comments_by_post[comment.pop('post_id')].append(comment)
+
+    for post in posts:
+        post['comments'] = comments_by_post[post['id']]
+    return posts
+
 
+def _select_posts(cursor, limit, offset=0, user_id=None, viewer_id=None, before=None):
+    """Fetch a page of posts with like and comment counts in one statement"""
     query = """
-            SELECT p.id, p.user_id, p.content, p.created_at, p.image_url, u.username
+            SELECT p.id, p.user_id, p.content, p.created_at, p.image_url, u.username,
+                   (SELECT COUNT(*) FROM likes l WHERE l.post_id = p.id)    AS like_count,
+                   (SELECT COUNT(*) FROM comments c WHERE c.post_id = p.id) AS comment_count,
+                   EXISTS(SELECT 1 FROM likes l WHERE l.post_id = p.id AND l.user_id = ?) AS liked
             FROM posts p
                      JOIN users u ON p.user_id = u.id \
             """
 
-    params = []
+    params = [viewer_id]
+    where_clauses = []
     if user_id:
-        query += " WHERE p.user_id = ?"
+        where_clauses.append("p.user_id = ?")
         params.append(user_id)
 
-    query += " ORDER BY p.created_at DESC LIMIT ? OFFSET ?"
+    if before:
+        where_clauses.append("(p.created_at, p.id) < (?, ?)")
+        params.extend(before)
+
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+
+    query += " ORDER BY p.created_at DESC, p.id DESC LIMIT ? OFFSET ?"
     params.extend([limit, offset])
 
     cursor.execute(query, params)
     posts = [dict(row) for row in cursor.fetchall()]
-
-    # Get like count for each post
     for post in posts:
-        cursor.execute("SELECT COUNT(*) FROM likes WHERE post_id = ?", (post['id'],))
-        post['like_count'] = cursor.fetchone()[0]
+        post['liked'] = bool(post['liked'])
+    return posts
 
-        # Get comments for each post
-        cursor.execute("""
-                       SELECT c.id, c.user_id, c.content, c.created_at, u.username
-                       FROM comments c
-                                JOIN users u ON c.user_id = u.id
-                       WHERE c.post_id = ?
-                       ORDER BY c.created_at ASC
-                       """, (post['id'],))
-        post['comments'] = [dict(row) for row in cursor.fetchall()]
+
+def get_posts(limit=10, offset=0, user_id=None):
+    """Get posts with optional filtering
+
+    Args:
+        limit (int): Maximum number of posts to return
+        offset (int): Offset for pagination
+        user_id (int, optional): Filter by user ID
+
+    Returns:
+        list: List of post dictionaries with like counts and all comments
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    posts = _select_posts(cursor, limit, offset, user_id=user_id)
+    _attach_comments(cursor, posts)
+
+    conn.close()
+    return posts
+
+
+def get_feed(viewer_id, limit=10, offset=0, user_id=None, comment_preview=2):
+    """Get a page of the feed in a constant number of queries
+
+    Each post carries its like count, comment count, whether the viewer
+    liked it and only the newest few comments. Load the full thread with
+    get_post_comments() when the user expands a post.
+
+    Args:
+        viewer_id (int): User viewing the feed, for the 'liked' flag
+        limit (int): Maximum number of posts to return
+        offset (int): Offset for pagination
+        user_id (int, optional): Filter by author user ID
+        comment_preview (int): Newest comments to include per post
+
+    Returns:
+        list: List of post dictionaries with 'like_count', 'comment_count',
+            'liked' and a 'comments' preview in chronological order
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    posts = _select_posts(cursor, limit, offset, user_id=user_id, viewer_id=viewer_id)
+    _attach_comments(cursor, posts, per_post=comment_preview)
 
     conn.close()
     return posts
 
 
+def get_post_comments(post_id):
+    """Get all comments for a post
+
+    Args:
+        post_id (int): Post ID
+
+    Returns:
+        list: List of comment dictionaries, oldest first
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+                   SELECT c.id, c.user_id, c.content, c.created_at, u.username
+                   FROM comments c
+                            JOIN users u ON c.user_id = u.id
+                   WHERE c.post_id = ?
+                   ORDER BY c.created_at ASC, c.id ASC
+                   """, (post_id,))
+    comments = [dict(row) for row in cursor.fetchall()]
+
+    conn.close()
+    return comments
+
+
+def get_feed_page(viewer_id, limit=10, page_token=None, user_id=None, comment_preview=2):
+    """Get one page of the feed, newest first, using keyset pagination
+
+    Same rows as get_feed(), but pages are addressed by continuation token
+    instead of offset.
+
+    Args:
+        viewer_id (int): User viewing the feed, for the 'liked' flag
+        limit (int): Maximum number of posts on the page
+        page_token (str, optional): Token returned with the previous page
+        user_id (int, optional): Filter by author user ID
+        comment_preview (int): Newest comments to include per post
+
+    Returns:
+        tuple: (list of post dictionaries, token for the next page or None)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    before = _decode_page_token(page_token) if page_token else None
+    posts = _select_posts(cursor, limit + 1, user_id=user_id, viewer_id=viewer_id, before=before)
+    posts, next_cursor = _split_page(posts, limit)
+    _attach_comments(cursor, posts, per_post=comment_preview)
+
+    conn.close()
+    return posts, next_cursor
+
+
+def get_post_comments_page(post_id, limit=20, page_token=None):
+    """Get one page of a post's comments, oldest first
+
+    Args:
+        post_id (int): Post ID
+        limit (int): Maximum number of comments on the page
+        page_token (str, optional): Token returned with the previous page
+
+    Returns:
+        tuple: (list of comment dictionaries, token for the next page or None)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    query = """
+            SELECT c.id, c.user_id, c.content, c.created_at, u.username
+            FROM comments c
+                     JOIN users u ON c.user_id = u.id
+            WHERE c.post_id = ? \
+            """
+    params = [post_id]
+    if page_token:
+        query += " AND (c.created_at, c.id) > (?, ?)"
+        params.extend(_decode_page_token(page_token))
+
+    query += " ORDER BY c.created_at ASC, c.id ASC LIMIT ?"
+    params.append(limit + 1)
+
+    cursor.execute(query, params)
+    comments, next_cursor = _split_page([dict(row) for row in cursor.fetchall()], limit)
+
+    conn.close()
+    return comments, next_cursor
+
+
 def like_post(user_id, post_id):
     """Like a post
 
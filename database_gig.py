@@ -1,158 +1,25 @@
-import sqlite3
 from datetime import datetime
 
+import blob_store
+import database as db
+
+# Largest gig file accepted, matching Streamlit's default upload limit
+MAX_GIG_FILE_SIZE = 200 * 1024 * 1024
+
 
 # Database connection function
 def get_db_connection():
-    """Create a database connection and return the connection object"""
-    conn = sqlite3.connect("data/freelance.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow a connection from the pool shared with database.py"""
+    return db.get_db_connection()
 
 
 def init_gig_tables():
-    """Initialize the gig-related tables in the database"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """Initialize the gig-related tables in the database
 
-    # Create gig_picks table if it doesn't exist
-    cursor.execute('''
-                   CREATE TABLE IF NOT EXISTS gig_picks
-                   (
-                       id
-                       INTEGER
-                       PRIMARY
-                       KEY
-                       AUTOINCREMENT,
-                       user_id
-                       INTEGER
-                       NOT
-                       NULL,
-                       gig_id
-                       INTEGER
-                       NOT
-                       NULL,
-                       created_at
-                       TEXT
-                       NOT
-                       NULL,
-                       FOREIGN
-                       KEY
-                   (
-                       user_id
-                   ) REFERENCES users
-                   (
-                       id
-                   ),
-                       FOREIGN KEY
-                   (
-                       gig_id
-                   ) REFERENCES gigs
-                   (
-                       id
-                   ),
-                       UNIQUE
-                   (
-                       user_id,
-                       gig_id
-                   )
-                       )
-                   ''')
-
-    # Create gig_comments table if it doesn't exist
-    cursor.execute('''
-                   CREATE TABLE IF NOT EXISTS gig_comments
-                   (
-                       id
-                       INTEGER
-                       PRIMARY
-                       KEY
-                       AUTOINCREMENT,
-                       user_id
-                       INTEGER
-                       NOT
-                       NULL,
-                       gig_id
-                       INTEGER
-                       NOT
-                       NULL,
-                       content
-                       TEXT
-                       NOT
-                       NULL,
-                       created_at
-                       TEXT
-                       NOT
-                       NULL,
-                       FOREIGN
-                       KEY
-                   (
-                       user_id
-                   ) REFERENCES users
-                   (
-                       id
-                   ),
-                       FOREIGN KEY
-                   (
-                       gig_id
-                   ) REFERENCES gigs
-                   (
-                       id
-                   )
-                       )
-                   ''')
-
-    # Create gig_files table if it doesn't exist
-    cursor.execute('''
-                   CREATE TABLE IF NOT EXISTS gig_files
-                   (
-                       id
-                       INTEGER
-                       PRIMARY
-                       KEY
-                       AUTOINCREMENT,
-                       user_id
-                       INTEGER
-                       NOT
-                       NULL,
-                       gig_id
-                       INTEGER
-                       NOT
-                       NULL,
-                       filename
-                       TEXT
-                       NOT
-                       NULL,
-                       file_data
-                       BLOB
-                       NOT
-                       NULL,
-                       description
-                       TEXT,
-                       uploaded_at
-                       TEXT
-                       NOT
-                       NULL,
-                       FOREIGN
-                       KEY
-                   (
-                       user_id
-                   ) REFERENCES users
-                   (
-                       id
-                   ),
-                       FOREIGN KEY
-                   (
-                       gig_id
-                   ) REFERENCES gigs
-                   (
-                       id
-                   )
-                       )
-                   ''')
-
-    conn.commit()
-    conn.close()
+    The gig tables are part of the versioned schema in database.py, so this
+    simply makes sure all migrations have been applied.
+    """
+    db.init_db()
 
 
 # Gig picking functions
@@ -289,15 +156,8 @@ def get_user_picked_gigs(user_id):
     cursor.execute(query, (user_id,))
     gigs = [dict(row) for row in cursor.fetchall()]
 
-    # Get skills for each gig
-    for gig in gigs:
-        cursor.execute("""
-                       SELECT s.id, s.name, s.category
-                       FROM skills s
-                                JOIN gig_skills gs ON s.id = gs.skill_id
-                       WHERE gs.gig_id = ?
-                       """, (gig['id'],))
-        gig['skills'] = [dict(row) for row in cursor.fetchall()]
+    # Get skills for all gigs in one query
+    db.attach_skills(cursor, gigs, "gig")
 
     conn.close()
     return gigs
@@ -366,16 +226,33 @@ def get_gig_comments(gig_id):
 def add_gig_file(user_id, gig_id, filename, file_data, description=None):
     """Add a file to a gig
 
+    The content goes to the content-addressed blob store (identical uploads
+    are stored once); the database keeps only metadata and the digest.
+    Passing a file object streams it to disk in fixed-size chunks.
+
     Args:
         user_id (int): User ID
         gig_id (int): Gig ID
         filename (str): Name of the file
-        file_data (bytes): Binary file data
+        file_data (bytes or file object): Binary file data or a readable
+            binary stream
         description (str, optional): File description
 
     Returns:
-        int: The ID of the uploaded file, or None if upload failed
+        int: The ID of the uploaded file, or None if upload failed or the
+            file is larger than MAX_GIG_FILE_SIZE
     """
+    try:
+        if isinstance(file_data, (bytes, bytearray, memoryview)):
+            if len(file_data) > MAX_GIG_FILE_SIZE:
+                raise blob_store.BlobTooLarge(f"content exceeds {MAX_GIG_FILE_SIZE} bytes")
+            content_hash, size = blob_store.put(bytes(file_data))
+        else:
+            content_hash, size = blob_store.put_stream(file_data, max_size=MAX_GIG_FILE_SIZE)
+    except (OSError, blob_store.BlobTooLarge) as e:
+        print(f"Error uploading file: {e}")
+        return None
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -383,9 +260,10 @@ def add_gig_file(user_id, gig_id, filename, file_data, description=None):
         uploaded_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         cursor.execute("""
-                       INSERT INTO gig_files (user_id, gig_id, filename, file_data, description, uploaded_at)
-                       VALUES (?, ?, ?, ?, ?, ?)
-                       """, (user_id, gig_id, filename, file_data, description, uploaded_at))
+                       INSERT INTO gig_files (user_id, gig_id, filename, content_hash, size, description,
+                                              uploaded_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)
+                       """, (user_id, gig_id, filename, content_hash, size, description, uploaded_at))
 
         file_id = cursor.lastrowid
         conn.commit()
@@ -398,19 +276,20 @@ def add_gig_file(user_id, gig_id, filename, file_data, description=None):
 
 
 def get_gig_files(gig_id):
-    """Get files for a gig
+    """Get file metadata for a gig (no file contents)
 
     Args:
         gig_id (int): Gig ID
 
     Returns:
-        list: List of file dictionaries
+        list: List of file dictionaries; use get_gig_file_data() for the bytes
     """
     conn = get_db_connection()
     cursor = conn.cursor()
 
     cursor.execute("""
-                   SELECT f.id, f.user_id, f.filename, f.file_data, f.description, f.uploaded_at, u.username
+                   SELECT f.id, f.user_id, f.filename, f.content_hash, f.size, f.description, f.uploaded_at,
+                          u.username
                    FROM gig_files f
                             JOIN users u ON f.user_id = u.id
                    WHERE f.gig_id = ?
@@ -423,6 +302,61 @@ def get_gig_files(gig_id):
     return files
 
 
+def get_gig_file_data(file_id):
+    """Read the contents of a gig file
+
+    Args:
+        file_id (int): File ID
+
+    Returns:
+        bytes: File contents, or None if the file or its blob is missing
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT content_hash FROM gig_files WHERE id = ?", (file_id,))
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+
+    if not row:
+        return None
+    try:
+        return blob_store.read(row['content_hash'])
+    except FileNotFoundError:
+        print(f"Missing blob for gig file {file_id}")
+        return None
+
+
+def open_gig_file(file_id):
+    """Open a gig file's contents as a binary stream
+
+    Lets callers copy or serve the file in chunks instead of holding it all
+    in memory. The caller must close the returned file.
+
+    Args:
+        file_id (int): File ID
+
+    Returns:
+        file object: Readable binary file, or None if the file or its blob is missing
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT content_hash FROM gig_files WHERE id = ?", (file_id,))
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+
+    if not row:
+        return None
+    try:
+        return blob_store.open_blob(row['content_hash'])
+    except FileNotFoundError:
+        print(f"Missing blob for gig file {file_id}")
+        return None
+
+
 # Initialize tables when this module is imported
 if __name__ == "__main__":
     init_gig_tables()
\ No newline at end of file
@@ -0,0 +1,342 @@
+import atexit
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+
+import tracing
+
+# Maximum number of open connections per database file
+POOL_SIZE = 16
+
+# Seconds a caller waits for a free connection before giving up
+CHECKOUT_TIMEOUT = 30.0
+
+# Idle connections older than this (seconds) are pinged before reuse
+HEALTH_CHECK_INTERVAL = 60.0
+
+# PRAGMAs applied to every new connection. journal_mode=WAL lets readers run
+# alongside a writer; busy_timeout (ms) makes writers queue instead of failing
+# with "database is locked". Negative cache_size is in KiB.
+DEFAULT_PROFILE = {
+    "busy_timeout": 5000,
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16384,
+    "mmap_size": 128 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "wal_autocheckpoint": 1000,
+    "journal_size_limit": 64 * 1024 * 1024,
+}
+
+_CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its pool
+
+    Callers keep the usual ``conn = get_db_connection() ... conn.close()``
+    pattern; the pool decides whether the underlying handle survives.
+    """
+
+    def close(self):
+        span = getattr(self, "_span", None)
+        if span is not None:
+            self._span = None
+            tracing.end_span(span)
+        pool = getattr(self, "_pool", None)
+        if pool is None:
+            super().close()
+        else:
+            pool.release(self)
+
+    def _really_close(self):
+        super().close()
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections for a single database file
+
+    Released connections are kept idle and handed out again, preferring the
+    thread that used them last so its page cache stays warm. At most
+    ``max_size`` connections exist at once; further checkouts wait.
+    """
+
+    def __init__(self, path, max_size=POOL_SIZE, timeout=CHECKOUT_TIMEOUT,
+                 health_check_interval=HEALTH_CHECK_INTERVAL, profile=None):
+        self.path = path
+        self.profile = dict(DEFAULT_PROFILE if profile is None else profile)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        # Reentrant so a leaked connection finalised mid-checkout cannot deadlock
+        self._cond = threading.Condition(threading.RLock())
+        self._idle = deque()
+        self._size = 0
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "reused": 0,
+            "thread_reuses": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "health_checks": 0,
+            "discarded": 0,
+            "checkpoints": 0,
+        }
+
+    def _create(self):
+        conn = sqlite3.connect(self.path, factory=PooledConnection, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            apply_profile(conn, self.profile)
+        except sqlite3.Error:
+            conn._really_close()
+            raise
+        conn._pool = self
+        conn._owner = None
+        conn._released_at = time.monotonic()
+        # Free the slot if a borrowed connection is dropped without close()
+        conn._finalizer = weakref.finalize(conn, self._forget)
+        return conn
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def _discard(self, conn):
+        conn._finalizer.detach()
+        conn._pool = None
+        try:
+            conn._really_close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def _take_idle(self, thread_id):
+        """Pop an idle connection, preferring one last used by this thread"""
+        for conn in reversed(self._idle):
+            if conn._owner == thread_id:
+                self._idle.remove(conn)
+                self._stats["thread_reuses"] += 1
+                return conn
+        return self._idle.pop()
+
+    def _is_healthy(self, conn):
+        if time.monotonic() - conn._released_at < self.health_check_interval:
+            return True
+        self._stats["health_checks"] += 1
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def connect(self):
+        """Check out a connection, waiting if the pool is exhausted
+
+        Returns:
+            PooledConnection: A connection; call close() to return it
+
+        Raises:
+            sqlite3.OperationalError: If no connection frees up within the timeout
+        """
+        thread_id = threading.get_ident()
+        deadline = None
+
+        while True:
+            conn = None
+            with self._cond:
+                if self._idle:
+                    conn = self._take_idle(thread_id)
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    if deadline is None:
+                        deadline = time.monotonic() + self.timeout
+                        self._stats["waits"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise sqlite3.OperationalError(
+                            f"connection pool exhausted ({self.max_size} connections in use)")
+                    started = time.monotonic()
+                    self._cond.wait(remaining)
+                    self._stats["wait_time"] += time.monotonic() - started
+                    continue
+
+                self._stats["checkouts"] += 1
+                if conn is not None:
+                    self._stats["reused"] += 1
+
+            if conn is None:
+                try:
+                    conn = self._create()
+                except sqlite3.Error:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats["created"] += 1
+            elif not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+
+            conn._owner = thread_id
+            conn.row_factory = sqlite3.Row
+            return conn
+
+    def release(self, conn):
+        """Return a connection to the idle set, rolling back any open transaction"""
+        if conn._pool is not self:
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        conn._released_at = time.monotonic()
+        with self._cond:
+            if conn in self._idle:
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def checkpoint(self, mode="PASSIVE"):
+        """Copy committed WAL frames back into the database file
+
+        Args:
+            mode (str): PASSIVE, FULL, RESTART or TRUNCATE (see SQLite docs)
+
+        Returns:
+            dict: busy flag, frames in the WAL and frames checkpointed,
+                or None if the database is not in WAL mode
+        """
+        mode = mode.upper()
+        if mode not in _CHECKPOINT_MODES:
+            raise ValueError(f"unknown checkpoint mode: {mode}")
+
+        conn = self.connect()
+        try:
+            if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+                return None
+            busy, log_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        finally:
+            conn.close()
+
+        with self._cond:
+            self._stats["checkpoints"] += 1
+        return {"busy": bool(busy), "log_frames": log_frames, "checkpointed_frames": checkpointed}
+
+    def close_all(self):
+        """Close every idle connection; borrowed ones close when released
+
+        When nothing is borrowed the WAL is checkpointed and truncated first
+        so the database file is self-contained.
+        """
+        with self._cond:
+            quiescent = self._size == len(self._idle)
+        if quiescent and self._idle:
+            try:
+                self.checkpoint("TRUNCATE")
+            except sqlite3.Error:
+                pass
+
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Get pool usage counters
+
+        Returns:
+            dict: Counters plus current size, idle count and reuse ratio
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["max_size"] = self.max_size
+            stats["profile"] = dict(self.profile)
+        checkouts = stats["checkouts"]
+        stats["reuse_ratio"] = stats["reused"] / checkouts if checkouts else 0.0
+        return stats
+
+
+def apply_profile(conn, profile):
+    """Apply a PRAGMA profile to a connection
+
+    busy_timeout goes first so that switching journal_mode waits for other
+    connections instead of failing.
+
+    Args:
+        conn (sqlite3.Connection): Connection to configure
+        profile (dict): Mapping of PRAGMA name to value
+    """
+    for name in sorted(profile, key=lambda n: n != "busy_timeout"):
+        if not name.isidentifier():
+            raise ValueError(f"invalid PRAGMA name: {name!r}")
+        value = profile[name]
+        if not isinstance(value, int) and not str(value).isalnum():
+            raise ValueError(f"invalid value for PRAGMA {name}: {value!r}")
+        conn.execute(f"PRAGMA {name} = {value}").fetchall()
+
+
+def get_pool(path, profile=None):
+    """Get the process-wide pool for a database file, creating it on first use
+
+    Args:
+        path (str): Database file path
+        profile (dict, optional): PRAGMA profile used if the pool is created
+            by this call; defaults to DEFAULT_PROFILE
+
+    Returns:
+        ConnectionPool: The pool for ``path``
+    """
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = ConnectionPool(path, profile=profile)
+    return pool
+
+
+def pool_stats():
+    """Get usage counters for every pool in this process
+
+    Returns:
+        dict: Mapping of database path to the pool's stats dictionary
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.path: pool.stats() for pool in pools}
+
+
+def close_all_pools():
+    """Close idle connections in every pool and forget the pools"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+
+atexit.register(close_all_pools)
@@ -0,0 +1,66 @@
+import sqlite3
+from datetime import datetime
+
+
+def current_version(conn):
+    """Get the highest applied migration number
+
+    Args:
+        conn (sqlite3.Connection): Open database connection
+
+    Returns:
+        int: Latest applied version, or 0 for a database never migrated
+    """
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        # schema_version does not exist yet
+        return 0
+    return row[0] or 0
+
+
+def migrate(conn, migrations):
+    """Apply pending migrations, each in its own transaction
+
+    On an up-to-date database this is a single version query. Each pending
+    step runs under BEGIN IMMEDIATE, so concurrent processes serialise and
+    the loser sees the step as already applied.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection
+        migrations (list): (version, name, step) tuples in ascending order;
+            step(conn) must not commit
+
+    Returns:
+        list: Versions applied by this call
+    """
+    version = current_version(conn)
+    pending = [m for m in migrations if m[0] > version]
+    applied = []
+
+    for number, name, step in pending:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""
+                         CREATE TABLE IF NOT EXISTS schema_version
+                         (
+                             version    INTEGER PRIMARY KEY,
+                             name       TEXT NOT NULL,
+                             applied_at TEXT NOT NULL
+                         )
+                         """)
+            if current_version(conn) >= number:
+                # Another process got here first
+                conn.rollback()
+                continue
+
+            step(conn)
+            conn.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                         (number, name, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(number)
+
+    return applied
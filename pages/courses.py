@@ -197,22 +197,16 @@ def display_all_courses_tab(user_id):
     cursor.execute(query, params)
     course_ids = [r[0] for r in cursor.fetchall()]
 
-    # Load full course objects
+    # Load full course objects, keeping the filter query's order
     courses = []
-    for cid in course_ids:
-        cursor.execute("""
+    if course_ids:
+        rows = db.select_in(cursor, """
             SELECT id, title, description, provider, url, difficulty_level, duration, price
-            FROM courses WHERE id=?
-        """, (cid,))
-        c = dict(cursor.fetchone())
-
-        cursor.execute("""
-            SELECT s.id, s.name, s.category
-            FROM skills s JOIN course_skills cs ON s.id=cs.skill_id
-            WHERE cs.course_id=?
-        """, (cid,))
-        c["skills"] = [dict(r) for r in cursor.fetchall()]
-        courses.append(c)
+            FROM courses WHERE id IN ({placeholders})
+        """, course_ids)
+        by_id = {r["id"]: dict(r) for r in rows}
+        courses = [by_id[cid] for cid in course_ids]
+        db.attach_skills(cursor, courses, "course")
 
     conn.close()
 
@@ -130,6 +130,16 @@ if "show_comments" not in st.session_state:
 if "new_comment" not in st.session_state:
     st.session_state.new_comment = {}
 
+# Number of feed pages / comment pages the user has loaded with "Load more"
+if "feed_pages" not in st.session_state:
+    st.session_state.feed_pages = 1
+
+if "comment_pages" not in st.session_state:
+    st.session_state.comment_pages = {}
+
+FEED_PAGE_SIZE = 10
+COMMENT_PAGE_SIZE = 20
+
 
 # Main content
 def main():
@@ -173,13 +183,20 @@ def main():
         # Display feed posts
         st.markdown('<p class="section-header">Recent Posts</p>', unsafe_allow_html=True)
 
-        # Get all posts
-        all_posts = db.get_posts(limit=20)
+        # Get posts with counts, like state and a comment preview, page by page
+        all_posts, next_token = db.load_pages(
+            lambda token: db.get_feed_page(user_id, limit=FEED_PAGE_SIZE, page_token=token),
+            st.session_state.feed_pages
+        )
 
         if all_posts:
             # Display each post
             for post in all_posts:
                 display_post(post, user_id)
+
+            if next_token and st.button("Load more posts", key="load_more_posts"):
+                st.session_state.feed_pages += 1
+                st.rerun()
         else:
             st.info("No posts yet. Be the first to share something with the community!")
 
@@ -236,10 +253,9 @@ def display_post(post, current_user_id):
     post_id = post['id']
     post_date = datetime.strptime(post['created_at'], "%Y-%m-%d %H:%M:%S").strftime("%b %d, %Y")
 
-    # Check if the current user has liked this post
-    has_liked = db.has_user_liked_post(current_user_id, post_id)
+    has_liked = post['liked']
     like_count = post['like_count']
-    comments = post['comments']
+    comment_count = post['comment_count']
 
     # Initialize session state for this post if needed
     if post_id not in st.session_state.show_comments:
@@ -280,7 +296,7 @@ def display_post(post, current_user_id):
 
         with col2:
             # Comment button
-            if st.button(f"💬 {len(comments)}", key=f"comment_{post_id}"):
+            if st.button(f"💬 {comment_count}", key=f"comment_{post_id}"):
                 # Toggle show comments
                 st.session_state.show_comments[post_id] = not st.session_state.show_comments[post_id]
                 st.rerun()
@@ -288,21 +304,18 @@ def display_post(post, current_user_id):
         # Display comments
         if st.session_state.show_comments[post_id]:
             with st.container():
-                # Display existing comments
+                # Load the thread only once the post is expanded
+                comments, next_token = db.load_pages(
+                    lambda token: db.get_post_comments_page(post_id, limit=COMMENT_PAGE_SIZE, page_token=token),
+                    st.session_state.comment_pages.get(post_id, 1)
+                )
                 if comments:
                     for comment in comments:
-                        comment_date = datetime.strptime(comment['created_at'], "%Y-%m-%d %H:%M:%S").strftime(
-                            "%b %d, %Y")
-
-                        st.markdown(f"""
-                        <div class="comment-card">
-                            <div style="display: flex; justify-content: space-between;">
-                                <span class="comment-author">{comment['username']}</span>
-                                <span class="comment-date">{comment_date}</span>
-                            </div>
-                            <p>{comment['content']}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
+                        display_comment(comment)
+
+                    if next_token and st.button("Load more comments", key=f"more_comments_{post_id}"):
+                        st.session_state.comment_pages[post_id] = st.session_state.comment_pages.get(post_id, 1) + 1
+                        st.rerun()
                 else:
                     st.info("No comments yet. Be the first to comment!")
 
@@ -327,6 +340,27 @@ def display_post(post, current_user_id):
                                 st.rerun()
                             else:
                                 st.error("An error occurred while adding your comment. Please try again.")
+        elif post['comments']:
+            # Collapsed: show the newest comments from the feed query
+            for comment in post['comments']:
+                display_comment(comment)
+            if comment_count > len(post['comments']):
+                st.caption(f"View all {comment_count} comments with the 💬 button")
+
+
+def display_comment(comment):
+    """Display a single comment card"""
+    comment_date = datetime.strptime(comment['created_at'], "%Y-%m-%d %H:%M:%S").strftime("%b %d, %Y")
+
+    st.markdown(f"""
+    <div class="comment-card">
+        <div style="display: flex; justify-content: space-between;">
+            <span class="comment-author">{comment['username']}</span>
+            <span class="comment-date">{comment_date}</span>
+        </div>
+        <p>{comment['content']}</p>
+    </div>
+    """, unsafe_allow_html=True)
 
 
 if __name__ == "__main__":
@@ -179,6 +179,10 @@ def render_sidebar():
 render_sidebar()
 
 
+# Gigs fetched per "Load more" click on the Explore tab
+GIG_PAGE_SIZE = 10
+
+
 # Main content
 def main():
     st.markdown('<p class="main-header">Gigs</p>', unsafe_allow_html=True)
@@ -263,8 +267,17 @@ def display_explore_gigs_tab(user_id, user_skills):
         if selected_skill_id:
             filters['skill_ids'] = [selected_skill_id]
 
-    # Get gigs based on filters
-    all_gigs = db.get_gigs(limit=50, **filters)
+    # Start again from the first page whenever the filters change
+    filter_key = tuple(filters.get('skill_ids') or ())
+    if st.session_state.get("explore_gig_filter") != filter_key:
+        st.session_state.explore_gig_filter = filter_key
+        st.session_state.explore_gig_pages = 1
+
+    # Get gigs based on filters, following page tokens for each loaded page
+    all_gigs, next_token = db.load_pages(
+        lambda token: db.get_gigs_page(limit=GIG_PAGE_SIZE, page_token=token, **filters),
+        st.session_state.explore_gig_pages
+    )
 
     if all_gigs:
         # Remove gigs that are already in recommended section
@@ -274,6 +287,10 @@ def display_explore_gigs_tab(user_id, user_skills):
 
         for gig in all_gigs:
             display_gig_card(gig, user_id)
+
+        if next_token and st.button("Load more gigs", key="load_more_gigs"):
+            st.session_state.explore_gig_pages += 1
+            st.rerun()
     else:
         st.info("No gigs found with the selected filters.")
 
@@ -642,6 +659,15 @@ def display_gig_comments(gig_id, user_id, context="default"):
                 st.error("An error occurred while adding your comment. Please try again.")
 
 
+def format_file_size(size):
+    """Format a byte count for display, e.g. 1.5 MB"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
 def display_gig_files(gig_id, user_id, context="default", is_owner=False):
     """Display and upload files for a gig
 
@@ -663,20 +689,38 @@ def display_gig_files(gig_id, user_id, context="default", is_owner=False):
                 st.markdown(f"""
                 <div class="file-card">
                     <span class="file-name">{file['filename']}</span>
-                    <span class="file-size">Uploaded by: {file['username']} on {datetime.strptime(file['uploaded_at'], "%Y-%m-%d %H:%M:%S").strftime("%b %d, %Y")}</span>
+                    <span class="file-size">{format_file_size(file['size'])} • Uploaded by: {file['username']} on {datetime.strptime(file['uploaded_at'], "%Y-%m-%d %H:%M:%S").strftime("%b %d, %Y")}</span>
                 </div>
                 """, unsafe_allow_html=True)
 
             with col2:
-                # Download button with unique key
+                # Only read the file's bytes once the user asks for them.
+                # st.download_button reads its data whole and keeps a copy in
+                # Streamlit's media file manager until the next rerun, so a
+                # prepared download costs its file's size in server memory;
+                # only one file per session is prepared at a time, and saving
+                # it unprepares it so later reruns don't read it again.
                 download_key = f"download_{file['id']}_{context}"
-                st.download_button(
-                    label="Download",
-                    data=file['file_data'],
-                    file_name=file['filename'],
-                    mime="application/octet-stream",
-                    key=download_key
-                )
+                if st.session_state.get("prepared_download") == download_key:
+                    file_stream = db_gig.open_gig_file(file['id'])
+                    if file_stream is not None:
+                        def _unprepare():
+                            st.session_state.pop("prepared_download", None)
+
+                        with file_stream:
+                            st.download_button(
+                                label="Save file",
+                                data=file_stream,
+                                file_name=file['filename'],
+                                mime="application/octet-stream",
+                                key=download_key,
+                                on_click=_unprepare
+                            )
+                    else:
+                        st.error("File is no longer available.")
+                elif st.button("Download", key=f"prepare_{download_key}"):
+                    st.session_state.prepared_download = download_key
+                    st.rerun()
     else:
         st.info("No files uploaded yet.")
 
@@ -690,13 +734,14 @@ def display_gig_files(gig_id, user_id, context="default", is_owner=False):
         file_description = st.text_input("File description (optional)")
         submit_file = st.form_submit_button("Upload File")
 
-        if submit_file and uploaded_file:
-            # Process the uploaded file
-            file_data = uploaded_file.read()
+        if submit_file and uploaded_file and uploaded_file.size > db_gig.MAX_GIG_FILE_SIZE:
+            st.error(f"Files can be at most {format_file_size(db_gig.MAX_GIG_FILE_SIZE)}.")
+        elif submit_file and uploaded_file:
             filename = uploaded_file.name
 
-            # Add file to database
-            file_id = db_gig.add_gig_file(user_id, gig_id, filename, file_data, file_description)
+            # Stream the upload into the file store in chunks
+            uploaded_file.seek(0)
+            file_id = db_gig.add_gig_file(user_id, gig_id, filename, uploaded_file, file_description)
 
             if file_id:
                 st.success("File uploaded successfully!")
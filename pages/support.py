@@ -1,6 +1,9 @@
+from collections import deque
+
 import streamlit as st
 import database as db
 import auth
+import tracing
 from chatbot.bot import FreelanceSupportBot
 
 # Initialize session state
@@ -51,11 +54,20 @@ def render_sidebar():
 
 render_sidebar()
 
+# Messages rendered in full; older ones are kept as one-line summaries
+TRANSCRIPT_WINDOW = 20
+ARCHIVE_SIZE = 200
+SUMMARY_LENGTH = 80
+
+WELCOME = {"role": "bot", "content": "Hello! I'm your freelance assistant. How can I help you today?"}
+
+def reset_chat():
+    st.session_state.chat_messages = deque([WELCOME])
+    st.session_state.chat_archive = deque(maxlen=ARCHIVE_SIZE)
+
 # Initialize chat history
-if "chat_messages" not in st.session_state:
-    st.session_state.chat_messages = [
-        {"role": "bot", "content": "Hello! I'm your freelance assistant. How can I help you today?"}
-    ]
+if "chat_messages" not in st.session_state or "chat_archive" not in st.session_state:
+    reset_chat()
 
 # Initialize our new support bot
 if "support_bot" not in st.session_state:
@@ -68,13 +80,52 @@ def display_message(role, content):
         cls = "user"; avatar = "👤"
     else:
         cls = "bot";  avatar = "🤖"
+    body = content.replace("\n", "<br>")
     st.markdown(f"""
     <div class="chat-message {cls}">
       <div class="avatar">{avatar}</div>
-      <div class="message-content">{content.replace('\\n','<br>')}</div>
+      <div class="message-content">{body}</div>
     </div>
     """, unsafe_allow_html=True)
 
+def add_message(role, content):
+    """Append a message, moving the oldest beyond the window to the archive."""
+    messages = st.session_state.chat_messages
+    messages.append({"role": role, "content": content})
+    while len(messages) > TRANSCRIPT_WINDOW:
+        old = messages.popleft()
+        text = " ".join(old["content"].split())
+        if len(text) > SUMMARY_LENGTH:
+            text = text[:SUMMARY_LENGTH - 1] + "…"
+        st.session_state.chat_archive.append(("👤" if old["role"] == "user" else "🤖") + " " + text)
+
+def render_debug():
+    """Timing breakdown of the bot's last response, plus the stage histograms."""
+    trace = st.session_state.support_bot.last_trace
+    with st.expander("Debug: last response timing"):
+        if trace is None:
+            st.write("No response yet.")
+        else:
+            lines = []
+            for span in trace.spans:
+                label = "  " * span["depth"] + span["name"]
+                duration = span["duration_ms"]
+                duration = f"{duration:>9.2f} ms" if duration is not None else f"{'?':>9} ms"
+                if span.get("unfinished"):
+                    duration += " (left open, ended with its parent)"
+                lines.append(f"{label:<40}{span['start_ms']:>9.2f} ms +{duration}")
+            st.text("\n".join(lines))
+        if st.checkbox("Show stage histograms", key="show_histograms"):
+            st.download_button("Download JSON", tracing.export_json(),
+                               file_name="stage_histograms.json", mime="application/json")
+            st.code(tracing.export_prometheus(), language="text")
+
+def ask(question):
+    """Send a question to the bot and record both sides of the exchange."""
+    add_message("user", question)
+    add_message("bot", st.session_state.support_bot.get_response(question))
+    st.rerun()
+
 def main():
     st.markdown('<p class="main-header">Freelancer Support</p>', unsafe_allow_html=True)
     st.markdown('<p class="sub-header">Get answers and advice for your freelancing journey</p>', unsafe_allow_html=True)
@@ -84,12 +135,15 @@ def main():
     with col1:
         # Clear history
         if st.button("🗑️ Clear Chat History", key="clear_history"):
-            st.session_state.chat_messages = [
-                {"role": "bot", "content": "Hello! I'm your freelance assistant. How can I help you today?"}
-            ]
+            reset_chat()
+            st.session_state.support_bot.memory.clear()
             st.rerun()
 
         st.markdown('<p class="section-header">Chat with Support Assistant</p>', unsafe_allow_html=True)
+        archive = st.session_state.chat_archive
+        if archive:
+            with st.expander(f"Earlier messages ({len(archive)})"):
+                st.text("\n".join(archive))
         for msg in st.session_state.chat_messages:
             display_message(msg["role"], msg["content"])
 
@@ -98,12 +152,9 @@ def main():
             user_input = st.text_input("Type your message...", key="user_message")
             submitted = st.form_submit_button("Send")
             if submitted and user_input:
-                # user message
-                st.session_state.chat_messages.append({"role":"user","content":user_input})
-                # bot response
-                reply = st.session_state.support_bot.get_response(user_input)
-                st.session_state.chat_messages.append({"role":"bot","content":reply})
-                st.rerun()
+                ask(user_input)
+
+        render_debug()
 
     with col2:
         # Common Topics
@@ -124,10 +175,7 @@ def main():
                 </div>
             """, unsafe_allow_html=True)
             if st.button(f"Ask about {title}", key=f"topic_{title}", help=question):
-                st.session_state.chat_messages.append({"role":"user","content":question})
-                reply = st.session_state.support_bot.get_response(question)
-                st.session_state.chat_messages.append({"role":"bot","content":reply})
-                st.rerun()
+                ask(question)
 
         # Personalized Skill Analysis
         user_id = auth.get_current_user_id()
@@ -136,11 +184,7 @@ def main():
             with st.expander("Get Personalized Skill Analysis", expanded=True):
                 st.write("Click below to analyze your skill profile:")
                 if st.button("Analyze My Skills", key="analyze_skills"):
-                    q = "analyze my skill profile"
-                    st.session_state.chat_messages.append({"role":"user","content":q})
-                    reply = st.session_state.support_bot.get_response(q)
-                    st.session_state.chat_messages.append({"role":"bot","content":reply})
-                    st.rerun()
+                    ask("analyze my skill profile")
 
         # More Questions
         st.markdown('<p class="section-header">More Questions</p>', unsafe_allow_html=True)
@@ -158,10 +202,7 @@ def main():
                 st.markdown(f"**{title}**")
             with colB:
                 if st.button("Ask", key=f"ask_{title}", help=question):
-                    st.session_state.chat_messages.append({"role":"user","content":question})
-                    reply = st.session_state.support_bot.get_response(question)
-                    st.session_state.chat_messages.append({"role":"bot","content":reply})
-                    st.rerun()
+                    ask(question)
 
 if __name__ == "__main__":
     main()
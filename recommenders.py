@@ -40,9 +40,13 @@ def recommend_gigs(user_id, limit=5):
     # Sort by number of matching skills
     return recommended_gigs
 
-def recommend_courses(user_id, limit=10):
-    """Recommend courses based on the user's existing skills and proficiency."""
-    user_skills = db.get_user_skills(user_id)
+def recommend_courses(user_id, limit=10, user_skills=None):
+    """Recommend courses based on the user's existing skills and proficiency.
+
+    Pass user_skills when the caller already has them to skip reading them again.
+    """
+    if user_skills is None:
+        user_skills = db.get_user_skills(user_id)
     if not user_skills:
         return []
 
@@ -91,15 +95,8 @@ def recommend_courses(user_id, limit=10):
     cursor.execute(sql, params)
     courses = [dict(row) for row in cursor.fetchall()]
 
-    # 3) Attach each course's skill list
-    for course in courses:
-        cursor.execute("""
-          SELECT s.id, s.name, s.category
-          FROM skills s
-          JOIN course_skills cs ON s.id = cs.skill_id
-          WHERE cs.course_id = ?
-        """, (course["id"],))
-        course["skills"] = [dict(r) for r in cursor.fetchall()]
+    # 3) Attach every course's skill list in one query
+    db.attach_skills(cursor, courses, "course")
 
     conn.close()
     return courses
@@ -167,18 +164,12 @@ def get_skill_gap_courses(user_id, limit=5):
             continue
         seen_courses.add(course["id"])
 
-        # attach its skills
-        cursor.execute("""
-          SELECT s.id, s.name, s.category
-          FROM skills s
-          JOIN course_skills cs ON s.id = cs.skill_id
-          WHERE cs.course_id = ?
-        """, (course["id"],))
-        course["skills"] = [dict(r) for r in cursor.fetchall()]
-
         gap_courses.append(course)
         if len(gap_courses) >= limit:
             break
 
+    # 4) attach their skills in one query
+    db.attach_skills(cursor, gap_courses, "course")
+
     conn.close()
     return gap_courses
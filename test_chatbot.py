@@ -1,8 +1,713 @@
-from chatbot import FreelancerSupportChatbot
+import importlib.util
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
 
-bot = FreelancerSupportChatbot()
+import numpy as np
+import pytest
+import spacy
 
-print(bot.respond("How do I find my first client?"))
-print(bot.respond("Tips for gig listings"))
-print(bot.respond("Hi there!"))
-print(bot.respond("How should I price my services?"))
+import database as db
+import tracing
+from chatbot import (IntentClassifier, SemanticFallback, intent_prototypes, knowledge_base, model_registry,
+                     onnx_encoder, query_cache, semantic_fallback)
+from chatbot.bot import FreelanceSupportBot
+from chatbot.conversation import ConversationMemory
+from chatbot.inference_client import RemoteIntentPipeline
+from chatbot.inference_server import make_server
+from chatbot.pipeline import IntentPipeline
+
+
+@pytest.fixture
+def registry():
+    model_registry.clear()
+    yield model_registry
+    model_registry.clear()
+
+
+@pytest.fixture
+def blank_nlp(registry):
+    # Matcher and PhraseMatcher only look at LOWER, which the tokenizer sets,
+    # so a blank pipeline stands in for en_core_web_md where it is not installed
+    return registry.get_or_load(("spacy", registry.SPACY_MODEL, "tokenizer"), lambda: spacy.blank("en"))
+
+
+class HashingEncoder:
+    """Deterministic bag-of-words encoder with the sentence-transformers encode() shape"""
+
+    dim = 256
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        self.calls += 1
+        single = isinstance(texts, str)
+        rows = np.zeros((1 if single else len(texts), self.dim), dtype=np.float32)
+        for row, text in zip(rows, [texts] if single else texts):
+            for word in text.lower().split():
+                row[zlib.crc32(word.encode()) % self.dim] += 1.0
+        if normalize_embeddings:
+            rows /= np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+        return rows[0] if single else rows
+
+
+@pytest.fixture
+def hashing_encoder(registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(intent_prototypes, "PROTOTYPE_DIR", str(tmp_path / "prototypes"))
+    monkeypatch.setattr(knowledge_base, "KB_DIR", str(tmp_path / "knowledge_base"))
+    monkeypatch.setattr(knowledge_base, "ARTICLE_DIR", str(tmp_path / "articles"))
+    monkeypatch.setattr(registry, "ENCODER_BACKEND", "torch")
+    encoder = HashingEncoder()
+    registry.get_or_load(("encoder", registry.ENCODER_MODEL, "torch"), lambda: encoder)
+    registry.get_or_load(("model_digest", registry.ENCODER_MODEL, "torch"), lambda: "hashing")
+    return encoder
+
+
+def support_questions():
+    with open(os.path.join(os.path.dirname(__file__), "benchmarks", "support_questions.json")) as f:
+        return [row["text"] for row in json.load(f)]
+
+
+def test_registry_loads_each_model_once_across_threads(registry):
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return np.zeros((14, 384), dtype=np.float32)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get_or_load(("test", "m"), slow_loader)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+    stats = registry.registry_stats()
+    assert stats["test:m"]["hits"] == 7
+    assert stats["test:m"]["size_bytes"] == 14 * 384 * 4
+    assert stats["test:m"]["load_seconds"] >= 0.05
+    assert stats["total"]["models"] == 1
+
+
+def test_classifiers_share_one_pipeline(blank_nlp):
+    first, second = IntentClassifier(blank_nlp), IntentClassifier(blank_nlp)
+    assert first.nlp is second.nlp
+
+    assert first.classify("How do I find my first client?") == "finding_clients"
+    assert first.classify("Hi there!") == "greeting"
+    assert first.classify("How should I price my services?") == "pricing"
+    assert first.classify("Can you sing?") is None
+
+
+def test_bot_defers_semantic_stage_until_rules_miss(fresh_db, blank_nlp):
+    torch_loaded = "torch" in sys.modules
+    user_id = db.create_user("dev", "dev@example.com", "pw")
+
+    bot = FreelanceSupportBot(user_id, warm_semantic=False)
+    assert bot.pipeline.intent_clf.nlp is blank_nlp
+    assert bot.get_response("hello").startswith(("Hello", "Hi", "Hey"))
+
+    # A rule hit never touches the semantic stage or imports torch
+    assert bot.pipeline._semantic_clf is None and not bot.pipeline._semantic_unavailable
+    assert ("torch" in sys.modules) == torch_loaded
+
+
+@pytest.mark.skipif(importlib.util.find_spec("sentence_transformers") is not None,
+                    reason="checks the rules-only mode used when sentence-transformers is missing")
+def test_bot_answers_without_semantic_stage(fresh_db, blank_nlp):
+    user_id = db.create_user("dev", "dev@example.com", "pw")
+    bot = FreelanceSupportBot(user_id, warm_semantic=False)
+
+    assert "freelanc" in bot.get_response("Can you sing?")
+    assert bot.pipeline._semantic_unavailable
+
+
+def _annotating_pipeline():
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    nlp.add_pipe("entity_ruler").add_patterns([{"label": "ORG", "pattern": "Upwork"}])
+    return nlp
+
+
+@pytest.mark.parametrize("load", [
+    _annotating_pipeline,
+    pytest.param(lambda: spacy.load(model_registry.SPACY_MODEL),
+                 marks=pytest.mark.skipif(not spacy.util.is_package(model_registry.SPACY_MODEL),
+                                          reason="spaCy model not installed")),
+])
+def test_tokenizer_only_path_matches_full_pipeline(load):
+    nlp = load()
+    full = IntentClassifier(nlp, tokenizer_only=False)
+    fast = IntentClassifier(nlp, tokenizer_only=True)
+    questions = support_questions() + ["We met on Upwork. How should I price my services?"]
+
+    expected = [full.classify(q) for q in questions]
+    assert [fast.classify(q) for q in questions] == expected
+    assert sum(intent is not None for intent in expected) > len(questions) // 2
+
+
+def test_keyword_prefilter_agrees_with_spacy_matchers():
+    import random
+
+    from chatbot.intent_classifier import PHRASES, TOKEN_PATTERNS
+    from chatbot.keyword_prefilter import AMBIGUOUS, expand_token_pattern
+
+    nlp = spacy.blank("en")
+    fast, spacy_only = IntentClassifier(nlp), IntentClassifier(nlp, prefilter=False)
+
+    # pattern words with the punctuation and contractions that decide tokenization
+    words = sorted({token for patterns in TOKEN_PATTERNS.values() for pattern in patterns
+                    for tokens in expand_token_pattern(pattern) for token in tokens}
+                   | {word for texts in PHRASES.values() for text in texts for word in text.split()}
+                   | {"a", "no", "mr", "gonna", "cannot", "10"})
+    rng = random.Random(7)
+    messages = support_questions() + [
+        " ".join(rng.choice(words) + rng.choice(["", "", ",", ".", ":", "?", "'s", "-"])
+                 for _ in range(rng.randint(1, 8)))
+        for _ in range(3000)]
+
+    keys = [query_cache.normalize(m) for m in messages]
+    assert [fast._classify_key(k) for k in keys] == [spacy_only._classify_key(k) for k in keys]
+    assert fast.classify_many(messages) == spacy_only.classify_many(messages)
+
+    # phrases still beat keywords, and plain questions never need spaCy
+    assert fast.prefilter.resolve("what should i charge for a contract".split()) == "pricing"
+    assert fast.prefilter.resolve("contract price".split()) == "contract"
+    assert fast._prefilter("can you sing") == (None, ())
+    assert fast._prefilter("what's the rate") is AMBIGUOUS
+
+
+def test_prototypes_are_encoded_once_then_memory_mapped(tmp_path):
+    encoder = HashingEncoder()
+    store = str(tmp_path / "prototypes")
+
+    built = intent_prototypes.load_or_build("mini", "digest", lambda: encoder, directory=store)
+    assert encoder.calls == 1
+    assert built.matrix.dtype == np.float32 and built.matrix.flags["C_CONTIGUOUS"]
+
+    loaded = intent_prototypes.load_or_build("mini", "digest", lambda: encoder, directory=store)
+    assert encoder.calls == 1
+    assert isinstance(loaded.matrix, np.memmap)
+    assert loaded.labels == built.labels
+    np.testing.assert_array_equal(loaded.matrix, built.matrix)
+
+    key = intent_prototypes.store_key("mini", "digest")
+    assert intent_prototypes.store_key("other", "digest") != key
+    assert intent_prototypes.store_key("mini", "retrained") != key
+    edited = dict(intent_prototypes.EXEMPLARS, thanks=["ta"])
+    assert intent_prototypes.store_key("mini", "digest", edited) != key
+
+
+def test_prototypes_are_rebuilt_when_weights_change_under_the_same_name(registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(intent_prototypes, "PROTOTYPE_DIR", str(tmp_path / "prototypes"))
+    monkeypatch.setattr(registry, "ENCODER_BACKEND", "torch")
+    checkpoint = tmp_path / "mini"
+    checkpoint.mkdir()
+    (checkpoint / "config.json").write_text('{"hidden_size": 256}')
+    (checkpoint / "model.safetensors").write_bytes(b"old weights")
+
+    def prototypes():
+        registry.clear()
+        encoder = registry.get_or_load(("encoder", str(checkpoint), "torch"), HashingEncoder)
+        registry.get_intent_prototypes(str(checkpoint))
+        return encoder.calls
+
+    assert prototypes() == 1
+    assert prototypes() == 0
+    (checkpoint / "model.safetensors").write_bytes(b"new weights")
+    assert prototypes() == 1
+    assert len(os.listdir(tmp_path / "prototypes")) == 4
+
+
+def test_prototype_scores_take_best_exemplar_per_intent():
+    encoder = HashingEncoder()
+    prototypes = intent_prototypes.build(encoder)
+    assert prototypes.intents == semantic_fallback.INTENTS
+
+    query = encoder.encode("how much should I charge", normalize_embeddings=True)
+    scores = prototypes.intent_scores(query)
+    for intent in prototypes.intents:
+        rows = [i for i, label in enumerate(prototypes.labels) if label == intent]
+        assert scores[intent] == pytest.approx(float(np.max(prototypes.matrix[rows] @ query)))
+    assert prototypes.best(query) == ("pricing", pytest.approx(1.0))
+
+
+def test_semantic_fallback_uses_stored_prototypes(hashing_encoder):
+    clf = SemanticFallback()
+    assert clf.classify("How do I get paid") == "payment"
+    assert clf.classify("zebra xylophone") is None
+    assert f"intent_prototypes:{model_registry.ENCODER_MODEL}:torch" in model_registry.registry_stats()
+
+
+def test_lru_cache_counts_and_evicts_least_recent():
+    cache = query_cache.LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get_or_compute("c", lambda: pytest.fail("cached value recomputed")) == 3
+    assert cache.stats() == {"size": 2, "max_size": 2, "hits": 2, "misses": 1, "evictions": 1,
+                             "hit_ratio": pytest.approx(2 / 3)}
+    assert query_cache.normalize("  Tips for   effective GIG listings?! ") == "tips for effective gig listings"
+
+
+def test_shared_classifiers_share_intent_and_embedding_caches(blank_nlp, hashing_encoder):
+    first, second = IntentClassifier(), IntentClassifier()
+    assert first.cache is second.cache
+
+    assert first.classify("Tips for effective gig listings") == "gig_creation"
+    assert second.classify("tips for effective gig listings?") == "gig_creation"
+    assert first.cache.stats()["hits"] == 1
+
+    semantic = SemanticFallback()
+    calls = hashing_encoder.calls
+    for text in ("How do I get paid?", "how do i get paid", "How do I get paid"):
+        assert semantic.classify(text) == "payment"
+    assert hashing_encoder.calls == calls + 1
+    assert SemanticFallback().cache.stats()["hits"] == 2
+    assert not semantic.embed("how do i get paid").flags.writeable
+
+
+def test_encoder_backend_uses_onnx_export_only_when_runnable(tmp_path, monkeypatch):
+    monkeypatch.setattr(onnx_encoder, "ONNX_DIR", str(tmp_path))
+    monkeypatch.setattr(model_registry, "ENCODER_BACKEND", "auto")
+    assert model_registry.encoder_backend() == "torch"
+
+    export_dir = onnx_encoder.model_dir(model_registry.ENCODER_MODEL)
+    os.makedirs(export_dir)
+    for name in ("model.onnx", "tokenizer.json"):
+        open(os.path.join(export_dir, name), "wb").close()
+    runnable = all(importlib.util.find_spec(m) is not None for m in ("onnxruntime", "tokenizers"))
+    assert model_registry.encoder_backend() == ("onnx" if runnable else "torch")
+
+    monkeypatch.setattr(model_registry, "ENCODER_BACKEND", "torch")
+    assert model_registry.encoder_backend() == "torch"
+
+
+def test_classify_many_matches_single_classification(blank_nlp, hashing_encoder, fresh_db):
+    questions = support_questions()
+    rules = IntentClassifier()
+    batch = rules.classify_many(questions + questions[:3], batch_size=8)
+    assert [intent for intent, _ in batch] == [IntentClassifier(blank_nlp).classify(q) for q in questions + questions[:3]]
+    assert all(score == (1.0 if intent else 0.0) for intent, score in batch)
+
+    semantic = SemanticFallback()
+    calls = hashing_encoder.calls
+    batch = semantic.classify_many(questions, batch_size=16)
+    assert hashing_encoder.calls == calls + 1
+    singles = [semantic.classify(q) for q in questions]
+    assert hashing_encoder.calls == calls + 1
+    assert [intent for intent, _ in batch] == singles
+    assert all(-1.0 <= score <= 1.0 + 1e-6 for _, score in batch)
+    # cached embeddings own their memory instead of viewing the batch matrix
+    cached = semantic.cache.get(query_cache.normalize(questions[0]))
+    assert cached.base is None and not cached.flags.writeable
+
+    bot = FreelanceSupportBot(db.create_user("dev", "dev@example.com", "pw"), warm_semantic=False)
+    results = bot.classify_many(["hello", "How do I get paid", "zebra xylophone"])
+    assert [(intent, stage) for intent, _, stage in results] == [
+        ("greeting", "rules"), ("payment", "semantic"), (None, None)]
+
+
+def test_eval_harness_scores_accuracy_and_confusion():
+    from benchmarks.chatbot_eval import score_predictions
+
+    result = score_predictions(["pricing", "pricing", "contract", None],
+                               ["pricing", None, "contract", "greeting"])
+    assert result["accuracy"] == 0.5
+    assert result["per_intent"]["pricing"] == {"n": 2, "correct": 1, "accuracy": 0.5}
+    assert result["confusion"]["pricing"] == {"pricing": 1, "(none)": 1}
+    assert result["confusion"]["(none)"] == {"greeting": 1}
+    json.dumps(result)
+
+
+def test_conversation_memory_is_bounded_and_encodes_each_turn_once():
+    memory = ConversationMemory(max_turns=3)
+    for text, intent in [("hi", "greeting"), ("what should i charge", "pricing"),
+                         ("how do i find my first client", "finding_clients"), ("can you sing", None)]:
+        memory.add(text, intent)
+    assert len(memory) == 3 and memory.turns[0].text == "what should i charge"
+
+    # not a follow-up, or no embeddings: nothing / the latest topic
+    assert memory.resolve("can you dance") == (None, None)
+    assert memory.resolve("and on upwork?") == ("finding_clients", None)
+
+    encoded = []
+
+    def embed(text):
+        encoded.append(text)
+        return HashingEncoder().encode(text, normalize_embeddings=True)
+
+    intent, embedding = memory.resolve("and what should i charge on upwork", embed)
+    assert intent == "pricing" and embedding is not None
+    memory.resolve("also how do i find one", embed)
+    # history was encoded on the first follow-up only
+    assert encoded.count("what should i charge") == 1
+    assert encoded.count("how do i find my first client") == 1
+
+
+def test_bot_resolves_follow_ups_from_conversation(fresh_db, blank_nlp):
+    bot = FreelanceSupportBot(db.create_user("dev", "dev@example.com", "pw"), warm_semantic=False)
+
+    for text in ["Can you sing?", "And on weekends?", "Hello", "How do I find my first client?",
+                 "And what about on Upwork?", "and for pricing?", "what about beginners?"]:
+        bot.get_response(text)
+
+    assert [turn.intent for turn in bot.memory.turns] == [
+        None, None, "greeting", "finding_clients", "finding_clients", "pricing", "pricing"]
+    assert bot.get_response("Thanks!") and bot.get_response("why?").startswith("Setting the right price")
+
+
+def test_knowledge_base_chunks_articles():
+    article = "First sentence here. Second one follows.\n\n" + " ".join(["word"] * 25) + ". Short end."
+    assert knowledge_base.chunk(article, max_words=10) == [
+        "First sentence here. Second one follows.",
+        " ".join(["word"] * 10), " ".join(["word"] * 10), " ".join(["word"] * 5) + ". Short end."]
+
+
+def test_knowledge_base_persists_and_inserts_incrementally(hashing_encoder, tmp_path):
+    from chatbot.response_generator import TIPS
+
+    kb = model_registry.get_knowledge_base()
+    assert len(kb) == sum(len(tips) for tips in TIPS.values())
+
+    query = hashing_encoder.encode("pricing models hourly retainer", normalize_embeddings=True)
+    (score, best), = kb.search(query, k=1)
+    assert best["intent"] == "pricing" and "retainer" in best["text"]
+
+    # a new article: only its snippets are encoded, the rest is read back from disk
+    os.makedirs(knowledge_base.ARTICLE_DIR)
+    with open(os.path.join(knowledge_base.ARTICLE_DIR, "escrow.md"), "w") as f:
+        f.write("Use escrow milestones for large projects.\n\nRelease each milestone after approval.")
+    encoded = []
+
+    class Recording(HashingEncoder):
+        def encode(self, texts, **kwargs):
+            encoded.extend(texts)
+            return super().encode(texts, **kwargs)
+
+    store = os.path.join(knowledge_base.KB_DIR, f"{model_registry.ENCODER_MODEL}-hashing")
+    reopened = knowledge_base.load_or_build(model_registry.ENCODER_MODEL, "hashing", Recording)
+    assert encoded == ["Use escrow milestones for large projects.", "Release each milestone after approval."]
+    assert len(reopened) == len(kb) + 2 and reopened.directory == store
+    assert isinstance(reopened.matrix, np.memmap)
+
+    query = hashing_encoder.encode("escrow milestones", normalize_embeddings=True)
+    assert reopened.search(query, k=1)[0][1]["source"] == "escrow.md"
+    assert knowledge_base.load_or_build(model_registry.ENCODER_MODEL, "hashing",
+                                        lambda: pytest.fail("re-encoded")).count == len(reopened)
+
+    # new weights under the same name get a store of their own, and rows
+    # from another model are never appended to this one
+    retrained = knowledge_base.load_or_build(model_registry.ENCODER_MODEL, "retrained", Recording)
+    assert retrained.directory != store and len(retrained) == len(reopened)
+    assert knowledge_base.KnowledgeBase(store).model_digest == "hashing"
+    with pytest.raises(ValueError):
+        knowledge_base.KnowledgeBase(store, "retrained").add(
+            [knowledge_base.snippet("late", "test")], hashing_encoder.encode(["late"]))
+    assert len(knowledge_base.KnowledgeBase(store)) == len(reopened)
+
+
+def test_knowledge_base_index_matches_exhaustive_search(tmp_path, monkeypatch):
+    rng = np.random.default_rng(3)
+    centers = rng.standard_normal((40, 32)).astype(np.float32)
+    rows = centers[rng.integers(0, 40, 3000)] + 0.2 * rng.standard_normal((3000, 32)).astype(np.float32)
+    rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+
+    kb = knowledge_base.KnowledgeBase(str(tmp_path / "kb"))
+    kb.add([knowledge_base.snippet(str(i), "bench") for i in range(2000)], rows[:2000])
+    queries = rows[rng.integers(0, 3000, 20)]
+
+    monkeypatch.setattr(knowledge_base, "INDEX_MIN_ROWS", 0)
+    kb.build_index(n_lists=16)
+    kb.add([knowledge_base.snippet(str(i), "bench") for i in range(2000, 3000)], rows[2000:])
+    assert set(np.asarray(kb.lists).tolist()) <= set(range(16))
+
+    reopened = knowledge_base.KnowledgeBase(str(tmp_path / "kb"))
+    assert reopened.count == 3000 and reopened.indexed_count == 2000
+    # probing every group is exact, rows added after training included
+    exact = [[str(i) for i in np.argsort(-(rows @ q))[:5]] for q in queries]
+    assert [[hit["text"] for _, hit in reopened.search(q, k=5, n_probe=16)] for q in queries] == exact
+    found = sum(len(set(e) & {hit["text"] for _, hit in reopened.search(q, k=5, n_probe=4)})
+                for e, q in zip(exact, queries))
+    assert found >= 0.9 * 5 * len(queries)
+
+    # searches share the index without serialising on the lock, and stay
+    # exact while rows are being added
+    results = []
+    searches = [threading.Thread(target=lambda: results.append(
+        [[hit["text"] for _, hit in reopened.search(q, k=5, n_probe=16)] for q in queries])) for _ in range(4)]
+    for t in searches:
+        t.start()
+    reopened.add([knowledge_base.snippet("late", "bench")], -rows[:1])
+    for t in searches:
+        t.join()
+    assert results == [exact] * 4
+
+
+def test_bot_answers_unmatched_questions_from_knowledge_base(fresh_db, blank_nlp, hashing_encoder, monkeypatch):
+    # bag-of-words vectors agree less than sentence embeddings do
+    monkeypatch.setattr(knowledge_base, "MIN_SCORE", 0.3)
+    bot = FreelanceSupportBot(db.create_user("dev", "dev@example.com", "pw"), warm_semantic=False)
+
+    answer = bot.get_response("Should I use different models: hourly, project-based, or retainer?")
+    assert answer.startswith("Here's what I found")
+    assert "retainer" in answer
+    assert not bot.get_response("Can you sing?").startswith("Here's what I found")
+
+
+def test_user_context_snapshot_serves_answers_without_queries(fresh_db, monkeypatch):
+    from benchmarks.query_counts import StatementCounter, seed
+    from chatbot import user_context
+    from chatbot.response_generator import ResponseGenerator
+
+    user_context.clear()
+    user_id, _ = seed(gigs=12, posts=0)
+    resp = ResponseGenerator(user_id=user_id, user_name="viewer")
+    assert "strongest category" in resp.analyze_skill_profile()
+
+    # steady state: the skills version lookup is the only query
+    reads = []
+    get_skills_version = db.get_skills_version
+    monkeypatch.setattr(db, "get_skills_version", lambda uid: reads.append(uid) or get_skills_version(uid))
+    with StatementCounter() as counter:
+        for _ in range(3):
+            resp.get_finding_clients()
+            resp.get_pricing()
+            resp.get_skill_improvement()
+            resp.analyze_skill_profile()
+    assert reads and counter.count == len(reads)
+
+    # a write that changes nothing keeps the snapshot, a real edit is seen at once
+    version = db.get_skills_version(user_id)
+    db.update_user_skills(user_id, [{"skill_id": s["id"], "proficiency_level": s["proficiency_level"],
+                                     "years_experience": s["years_experience"]} for s in resp.user_skills])
+    assert db.get_skills_version(user_id) == version
+    db.update_user_skills(user_id, [{"skill_id": 3, "proficiency_level": "Expert", "years_experience": 9}])
+    assert [(s["id"], s["proficiency_level"]) for s in resp.user_skills] == [(3, "Expert")]
+
+    # so is one written by another process, which shares nothing but the file
+    other = sqlite3.connect(fresh_db)
+    with other:
+        other.execute("UPDATE user_skills SET proficiency_level = 'Beginner' WHERE user_id = ?", (user_id,))
+        other.execute("UPDATE users SET skills_version = skills_version + 1 WHERE id = ?", (user_id,))
+    other.close()
+    assert [(s["id"], s["proficiency_level"]) for s in resp.user_skills] == [(3, "Beginner")]
+
+    # and snapshots older than the TTL are rebuilt
+    monkeypatch.setattr(user_context, "CONTEXT_TTL", 0.0)
+    with StatementCounter() as counter:
+        resp.user_skills
+    assert counter.count > 0
+
+
+def test_classifier_ranks_every_intent_by_coverage(blank_nlp):
+    clf = IntentClassifier(blank_nlp)
+
+    assert clf.classify_all("How do I price and write a contract?") == (("pricing", 0.125), ("contract", 0.125))
+    assert clf.classify_all("find client and price") == (("finding_clients", 0.5), ("pricing", 0.25))
+    # a keyword inside another intent's phrase belongs to the phrase
+    assert clf.classify_all("tips to improve my profile") == (("profile_tips", 1.0),)
+    assert [intent for intent, _ in clf.classify_all("hi, how should I price my services?")] == ["pricing", "greeting"]
+    assert clf.classify("hi, how should I price my services?") == "pricing"
+    assert clf.classify_all("can you sing") == ()
+
+
+def test_pipeline_ranks_rule_matches_with_one_embedding(blank_nlp, hashing_encoder):
+    pipeline = IntentPipeline(warm_semantic=False)
+    assert pipeline.semantic_clf is not None
+    calls = hashing_encoder.calls
+
+    results = pipeline.classify_all("how do I price and write a contract")
+    assert sorted(intent for intent, _, _ in results) == ["contract", "pricing"]
+    assert {stage for _, _, stage in results} == {"rules"}
+    pipeline.embedder()("how do I price and write a contract")
+    assert hashing_encoder.calls == calls + 1
+
+    # a single rule match needs no embedding at all
+    assert pipeline.classify_all("what should i charge") == [("pricing", 1.0, "rules")]
+    assert hashing_encoder.calls == calls + 1
+
+    # a batch is embedded in one encoder call, with the same results
+    batch = ["find client and price", "what should i charge", "can you sing", "hello"]
+    fresh = IntentPipeline(warm_semantic=False)
+    assert pipeline.classify_all_many(batch) == [fresh.classify_all(text) for text in batch]
+    assert hashing_encoder.calls == calls + 2
+
+
+def test_bot_composes_one_answer_for_several_intents(fresh_db, blank_nlp):
+    bot = FreelanceSupportBot(db.create_user("dev", "dev@example.com", "pw"), warm_semantic=False)
+
+    response = bot.get_response("How do I price and write a contract?")
+    assert response.startswith("Setting the right price") and "Good contracts protect" in response
+    assert [span["name"] for span in bot.last_trace.spans].count("handler") == 2
+    assert bot.memory.turns[-1].intent == "pricing"
+
+    # small talk is dropped next to a real question, kept on its own
+    assert bot.get_response("Hi, how should I price my services?").startswith("Setting the right price")
+    bot.get_response("hello")
+    assert bot.memory.turns[-1].intent == "greeting"
+
+
+def test_tracing_histograms_export_json_and_prometheus():
+    tracing.reset()
+    for seconds in (0.0002, 0.003, 0.003, 7.0):
+        span = tracing.start_span("stage")
+        span.started -= seconds
+        tracing.end_span(span)
+
+    histogram = tracing.snapshot()["stage"]
+    assert histogram["count"] == 4 and histogram["sum"] == pytest.approx(7.0062, abs=1e-3)
+    assert histogram["buckets"]["0.0005"] == 1 and histogram["buckets"]["0.005"] == 3
+    assert histogram["buckets"]["5.0"] == 3 and histogram["buckets"]["+Inf"] == 4
+    assert json.loads(tracing.export_json()) == tracing.snapshot()
+
+    text = tracing.export_prometheus()
+    assert "# TYPE freelancehub_stage_seconds histogram" in text
+    assert 'freelancehub_stage_seconds_bucket{stage="stage",le="0.005"} 3' in text
+    assert 'freelancehub_stage_seconds_count{stage="stage"} 4' in text
+    tracing.reset()
+
+
+def test_bot_traces_stages_and_handler_queries(fresh_db, blank_nlp):
+    from benchmarks.query_counts import seed
+    from chatbot import user_context
+
+    user_context.clear()
+    tracing.reset()
+    user_id, _ = seed(gigs=12, posts=0)
+    bot = FreelanceSupportBot(user_id, warm_semantic=False)
+    bot.get_response("analyze my skill profile")
+
+    spans = bot.last_trace.spans
+    names = [span["name"] for span in spans]
+    assert names[:4] == ["get_response", "classify", "rules", "handler"]
+    assert all(span["duration_ms"] is not None for span in spans)
+    handler = names.index("handler")
+    queries = [span for span in spans[handler + 1:] if span["name"].startswith("db.")]
+    assert {"db.get_user_skills", "db._build"} <= {span["name"] for span in queries}
+    assert all(span["depth"] > spans[handler]["depth"] for span in queries)
+
+    # connections borrowed outside a trace are not timed
+    db.get_user_skills(user_id)
+    assert tracing.snapshot()["db.get_user_skills"]["count"] == names.count("db.get_user_skills")
+    tracing.reset()
+
+
+def test_trace_ends_spans_left_open(fresh_db):
+    # a connection never closed, then one abandoned by an exception
+    with tracing.trace("request") as trace:
+        with tracing.span("first"):
+            leaked = db.get_db_connection()
+        with tracing.span("second"):
+            pass
+    leaked.close()
+
+    assert [(s["name"], s["depth"], s["unfinished"]) for s in trace.spans] == [
+        ("request", 0, False), ("first", 1, False),
+        ("db.test_trace_ends_spans_left_open", 2, True), ("second", 1, False)]
+    assert all(s["duration_ms"] is not None for s in trace.spans)
+
+    with pytest.raises(RuntimeError):
+        with tracing.trace("request") as trace:
+            conn = db.get_db_connection()
+            raise RuntimeError("handler failed")
+    assert [(s["depth"], s["unfinished"]) for s in trace.spans] == [(0, False), (1, True)]
+    assert all(s["duration_ms"] is not None for s in trace.spans)
+    conn.close()
+    assert tracing.snapshot()["db.test_trace_ends_spans_left_open"]["count"] == 2
+    tracing.reset()
+
+
+@pytest.fixture
+def inference_server(blank_nlp):
+    server = make_server(port=0, pipeline=IntentPipeline(warm_semantic=False), max_wait=0.01)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    server.pool.close()
+
+
+def test_inference_server_batches_concurrent_requests(inference_server):
+    url = f"http://127.0.0.1:{inference_server.server_address[1]}"
+    local = IntentPipeline(warm_semantic=False)
+    client = RemoteIntentPipeline(url, lambda: pytest.fail("server was reachable"))
+    questions = support_questions()[:20]
+
+    results = [None] * len(questions)
+
+    def ask(i):
+        results[i] = client.classify(questions[i])
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(len(questions))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == local.classify_many(questions)
+    assert client.stats["remote"] == len(questions) and client.stats["fallback"] == 0
+
+    stats = inference_server.pool.stats()
+    assert stats["messages"] == len(questions)
+    assert stats["batches"] <= stats["requests"]
+
+
+def test_bot_keeps_every_feature_through_the_server(fresh_db, hashing_encoder, inference_server, monkeypatch):
+    monkeypatch.setattr(knowledge_base, "MIN_SCORE", 0.3)
+    url = f"http://127.0.0.1:{inference_server.server_address[1]}"
+    pipeline = RemoteIntentPipeline(url, lambda: pytest.fail("server was reachable"))
+    bot = FreelanceSupportBot(db.create_user("dev", "dev@example.com", "pw"), warm_semantic=False, pipeline=pipeline)
+
+    # follow-ups are resolved on embeddings from /embed
+    bot.get_response("How do I find my first client?")
+    bot.get_response("And what about on Upwork?")
+    assert bot.memory.turns[-1].intent == "finding_clients"
+    assert bot.memory.turns[-1].embedding is not None
+
+    # several intents from /classify_all, ordered with the server's semantic scores
+    answer = bot.get_response("How do I price and write a contract?")
+    assert "Setting the right price" in answer and "Good contracts protect" in answer
+
+    # knowledge base answers searched with a server embedding
+    answer = bot.get_response("Should I use different models: hourly, project-based, or retainer?")
+    assert answer.startswith("Here's what I found") and "retainer" in answer
+
+    assert pipeline.stats["remote"] > 0 and pipeline.stats["fallback"] == pipeline.stats["errors"] == 0
+    # every endpoint goes through the worker pool
+    assert inference_server.pool.stats()["requests"] == pipeline.stats["remote"]
+
+    # the client asks for each message's embedding once
+    remote = pipeline.stats["remote"]
+    assert pipeline.embed("Any tips?") is pipeline.embed("any tips")
+    assert pipeline.stats["remote"] == remote + 1
+
+
+def test_inference_client_falls_back_when_server_is_down(blank_nlp):
+    client = RemoteIntentPipeline("http://127.0.0.1:9", lambda: IntentPipeline(warm_semantic=False),
+                                  timeout=0.5, retry_after=60)
+    assert client.classify("hello") == ("greeting", 1.0, "rules")
+    assert client.classify("What should I charge?")[0] == "pricing"
+
+    # the second message skipped the server instead of waiting on it again
+    assert client.stats == {"remote": 0, "fallback": 2, "errors": 1}
+    assert client.classify_all("hi, what should I charge?") == [("pricing", 1.0, "rules"), ("greeting", 1.0, "rules")]
+
+    # embedding never loads local models just to stand in for the server
+    client = RemoteIntentPipeline("http://127.0.0.1:9", lambda: pytest.fail("built the local pipeline"),
+                                  timeout=0.5, retry_after=60)
+    assert client.embed("hello") is None and client.embedder() == client.embed
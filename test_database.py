@@ -0,0 +1,479 @@
+import gc
+import io
+import os
+import sqlite3
+import threading
+
+import pytest
+
+import blob_store
+import database as db
+import database_gig as db_gig
+import db_pool
+import migrations
+
+
+def test_pool_reuses_connection_in_same_thread(fresh_db):
+    conn = db.get_db_connection()
+    conn.close()
+    again = db.get_db_connection()
+    assert again is conn
+    again.close()
+
+    stats = db.get_pool_stats()
+    assert stats["created"] >= 1
+    assert stats["thread_reuses"] >= 1
+    assert 0.0 < stats["reuse_ratio"] <= 1.0
+
+
+def test_pool_is_shared_by_gig_module(fresh_db):
+    conn = db_gig.get_db_connection()
+    conn.close()
+    assert db.get_db_connection() is conn
+
+
+def test_nested_checkouts_get_distinct_connections(fresh_db):
+    outer = db.get_db_connection()
+    inner = db.get_db_connection()
+    assert inner is not outer
+    inner.close()
+    outer.close()
+
+
+def test_release_rolls_back_uncommitted_work(fresh_db):
+    conn = db.get_db_connection()
+    conn.execute("INSERT INTO skills (name, category) VALUES ('Tmp', 'Tmp')")
+    conn.close()
+
+    conn = db.get_db_connection()
+    row = conn.execute("SELECT COUNT(*) FROM skills WHERE name = 'Tmp'").fetchone()
+    conn.close()
+    assert row[0] == 0
+
+
+def test_bounded_pool_waits_then_times_out(tmp_path):
+    pool = db_pool.ConnectionPool(str(tmp_path / "small.db"), max_size=1, timeout=0.05)
+    held = pool.connect()
+    with pytest.raises(sqlite3.OperationalError):
+        pool.connect()
+    assert pool.stats()["waits"] == 1
+    assert pool.stats()["timeouts"] == 1
+
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.connect()))
+    pool.timeout = 5
+    waiter.start()
+    held.close()
+    waiter.join()
+    assert got == [held]
+    pool.close_all()
+
+
+def test_unhealthy_idle_connection_is_replaced(tmp_path):
+    pool = db_pool.ConnectionPool(str(tmp_path / "hc.db"), health_check_interval=0)
+    conn = pool.connect()
+    conn.close()
+    # Simulate a handle that died while idle
+    conn._really_close()
+
+    fresh = pool.connect()
+    assert fresh is not conn
+    assert fresh.execute("SELECT 1").fetchone()[0] == 1
+    stats = pool.stats()
+    assert stats["health_checks"] == 1
+    assert stats["discarded"] == 1
+    assert stats["size"] == 1
+    fresh.close()
+    pool.close_all()
+
+
+def test_leaked_connection_frees_its_slot(tmp_path):
+    pool = db_pool.ConnectionPool(str(tmp_path / "leak.db"), max_size=1, timeout=0.05)
+    conn = pool.connect()
+    del conn
+    # sqlite3 connections sit in a reference cycle with their statement cache
+    gc.collect()
+    pool.connect().close()
+    assert pool.stats()["size"] == 1
+    pool.close_all()
+
+
+def test_connections_use_wal_profile(fresh_db):
+    conn = db.get_db_connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == db_pool.DEFAULT_PROFILE["busy_timeout"]
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    conn.close()
+
+
+def test_checkpoint_wal(fresh_db):
+    db.create_user("alice", "alice@example.com", "pw")
+    result = db.checkpoint_wal("TRUNCATE")
+    assert result["busy"] is False
+    assert result["log_frames"] == 0
+    with pytest.raises(ValueError):
+        db.checkpoint_wal("SIDEWAYS")
+
+
+def test_profile_rejects_unsafe_values(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "p.db"))
+    with pytest.raises(ValueError):
+        db_pool.apply_profile(conn, {"journal_mode": "WAL; DROP TABLE users"})
+    conn.close()
+
+
+def _count_statements(monkeypatch):
+    """Count non-PRAGMA statements run on connections from get_db_connection"""
+    statements = []
+    original = db.get_db_connection
+
+    def traced():
+        conn = original()
+        conn.set_trace_callback(
+            lambda sql: statements.append(sql) if not sql.lstrip().upper().startswith("PRAGMA") else None)
+        return conn
+
+    monkeypatch.setattr(db, "get_db_connection", traced)
+    return statements
+
+
+def test_update_user_skills_writes_only_the_diff(fresh_db, monkeypatch):
+    user = db.create_user("dev", "dev@example.com", "pw")
+    assert db.update_user_skills(user, [
+        {'skill_id': 1, 'proficiency_level': "Beginner", 'years_experience': 1},
+        {'skill_id': 2, 'proficiency_level': "Expert", 'years_experience': 5},
+        {'skill_id': 3, 'proficiency_level': "Intermediate", 'years_experience': 2},
+    ]) == {1, 2, 3}
+
+    conn = db.get_db_connection()
+    row_ids = dict(conn.execute("SELECT skill_id, id FROM user_skills WHERE user_id = ?", (user,)).fetchall())
+    conn.close()
+
+    statements = _count_statements(monkeypatch)
+    changed = db.update_user_skills(user, [
+        {'skill_id': 1, 'proficiency_level': "Intermediate", 'years_experience': 2},
+        {'skill_id': 2, 'proficiency_level': "Expert", 'years_experience': 5},
+        {'skill_id': 4, 'proficiency_level': "Beginner", 'years_experience': 0},
+    ])
+    assert changed == {1, 3, 4}
+    deletes = [sql for sql in statements if sql.lstrip().upper().startswith("DELETE")]
+    assert len(deletes) == 1 and "skill_id" in deletes[0]
+
+    skills = {s['id']: (s['proficiency_level'], s['years_experience']) for s in db.get_user_skills(user)}
+    assert skills == {1: ("Intermediate", 2), 2: ("Expert", 5), 4: ("Beginner", 0)}
+
+    conn = db.get_db_connection()
+    after = dict(conn.execute("SELECT skill_id, id FROM user_skills WHERE user_id = ?", (user,)).fetchall())
+    conn.close()
+    # Updated and untouched rows keep their identity
+    assert after[1] == row_ids[1] and after[2] == row_ids[2]
+
+    assert db.update_user_skills(user, [
+        {'skill_id': 1, 'proficiency_level': "Intermediate", 'years_experience': 2},
+        {'skill_id': 2, 'proficiency_level': "Expert", 'years_experience': 5},
+        {'skill_id': 4, 'proficiency_level': "Beginner", 'years_experience': 0},
+    ]) == set()
+
+
+def test_gig_skills_hydrated_in_one_query(fresh_db, monkeypatch):
+    author = db.create_user("author", "author@example.com", "pw")
+    picker = db.create_user("picker", "picker@example.com", "pw")
+    expected = {}
+    for i in range(12):
+        skill_ids = [1 + i % 5, 20 + i % 3]
+        gig_id = db.create_gig(author, f"Gig {i}", "desc", 10, 20, "1 day", skill_ids)
+        db_gig.pick_gig(picker, gig_id)
+        expected[gig_id] = skill_ids
+
+    statements = _count_statements(monkeypatch)
+    gigs = db.get_gigs(limit=50)
+    assert len(statements) == 2
+    assert {g['id']: [s['id'] for s in g['skills']] for g in gigs} == expected
+
+    statements.clear()
+    picked = db_gig.get_user_picked_gigs(picker)
+    assert len(statements) == 2
+    assert all(g['skills'] for g in picked)
+
+
+def test_attach_skills_for_courses_and_empty_rows(fresh_db, monkeypatch):
+    monkeypatch.setattr(db, "_MAX_IN_PARAMS", 2)
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    courses = db.attach_skills(cursor, [{'id': 4}, {'id': 1}, {'id': 999}], "course")
+    assert [s['name'] for s in courses[1]['skills']] == ["Python"]
+    assert {s['id'] for s in courses[0]['skills']} == {2, 11, 12, 15}
+    assert courses[2]['skills'] == []
+    assert db.attach_skills(cursor, [], "gig") == []
+    # more ids than one batch binds, e.g. the courses page's catalog lookup
+    rows = db.select_in(cursor, "SELECT id FROM courses WHERE id IN ({placeholders})", [5, 1, 4, 2, 3])
+    assert sorted(r['id'] for r in rows) == [1, 2, 3, 4, 5]
+    conn.close()
+
+
+def test_feed_loads_in_constant_queries(fresh_db, monkeypatch):
+    alice = db.create_user("alice", "alice@example.com", "pw")
+    bob = db.create_user("bob", "bob@example.com", "pw")
+    post_ids = [db.create_post(alice, f"Post {i}") for i in range(5)]
+    db.like_post(bob, post_ids[0])
+    db.like_post(alice, post_ids[0])
+    for i in range(4):
+        db.add_comment(bob, post_ids[0], f"Comment {i}")
+
+    statements = _count_statements(monkeypatch)
+    feed = db.get_feed(bob, limit=20, comment_preview=2)
+    assert len(statements) == 2
+
+    by_id = {post['id']: post for post in feed}
+    first = by_id[post_ids[0]]
+    assert first['like_count'] == 2
+    assert first['liked'] is True
+    assert first['comment_count'] == 4
+    assert [c['content'] for c in first['comments']] == ["Comment 2", "Comment 3"]
+    assert by_id[post_ids[1]]['liked'] is False
+    assert by_id[post_ids[1]]['comments'] == []
+
+    full = db.get_post_comments(post_ids[0])
+    assert [c['content'] for c in full] == [f"Comment {i}" for i in range(4)]
+
+
+def test_get_posts_keeps_full_comment_lists(fresh_db, monkeypatch):
+    alice = db.create_user("alice", "alice@example.com", "pw")
+    post_id = db.create_post(alice, "Hello")
+    for i in range(3):
+        db.add_comment(alice, post_id, f"Comment {i}")
+    db.like_post(alice, post_id)
+
+    statements = _count_statements(monkeypatch)
+    posts = db.get_posts(limit=10)
+    assert len(statements) == 2
+    assert posts[0]['like_count'] == 1
+    assert len(posts[0]['comments']) == 3
+
+
+# Walking these in order is how "newest first ... LIMIT n" pages are served
+ORDERED_SCAN_INDEXES = {"idx_posts_created", "idx_gigs_created"}
+
+
+def _table_scans(conn, sql):
+    """Return EXPLAIN QUERY PLAN lines that walk a whole table or index"""
+    scans = []
+    for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+        detail = row[-1]
+        words = detail.split()
+        # Subquery and constant-row scans are not table reads
+        if words[0] != "SCAN" or words[1] == "CONSTANT" or words[1].startswith("("):
+            continue
+        if "INDEX" in words and words[words.index("INDEX") + 1] in ORDERED_SCAN_INDEXES:
+            continue
+        scans.append(detail)
+    return scans
+
+
+def test_hot_path_queries_use_indexes(fresh_db, monkeypatch):
+    author = db.create_user("author", "author@example.com", "pw")
+    viewer = db.create_user("viewer", "viewer@example.com", "pw")
+    db.update_user_skills(viewer, [
+        {"skill_id": 1, "proficiency_level": "Intermediate", "years_experience": 2},
+        {"skill_id": 12, "proficiency_level": "Advanced", "years_experience": 4},
+    ])
+    gig_id = db.create_gig(author, "Gig", "desc", 10, 20, "1 day", [1, 12])
+    post_id = db.create_post(author, "Post")
+    db.like_post(viewer, post_id)
+    db.add_comment(viewer, post_id, "Comment")
+    db_gig.pick_gig(viewer, gig_id)
+    db_gig.add_gig_comment(viewer, gig_id, "Comment")
+    db_gig.add_gig_file(viewer, gig_id, "a.txt", b"data")
+
+    import recommenders
+
+    statements = _count_statements(monkeypatch)
+    db.get_user_skills(viewer)
+    db.get_gigs(limit=50)
+    db.get_gigs(limit=50, skill_ids=[1, 12])
+    db.get_gigs(user_id=author)
+    db.get_recommended_gigs(viewer)
+    db.get_recommended_courses(viewer)
+    db.get_posts(limit=20)
+    db.get_posts(limit=20, user_id=author)
+    db.get_feed(viewer, limit=20)
+    db.get_post_comments(post_id)
+    db.has_user_liked_post(viewer, post_id)
+    db_gig.has_user_picked_gig(viewer, gig_id)
+    db_gig.get_gig_picks_count(gig_id)
+    db_gig.get_user_picked_gigs(viewer)
+    db_gig.get_gig_comments(gig_id)
+    db_gig.get_gig_files(gig_id)
+    recommenders.recommend_courses(viewer)
+    recommenders.get_skill_gap_courses(viewer)
+    token = db._encode_page_token({'created_at': "2100-01-01 00:00:00", 'id': 10 ** 6})
+    db.get_gigs_page(limit=10, page_token=token)
+    db.get_gigs_page(limit=10, page_token=token, user_id=author)
+    db.get_gigs_page(limit=10, page_token=token, skill_ids=[1, 12])
+    db.get_feed_page(viewer, limit=10, page_token=token)
+    db.get_post_comments_page(post_id, limit=10, page_token=token)
+
+    selects = [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+    assert len(selects) >= 23
+
+    conn = db.get_db_connection()
+    offenders = {sql: scans for sql in selects if (scans := _table_scans(conn, sql))}
+    conn.close()
+    assert offenders == {}
+
+
+def test_up_to_date_startup_is_one_version_check(fresh_db, monkeypatch):
+    statements = _count_statements(monkeypatch)
+    db.init_db()
+    assert statements == []  # already migrated in this process
+
+    monkeypatch.setattr(db, "_migrated_paths", set())
+    db.init_db()
+    assert len(statements) == 1
+    assert "schema_version" in statements[0]
+
+
+def test_migrations_are_recorded_and_transactional(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "m.db"))
+
+    def create(conn):
+        conn.execute("CREATE TABLE widgets (id INTEGER PRIMARY KEY)")
+
+    def explode(conn):
+        conn.execute("CREATE TABLE gadgets (id INTEGER PRIMARY KEY)")
+        raise RuntimeError("boom")
+
+    assert migrations.migrate(conn, [(1, "widgets", create)]) == [1]
+    with pytest.raises(RuntimeError):
+        migrations.migrate(conn, [(1, "widgets", create), (2, "gadgets", explode)])
+
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "widgets" in tables
+    assert "gadgets" not in tables
+    assert migrations.current_version(conn) == 1
+    assert migrations.migrate(conn, [(1, "widgets", create)]) == []
+    conn.close()
+
+
+def _walk(fetch_page):
+    rows, token, pages = [], None, 0
+    while True:
+        page, token = fetch_page(token)
+        rows.extend(page)
+        pages += 1
+        if not token:
+            return rows, pages
+
+
+def test_keyset_pages_cover_every_gig_once(fresh_db):
+    author = db.create_user("author", "author@example.com", "pw")
+    other = db.create_user("other", "other@example.com", "pw")
+    # Created within the same second, so only the id breaks created_at ties
+    for i in range(25):
+        db.create_gig(author if i % 2 else other, f"Gig {i}", "desc", 10, 20, "1 day", [1 + i % 3])
+
+    gigs, pages = _walk(lambda t: db.get_gigs_page(limit=10, page_token=t))
+    assert pages == 3
+    assert [g['id'] for g in gigs] == [g['id'] for g in db.get_gigs(limit=100)]
+    assert all('skills' in g for g in gigs)
+
+    mine, _ = _walk(lambda t: db.get_gigs_page(limit=4, page_token=t, user_id=author))
+    assert len(mine) == 12 and {g['user_id'] for g in mine} == {author}
+
+    python_gigs, _ = _walk(lambda t: db.get_gigs_page(limit=3, page_token=t, skill_ids=[1]))
+    assert len(python_gigs) == len({g['id'] for g in python_gigs}) == 9
+
+    # the pages load the first n pages and keep the token for the next one
+    first_two, token = db.load_pages(lambda t: db.get_gigs_page(limit=10, page_token=t), 2)
+    assert first_two == gigs[:20] and token
+    assert db.load_pages(lambda t: db.get_gigs_page(limit=10, page_token=t), 5) == (gigs, None)
+
+
+def test_keyset_pages_for_feed_and_comments(fresh_db):
+    alice = db.create_user("alice", "alice@example.com", "pw")
+    post_ids = [db.create_post(alice, f"Post {i}") for i in range(7)]
+    for i in range(5):
+        db.add_comment(alice, post_ids[0], f"Comment {i}")
+
+    posts, pages = _walk(lambda t: db.get_feed_page(alice, limit=3, page_token=t))
+    assert pages == 3
+    assert [p['id'] for p in posts] == sorted(post_ids, reverse=True)
+
+    comments, pages = _walk(lambda t: db.get_post_comments_page(post_ids[0], limit=2, page_token=t))
+    assert pages == 3
+    assert [c['content'] for c in comments] == [f"Comment {i}" for i in range(5)]
+
+    with pytest.raises(ValueError):
+        db.get_feed_page(alice, page_token="not-a-token")
+
+
+def test_gig_files_are_deduplicated_and_listed_without_bytes(fresh_db):
+    owner = db.create_user("owner", "owner@example.com", "pw")
+    gig_id = db.create_gig(owner, "Gig", "desc", 10, 20, "1 day", [1])
+
+    first = db_gig.add_gig_file(owner, gig_id, "brief.pdf", b"%PDF-1.4 brief", "Brief")
+    second = db_gig.add_gig_file(owner, gig_id, "copy.pdf", b"%PDF-1.4 brief")
+    files = db_gig.get_gig_files(gig_id)
+
+    assert {f['id'] for f in files} == {first, second}
+    assert all('file_data' not in f for f in files)
+    assert files[0]['content_hash'] == files[1]['content_hash']
+    assert files[0]['size'] == len(b"%PDF-1.4 brief")
+    assert sum(len(names) for _, _, names in os.walk(blob_store.BLOB_DIR)) == 1
+    assert db_gig.get_gig_file_data(first) == b"%PDF-1.4 brief"
+    assert db_gig.get_gig_file_data(999) is None
+
+
+def test_gig_file_streams_in_chunks_and_enforces_limit(fresh_db, monkeypatch):
+    owner = db.create_user("owner", "owner@example.com", "pw")
+    gig_id = db.create_gig(owner, "Gig", "desc", 10, 20, "1 day", [1])
+    payload = os.urandom(2 * blob_store.CHUNK_SIZE + 17)
+
+    class ChunkRecorder(io.BytesIO):
+        reads = []
+
+        def read(self, size=-1):
+            self.reads.append(size)
+            return super().read(size)
+
+    file_id = db_gig.add_gig_file(owner, gig_id, "data.bin", ChunkRecorder(payload))
+    assert file_id and all(0 < size <= blob_store.CHUNK_SIZE for size in ChunkRecorder.reads)
+
+    with db_gig.open_gig_file(file_id) as stream:
+        assert stream.read() == payload
+
+    monkeypatch.setattr(db_gig, "MAX_GIG_FILE_SIZE", blob_store.CHUNK_SIZE)
+    assert db_gig.add_gig_file(owner, gig_id, "big.bin", io.BytesIO(payload)) is None
+    assert db_gig.add_gig_file(owner, gig_id, "big.bin", payload) is None
+    assert len(db_gig.get_gig_files(gig_id)) == 1
+    # The aborted upload leaves no temp file behind
+    assert sum(len(names) for _, _, names in os.walk(blob_store.BLOB_DIR)) == 1
+    assert db_gig.open_gig_file(999) is None
+
+
+def test_migration_moves_existing_blobs_out_of_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "legacy.db"))
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+
+    conn = db.get_db_connection()
+    migrations.migrate(conn, db.MIGRATIONS[:4])
+    conn.execute("INSERT INTO users (username, email, password_hash, join_date) VALUES ('u', 'e', 'h', 'd')")
+    conn.execute("""INSERT INTO gig_files (user_id, gig_id, filename, file_data, description, uploaded_at)
+                    VALUES (1, 1, 'old.zip', ?, 'legacy', '2024-01-01 00:00:00')""", (b"zipped" * 1000,))
+    conn.commit()
+    conn.close()
+
+    db.init_db()
+    try:
+        files = db_gig.get_gig_files(1)
+        assert [(f['filename'], f['size'], f['description']) for f in files] == [("old.zip", 6000, "legacy")]
+        assert db_gig.get_gig_file_data(files[0]['id']) == b"zipped" * 1000
+
+        conn = db.get_db_connection()
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(gig_files)")}
+        indexes = {row['name'] for row in conn.execute("PRAGMA index_list(gig_files)")}
+        conn.close()
+        assert "file_data" not in columns
+        assert "idx_gig_files_gig" in indexes
+    finally:
+        db_pool.close_all_pools()
@@ -0,0 +1,197 @@
+# freelance_mongo/tracing.py
+"""Timing spans aggregated into latency histograms
+
+    with tracing.trace("get_response") as t:
+        with tracing.span("rules"):
+            ...
+    t.spans  # this request's breakdown
+
+Every span is added to a process-wide histogram named after it; export
+them with export_json() or export_prometheus(). Spans opened inside
+trace() are also kept on that trace, nested by depth. Database
+connections checked out while a trace is active get a span of their own,
+from checkout to close(), named after the function that asked for them.
+
+A span that is still open when its parent ends, e.g. a connection not
+closed because its caller raised, is ended with the parent and marked
+unfinished, so durations are never missing and the nesting stays right.
+"""
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+PROMETHEUS_METRIC = "freelancehub_stage_seconds"
+
+_histograms = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class Histogram:
+    """Counts of durations per bucket, plus their sum"""
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        # the extra last bucket is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def to_dict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(list(self.bounds) + ["+Inf"], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class Trace:
+    """Spans recorded during one request"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        # spans started and not yet ended, innermost last
+        self.open = []
+        # dicts of name, depth, start_ms (from the trace start), duration_ms
+        # and unfinished
+        self.spans = []
+
+    def to_dict(self):
+        return {"name": self.name, "spans": list(self.spans)}
+
+
+class _Span:
+    __slots__ = ("name", "started", "trace", "index", "ended")
+
+
+def current_trace():
+    """The trace active on this thread, or None"""
+    return getattr(_local, "trace", None)
+
+
+def start_span(name):
+    """Start timing a span; pass the result to end_span()"""
+    span = _Span()
+    span.name = name
+    span.trace = current_trace()
+    span.started = time.perf_counter()
+    span.index = None
+    span.ended = False
+    if span.trace is not None:
+        span.index = len(span.trace.spans)
+        span.trace.spans.append({
+            "name": name,
+            "depth": len(span.trace.open),
+            "start_ms": (span.started - span.trace.started) * 1000,
+            "duration_ms": None,
+            "unfinished": False,
+        })
+        span.trace.open.append(span)
+    return span
+
+
+def end_span(span):
+    """Stop a span, adding it to its histogram and trace
+
+    Spans started inside it and still open are ended first and marked
+    unfinished. Ending a span twice does nothing the second time.
+
+    Returns:
+        float: Seconds the span took, or None if it had already ended
+    """
+    if span.ended:
+        return None
+    if span.trace is not None and span in span.trace.open:
+        while span.trace.open[-1] is not span:
+            _finish(span.trace.open.pop(), unfinished=True)
+        span.trace.open.pop()
+    return _finish(span)
+
+
+def _finish(span, unfinished=False):
+    span.ended = True
+    elapsed = time.perf_counter() - span.started
+    with _lock:
+        histogram = _histograms.get(span.name)
+        if histogram is None:
+            histogram = _histograms[span.name] = Histogram()
+        histogram.observe(elapsed)
+    if span.trace is not None:
+        span.trace.spans[span.index]["duration_ms"] = elapsed * 1000
+        span.trace.spans[span.index]["unfinished"] = unfinished
+    return elapsed
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block as a span called name"""
+    current = start_span(name)
+    try:
+        yield current
+    finally:
+        end_span(current)
+
+
+@contextmanager
+def trace(name):
+    """Record the spans of the enclosed block, itself a span called name
+
+    Yields:
+        Trace: The trace; its spans are complete once the block exits
+    """
+    previous = current_trace()
+    current = _local.trace = Trace(name)
+    try:
+        with span(name):
+            yield current
+    finally:
+        # the trace's own span is the outermost, so ending it ended the rest
+        _local.trace = previous
+
+
+def snapshot():
+    """Every histogram as a dict
+
+    Returns:
+        dict: span name -> {count, sum, buckets {upper bound: cumulative count}}
+    """
+    with _lock:
+        return {name: histogram.to_dict() for name, histogram in sorted(_histograms.items())}
+
+
+def export_json():
+    """The histograms as a JSON document"""
+    return json.dumps(snapshot(), indent=2)
+
+
+def export_prometheus(metric=PROMETHEUS_METRIC):
+    """The histograms in the Prometheus text exposition format, one label per span"""
+    lines = [
+        f"# HELP {metric} Time spent in each traced stage",
+        f"# TYPE {metric} histogram",
+    ]
+    for name, histogram in snapshot().items():
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        for bound, count in histogram["buckets"].items():
+            lines.append(f'{metric}_bucket{{stage="{label}",le="{bound}"}} {count}')
+        lines.append(f'{metric}_sum{{stage="{label}"}} {histogram["sum"]}')
+        lines.append(f'{metric}_count{{stage="{label}"}} {histogram["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Drop every histogram"""
+    with _lock:
+        _histograms.clear()